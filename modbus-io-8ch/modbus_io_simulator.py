@@ -45,6 +45,9 @@ class ModbusRTUIO8CH:
         # TCP bridge dla łatwiejszego testowania
         self.tcp_bridge = None
         
+        # Subskrybenci zmian wejść: callback(previous_states, current_states)
+        self.input_listeners = []
+        
     def calculate_crc16(self, data):
         """Oblicz CRC16 Modbus"""
         crc = 0xFFFF
@@ -239,8 +242,17 @@ class ModbusRTUIO8CH:
                 
         return frame  # Echo
     
+    def add_input_listener(self, callback):
+        """Rejestruje callback wywoływany przy każdej zmianie stanu wejść"""
+        self.input_listeners.append(callback)
+    
+    def remove_input_listener(self, callback):
+        if callback in self.input_listeners:
+            self.input_listeners.remove(callback)
+    
     def simulate_inputs(self, input_states):
         """Symuluj zmiany na wejściach"""
+        previous_inputs = list(self.digital_inputs)
         for i, state in enumerate(input_states):
             prev_state = self.digital_inputs[i]
             self.digital_inputs[i] = state
@@ -256,6 +268,10 @@ class ModbusRTUIO8CH:
                     self.digital_outputs[i] = not self.digital_outputs[i]
                     
         self.log_event("inputs", {"states": self.digital_inputs})
+        
+        if previous_inputs != self.digital_inputs:
+            for callback in list(self.input_listeners):
+                callback(previous_inputs, list(self.digital_inputs))
     
     def start_flash(self, channel):
         """Rozpocznij miganie wyjścia"""
@@ -362,12 +378,76 @@ def get_history():
     limit = request.args.get('limit', 100, type=int)
     return jsonify(simulator.history[-limit:])
 
+# Ramka powiadomienia o zmianie wejść (kod funkcji użytkownika Modbus 0x41):
+# [adres, 0x41, poprzedni stan DI, bieżący stan DI, timestamp (double BE), CRC16]
+# Ten sam układ odczytuje ModbusInputMonitor (python-control/modbus_client.py);
+# zgodność sprawdza python-control/test_input_monitor.py
+INPUT_NOTIFY_FUNCTION = 0x41
+INPUT_NOTIFY_FORMAT = '>BBBBd'
+
 # TCP Bridge dla łatwiejszego testowania
 class ModbusTCPBridge:
-    def __init__(self, simulator, port=5020):
+    def __init__(self, simulator, port=5020, notify_port=5021):
         self.simulator = simulator
         self.port = port
+        self.notify_port = notify_port
         self.server = None
+        self.notify_server = None
+        self.notify_clients = set()
+        self.loop = None
+        
+    def _pack_inputs(self, states):
+        value = 0
+        for i, state in enumerate(states):
+            if state:
+                value |= (1 << i)
+        return value
+        
+    def build_input_notification(self, previous_states, current_states, timestamp=None):
+        """Buduje ramkę powiadomienia o zmianie wejść"""
+        frame = struct.pack(
+            INPUT_NOTIFY_FORMAT,
+            self.simulator.device_address,
+            INPUT_NOTIFY_FUNCTION,
+            self._pack_inputs(previous_states),
+            self._pack_inputs(current_states),
+            timestamp if timestamp is not None else datetime.now().timestamp()
+        )
+        return frame + self.simulator.calculate_crc16(frame)
+        
+    def on_inputs_changed(self, previous_states, current_states):
+        """Listener symulatora; może być wołany z wątku Flask"""
+        if self.loop is None or not self.notify_clients:
+            return
+        frame = self.build_input_notification(previous_states, current_states)
+        self.loop.call_soon_threadsafe(self._broadcast, frame)
+        
+    def _broadcast(self, frame):
+        for writer in list(self.notify_clients):
+            if writer.is_closing():
+                self.notify_clients.discard(writer)
+                continue
+            writer.write(frame)
+            
+    async def handle_notify_client(self, reader, writer):
+        """Kanał powiadomień: klient tylko odbiera ramki zmian wejść"""
+        addr = writer.get_extra_info('peername')
+        print(f"Notification subscriber connected: {addr}")
+        self.notify_clients.add(writer)
+        
+        # Stan początkowy, żeby subskrybent nie musiał odpytywać
+        state = list(self.simulator.digital_inputs)
+        writer.write(self.build_input_notification(state, state))
+        
+        try:
+            # Czekaj na rozłączenie klienta
+            while await reader.read(256):
+                pass
+        except Exception as e:
+            print(f"Error: {e}")
+        finally:
+            self.notify_clients.discard(writer)
+            writer.close()
         
     async def handle_client(self, reader, writer):
         """Obsługa klienta TCP"""
@@ -393,12 +473,20 @@ class ModbusTCPBridge:
             
     async def start(self):
         """Uruchom serwer TCP"""
+        self.loop = asyncio.get_running_loop()
         self.server = await asyncio.start_server(
             self.handle_client, '0.0.0.0', self.port
         )
-        print(f"Modbus TCP bridge started on port {self.port}")
-        async with self.server:
-            await self.server.serve_forever()
+        self.notify_server = await asyncio.start_server(
+            self.handle_notify_client, '0.0.0.0', self.notify_port
+        )
+        self.simulator.add_input_listener(self.on_inputs_changed)
+        print(f"Modbus TCP bridge started on port {self.port} (notifications on {self.notify_port})")
+        async with self.server, self.notify_server:
+            await asyncio.gather(
+                self.server.serve_forever(),
+                self.notify_server.serve_forever()
+            )
 
 # Uruchomienie
 if __name__ == '__main__':
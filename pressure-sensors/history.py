@@ -0,0 +1,197 @@
+"""
+Historia wartości czujników: bufory cykliczne NumPy i decymacja do wykresów
+
+SensorHistory trzyma dla każdego czujnika stałej długości bufor próbek
+(wspólna oś czasu dla wszystkich czujników). Zapytanie o przedział czasu
+zwraca najwyżej `points` punktów po decymacji min/max albo LTTB, więc
+wykres godzin danych 100 Hz nie wymaga przesyłania milionów próbek.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+
+class SensorHistory:
+    """Bufory cykliczne próbek wszystkich czujników banku"""
+
+    def __init__(self, sensors: int, capacity: int = 360000):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((sensors, capacity), dtype=np.float32)
+        self.head = 0  # pozycja następnego zapisu
+        self.count = 0
+        self.added_late = np.zeros(sensors, dtype=bool)  # czujniki dodane po pierwszym zapisie
+        self.lock = threading.Lock()
+
+    def record(self, t: float, values: np.ndarray):
+        """Zapisuje próbki wszystkich czujników z chwili t
+
+        Czujniki dodane do banku później (SensorBank.add_sensors) dostają
+        nowe wiersze; ich wcześniejsze próbki są NaN i nie trafiają do window().
+        """
+        with self.lock:
+            if len(values) != len(self.values):
+                self._grow(len(values))
+            self.times[self.head] = t
+            self.values[:, self.head] = values
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _grow(self, sensors: int):
+        if sensors < len(self.values):
+            raise ValueError(f"History has {len(self.values)} sensors, got {sensors} values")
+        added = np.full((sensors - len(self.values), self.capacity), np.nan, dtype=np.float32)
+        self.values = np.concatenate([self.values, added])
+        self.added_late = np.concatenate([self.added_late, np.full(len(added), self.count > 0)])
+
+    def window(self, sensor: int, start: Optional[float] = None,
+               end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Próbki czujnika z przedziału [start, end], w kolejności czasu (kopie)"""
+        with self.lock:
+            # Bufor to dwa posortowane odcinki: starszy [head:] i nowszy [:head]
+            if self.count < self.capacity:
+                segments = [(0, self.count)]
+            else:
+                segments = [(self.head, self.capacity), (0, self.head)]
+            times, values = [], []
+            for low, high in segments:
+                segment = self.times[low:high]
+                first = low + (np.searchsorted(segment, start, 'left') if start is not None else 0)
+                last = low + (np.searchsorted(segment, end, 'right') if end is not None else len(segment))
+                times.append(self.times[first:last])
+                values.append(self.values[sensor, first:last])
+            times, values = np.concatenate(times), np.concatenate(values).astype(np.float64)
+        if self.added_late[sensor]:
+            recorded = ~np.isnan(values)
+            times, values = times[recorded], values[recorded]
+        return times, values
+
+
+def downsample_minmax(times: np.ndarray, values: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Minimum i maksimum z każdego z points/2 przedziałów, w kolejności czasu
+
+    Zachowuje wszystkie szpilki, więc obwiednia wykresu jest wierna.
+    """
+    n = len(values)
+    buckets = max(points // 2, 1)
+    if n <= points:
+        return times, values
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, size)
+    valid = ~np.isnan(padded).all(axis=1)  # ostatnie przedziały mogą być puste
+    offsets = np.arange(buckets)[valid] * size
+    low = offsets + np.nanargmin(padded[valid], axis=1)
+    high = offsets + np.nanargmax(padded[valid], axis=1)
+    indices = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=1).ravel()
+    indices = indices[np.concatenate([[True], np.diff(indices) != 0])]
+    return times[indices], values[indices]
+
+
+def downsample_lttb(times: np.ndarray, values: np.ndarray, points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets: punkty o największym polu trójkąta
+
+    Pierwszy i ostatni punkt zostają; z każdego przedziału wybierany jest
+    punkt tworzący największy trójkąt z poprzednio wybranym punktem i
+    średnią następnego przedziału.
+    """
+    n = len(values)
+    if points < 2:
+        raise ValueError("LTTB needs at least 2 points")
+    if n <= points:
+        return times, values
+    if points == 2:
+        return times[[0, n - 1]], values[[0, n - 1]]
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        next_low, next_high = high, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        mean_t = times[next_low:next_high].mean()
+        mean_v = values[next_low:next_high].mean()
+        t, v = times[low:high], values[low:high]
+        area = np.abs((times[previous] - mean_t) * (v - values[previous])
+                      - (times[previous] - t) * (mean_v - values[previous]))
+        previous = low + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return times[selected], values[selected]
+
+
+def downsample(times: np.ndarray, values: np.ndarray, points: int,
+               method: str = 'minmax') -> Tuple[np.ndarray, np.ndarray]:
+    if method == 'minmax':
+        return downsample_minmax(times, values, points)
+    if method == 'lttb':
+        return downsample_lttb(times, values, points)
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+
+def create_history_app(simulator, history: SensorHistory) -> Flask:
+    """Aplikacja Flask z listą czujników i zapytaniem o historię
+
+    GET /api/sensors
+    GET /api/history?address=0x48&bus=0&start=<t>&end=<t>&points=1000&method=minmax|lttb
+    """
+    app = Flask(__name__)
+    CORS(app)
+    bank = simulator.bank
+
+    @app.route('/api/sensors', methods=['GET'])
+    def list_sensors():
+        return jsonify([
+            {'bus': int(bus), 'address': f"0x{address:02X}", 'name': bank.names[i], 'unit': bank.units[i]}
+            for (bus, address), i in bank.index.items()
+        ])
+
+    @app.route('/api/history', methods=['GET'])
+    def get_history():
+        try:
+            address = int(request.args.get('address', ''), 0)
+            bus = request.args.get('bus', 0, type=int)
+            start = request.args.get('start', type=float)
+            end = request.args.get('end', type=float)
+            points = request.args.get('points', 1000, type=int)
+            method = request.args.get('method', 'minmax')
+        except ValueError:
+            return jsonify({'error': 'Invalid address'}), 400
+        if method not in DOWNSAMPLE_METHODS:
+            return jsonify({'error': f"method must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+        if points < 2:
+            return jsonify({'error': 'points must be at least 2'}), 400
+        i = bank.index.get((bus, address))
+        if i is None:
+            return jsonify({'error': 'Sensor not found'}), 404
+
+        times, values = history.window(i, start, end)
+        samples = len(times)
+        times, values = downsample(times, values, points, method)
+        return jsonify({
+            'bus': bus,
+            'address': f"0x{address:02X}",
+            'name': bank.names[i],
+            'unit': bank.units[i],
+            'method': method,
+            'samples': samples,
+            'times': times.tolist(),
+            'values': values.tolist(),
+        })
+
+    return app
+
+
+def run_history_server(simulator, history: SensorHistory, host: str = '0.0.0.0',
+                       port: int = 5001) -> threading.Thread:
+    """Uruchamia serwer HTTP historii w wątku w tle"""
+    app = create_history_app(simulator, history)
+    thread = threading.Thread(target=app.run, kwargs={'host': host, 'port': port}, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,192 @@
+"""
+Serwer I2C symulatora czujników (gniazdo Unix w /dev/i2c oraz TCP)
+
+Ramka żądania (5 bajtów, big-endian):
+    address (B)   adres I2C czujnika
+    register (B)  rejestr początkowy
+    length (B)    liczba bajtów do odczytu (0 = naturalna długość rejestru;
+                  dłuższy odczyt obejmuje kolejne rejestry, autoinkrementacja)
+    bus (H)       magistrala / stanowisko
+Ramka odpowiedzi:
+    status (B)    STATUS_OK / STATUS_NACK / STATUS_ERROR
+    length (H)    liczba bajtów danych (REG_SNAPSHOT dużej magistrali > 255)
+    data
+
+Klient może wysłać wiele żądań bez czekania na odpowiedzi (pipelining);
+odpowiedzi przychodzą w kolejności żądań.
+"""
+
+import asyncio
+import os
+import struct
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+REQUEST = struct.Struct('>BBBH')
+RESPONSE = struct.Struct('>BH')
+MAX_RESPONSE = 0xFFFF
+
+STATUS_OK = 0x00
+STATUS_NACK = 0x01  # brak urządzenia pod adresem
+STATUS_ERROR = 0x02
+
+DEFAULT_SOCKET = os.environ.get('I2C_SOCKET', '/dev/i2c/sensors.sock')
+DEFAULT_TCP_PORT = int(os.environ.get('I2C_TCP_PORT', '5002'))
+
+
+class RegisterStats:
+    """Statystyki czasu obsługi żądań jednego rejestru"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total_s += elapsed
+        if elapsed > self.max_s:
+            self.max_s = elapsed
+        self._recent.append(elapsed)
+
+    def to_dict(self) -> Dict:
+        recent = sorted(self._recent)
+        p99 = recent[min(int(len(recent) * 0.99), len(recent) - 1)] if recent else 0.0
+        return {
+            'count': self.count,
+            'mean_us': self.total_s / self.count * 1e6 if self.count else 0.0,
+            'p99_us': p99 * 1e6,
+            'max_us': self.max_s * 1e6,
+        }
+
+
+class I2CServer:
+    """Udostępnia PressureSensorSimulator.handle_i2c_request przez gniazda"""
+
+    def __init__(self, simulator, unix_path: Optional[str] = DEFAULT_SOCKET,
+                 tcp_host: str = '0.0.0.0', tcp_port: Optional[int] = DEFAULT_TCP_PORT):
+        self.simulator = simulator
+        self.unix_path = unix_path
+        self.tcp_host = tcp_host
+        self.tcp_port = tcp_port
+        self.register_stats: Dict[int, RegisterStats] = {}
+        self.clients = 0
+        self.requests = 0
+        self._servers: List[asyncio.AbstractServer] = []
+
+    async def start(self):
+        if self.unix_path:
+            os.makedirs(os.path.dirname(self.unix_path) or '.', exist_ok=True)
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)  # gniazdo po poprzednim uruchomieniu
+            self._servers.append(await asyncio.start_unix_server(self.handle_client, path=self.unix_path))
+            print(f"I2C server on unix:{self.unix_path}")
+        if self.tcp_port is not None:
+            server = await asyncio.start_server(self.handle_client, self.tcp_host, self.tcp_port)
+            self.tcp_port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+            print(f"I2C server on tcp:{self.tcp_host}:{self.tcp_port}")
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers.clear()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    async def process(self, address: int, register: int, length: int, bus: int) -> Tuple[int, bytes]:
+        """Obsługuje jedno żądanie; zwraca (status, dane)"""
+        started = time.perf_counter()
+        try:
+            if (bus, address) not in self.simulator.bank.index:
+                return STATUS_NACK, b''
+            data = await self.simulator.read_registers(address, register, length, bus)
+            if len(data) > MAX_RESPONSE:
+                print(f"I2C response too long (bus {bus}, 0x{address:02X}, reg 0x{register:02X}): {len(data)} bytes")
+                return STATUS_ERROR, b''
+            return STATUS_OK, data
+        except Exception as e:
+            print(f"I2C request error (bus {bus}, 0x{address:02X}, reg 0x{register:02X}): {e}")
+            return STATUS_ERROR, b''
+        finally:
+            stats = self.register_stats.get(register)
+            if stats is None:
+                stats = self.register_stats[register] = RegisterStats()
+            stats.record(time.perf_counter() - started)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients += 1
+        buffer = b''
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                # Wszystkie kompletne żądania z bufora, odpowiedzi jednym zapisem
+                complete = len(buffer) - len(buffer) % REQUEST.size
+                out = bytearray()
+                for offset in range(0, complete, REQUEST.size):
+                    status, data = await self.process(*REQUEST.unpack_from(buffer, offset))
+                    out += RESPONSE.pack(status, len(data))
+                    out += data
+                self.requests += complete // REQUEST.size
+                buffer = buffer[complete:]
+                if out:
+                    writer.write(out)
+                    await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    def stats(self) -> Dict:
+        return {
+            'clients': self.clients,
+            'requests': self.requests,
+            'registers': {f"0x{reg:02X}": stats.to_dict()
+                          for reg, stats in sorted(self.register_stats.items())},
+        }
+
+
+class I2CClient:
+    """Klient serwera I2C z obsługą pipeliningu"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, unix_path: Optional[str] = None, host: str = 'localhost',
+                      port: int = DEFAULT_TCP_PORT) -> 'I2CClient':
+        if unix_path:
+            return cls(*await asyncio.open_unix_connection(unix_path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def read_many(self, requests: Iterable[Tuple[int, int, int, int]]) -> List[Tuple[int, bytes]]:
+        """Wysyła wszystkie żądania (address, register, length, bus) naraz"""
+        requests = list(requests)
+        async with self._lock:
+            self.writer.write(b''.join(REQUEST.pack(*request) for request in requests))
+            await self.writer.drain()
+            responses = []
+            for _ in requests:
+                status, length = RESPONSE.unpack(await self.reader.readexactly(RESPONSE.size))
+                data = await self.reader.readexactly(length) if length else b''
+                responses.append((status, data))
+            return responses
+
+    async def read(self, address: int, register: int = 0x00, length: int = 0, bus: int = 0) -> bytes:
+        status, data = (await self.read_many([(address, register, length, bus)]))[0]
+        if status != STATUS_OK:
+            raise IOError(f"I2C read failed (bus {bus}, 0x{address:02X}, reg 0x{register:02X}): status {status}")
+        return data
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
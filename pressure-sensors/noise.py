@@ -0,0 +1,178 @@
+"""
+Modele szumu i dryftu czujników generowane blokami
+
+Składowe (parametry per czujnik, zero = wyłączona):
+    white       szum biały, odchylenie standardowe
+    pink        szum 1/f (suma oktaw Vossa-McCartneya), odchylenie standardowe
+    drift       błądzenie losowe, odchylenie przyrostu na sqrt(s)
+    step        skoki offsetu, odchylenie pojedynczego skoku
+    step_rate   średnia liczba skoków na sekundę (proces Poissona)
+
+Szum biały i 1/f są losowane z generatora blokami (block próbek na
+czujnik jednym wywołaniem), a odczyt zużywa kolejną próbkę bloku. Dryft i
+skoki zależą od czasu między odczytami, więc dają ten sam rozkład przy
+dowolnej częstotliwości odczytu. Przy tym samym ziarnie i tej samej
+sekwencji odczytów wyniki są powtarzalne.
+"""
+
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class NoiseBank:
+    """Stan i bloki próbek szumu wszystkich czujników banku"""
+
+    def __init__(self, rng: np.random.Generator, white: np.ndarray, pink: np.ndarray,
+                 drift: np.ndarray, step: np.ndarray, step_rate: np.ndarray, block: int = 256):
+        if block < 1 or block & (block - 1):
+            raise ValueError("Noise block size must be a power of two")
+        self.rng = rng
+        self.block = block
+        self.octaves = block.bit_length()  # najwolniejsza oktawa trzyma wartość przez pół bloku
+        # Parametry i stan czujników; wypełnia je extend()
+        self.white = np.zeros(0)
+        self.pink = np.zeros(0)
+        self.drift = np.zeros(0)
+        self.step = np.zeros(0)
+        self.step_rate = np.zeros(0)
+        # Kolumny bloków tylko dla czujników z szumem białym / 1/f / dryftem
+        self.column = np.zeros(0, dtype=np.int64)
+        self._sensor_of = np.zeros(0, dtype=np.int64)
+        self.measurement = np.zeros((block, 0))  # biały + 1/f, już przeskalowane
+        self.increment = np.zeros((block, 0))  # N(0, 1) przyrostów dryftu
+        self.cursor = np.zeros(0, dtype=np.int64)
+
+        self.walk = np.zeros(0)  # bieżący dryft
+        self.level = np.zeros(0)  # suma skoków offsetu
+        self.last_t = np.zeros(0)
+        self.next_step = np.zeros(0)
+        self.extend(white, pink, drift, step, step_rate)
+
+    def __len__(self):
+        return len(self.white)
+
+    def extend(self, white: np.ndarray, pink: np.ndarray, drift: np.ndarray,
+               step: np.ndarray, step_rate: np.ndarray):
+        """Dołącza czujniki na końcu banku; stan i bloki dotychczasowych zostają"""
+        white, pink, drift, step, step_rate = (
+            np.asarray(values, dtype=np.float64) for values in (white, pink, drift, step, step_rate))
+        first = len(self)
+        n = len(white)
+        sampled = (white > 0) | (pink > 0) | (drift > 0)
+        columns = int(sampled.sum())
+        column = np.full(n, -1, dtype=np.int64)
+        column[sampled] = len(self._sensor_of) + np.arange(columns)
+
+        self.white = np.concatenate([self.white, white])
+        self.pink = np.concatenate([self.pink, pink])
+        self.drift = np.concatenate([self.drift, drift])
+        self.step = np.concatenate([self.step, step])
+        self.step_rate = np.concatenate([self.step_rate, step_rate])
+        self.column = np.concatenate([self.column, column])
+        self._sensor_of = np.concatenate([self._sensor_of, first + np.flatnonzero(sampled)])
+        self.measurement = np.hstack([self.measurement, np.zeros((self.block, columns))])
+        self.increment = np.hstack([self.increment, np.zeros((self.block, columns))])
+        # pierwszy odczyt nowej kolumny generuje blok
+        self.cursor = np.concatenate([self.cursor, np.full(columns, self.block, dtype=np.int64)])
+        self.walk = np.concatenate([self.walk, np.zeros(n)])
+        self.level = np.concatenate([self.level, np.zeros(n)])
+        self.last_t = np.concatenate([self.last_t, np.full(n, np.nan)])
+        self.next_step = np.concatenate([self.next_step, np.full(n, np.inf)])
+
+        self.active = (self.column >= 0) | ((self.step > 0) & (self.step_rate > 0))
+        self._timed = (self.drift > 0) | ((self.step > 0) & (self.step_rate > 0))
+
+    def _generate(self, columns: np.ndarray):
+        """Nowy blok próbek dla wybranych kolumn (jedno losowanie na składową)"""
+        sensors = self._sensor_of[columns]
+        shape = (self.block, len(columns))
+        measurement = self.rng.standard_normal(shape) * self.white[sensors]
+        pink = self.pink[sensors]
+        if pink.any():
+            # Oktawa k zmienia wartość co 2^k próbek; suma ma widmo ~1/f
+            voss = np.zeros(shape)
+            for k in range(self.octaves):
+                hold = 1 << k
+                voss += np.repeat(self.rng.standard_normal((self.block // hold, len(columns))), hold, axis=0)
+            measurement += voss * (pink / math.sqrt(self.octaves))
+        self.measurement[:, columns] = measurement
+        if self.drift[sensors].any():
+            self.increment[:, columns] = self.rng.standard_normal(shape)
+        self.cursor[columns] = 0
+
+    def _waits(self, sensors: np.ndarray) -> np.ndarray:
+        """Czas do następnego skoku; losowany tylko dla czujników ze skokami,
+        więc sample() i sample_one() zużywają generator tak samo"""
+        rate = self.step_rate[sensors]
+        stepping = (rate > 0) & (self.step[sensors] > 0)
+        waits = np.full(len(sensors), np.inf)
+        waits[stepping] = self.rng.exponential(1.0, int(stepping.sum())) / rate[stepping]
+        return waits
+
+    def sample(self, indices: np.ndarray, t: float) -> np.ndarray:
+        """Szum dla czujników indices w chwili t (po jednej próbce na czujnik)"""
+        out = np.zeros(len(indices))
+        columns = self.column[indices]
+        sampled = columns >= 0
+        if sampled.any():
+            columns = columns[sampled]
+            exhausted = columns[self.cursor[columns] >= self.block]
+            if len(exhausted):
+                self._generate(np.unique(exhausted))
+            rows = self.cursor[columns]
+            self.cursor[columns] += 1
+            out[sampled] = self.measurement[rows, columns]
+            sensors = indices[sampled]
+            drifting = self.drift[sensors] > 0
+            if drifting.any():
+                sensors, rows, columns = sensors[drifting], rows[drifting], columns[drifting]
+                dt = np.nan_to_num(np.maximum(t - self.last_t[sensors], 0.0))
+                self.walk[sensors] += self.increment[rows, columns] * self.drift[sensors] * np.sqrt(dt)
+
+        timed = indices[self._timed[indices]]
+        if len(timed):
+            first = timed[np.isnan(self.last_t[timed])]
+            if len(first):
+                self.next_step[first] = t + self._waits(first)
+            due = timed[t >= self.next_step[timed]]
+            while len(due):
+                self.level[due] += self.rng.standard_normal(len(due)) * self.step[due]
+                self.next_step[due] += self._waits(due)
+                due = due[t >= self.next_step[due]]
+            self.last_t[timed] = t
+        return out + self.walk[indices] + self.level[indices]
+
+    def sample_one(self, i: int, t: float) -> float:
+        """sample() dla jednego czujnika, na skalarach"""
+        if not self.active[i]:
+            return 0.0
+        value = 0.0
+        column = int(self.column[i])
+        if column >= 0:
+            row = int(self.cursor[column])
+            if row >= self.block:
+                self._generate(np.array([column]))
+                row = 0
+            self.cursor[column] = row + 1
+            value = float(self.measurement[row, column])
+        if self._timed[i]:
+            last = float(self.last_t[i])
+            drift = float(self.drift[i])
+            if drift > 0 and last == last:  # last == last: był już odczyt (nie NaN)
+                self.walk[i] += float(self.increment[row, column]) * drift * math.sqrt(max(t - last, 0.0))
+            if self.step_rate[i] > 0 and self.step[i] > 0:
+                if last != last:
+                    self.next_step[i] = t + float(self._waits(np.array([i]))[0])
+                while t >= self.next_step[i]:
+                    self.level[i] += float(self.rng.standard_normal()) * float(self.step[i])
+                    self.next_step[i] += float(self._waits(np.array([i]))[0])
+            self.last_t[i] = t
+        return value + float(self.walk[i]) + float(self.level[i])
+
+    def reset(self, indices: Optional[np.ndarray] = None):
+        """Zeruje dryft i skoki offsetu (np. po kalibracji czujnika)"""
+        idx = slice(None) if indices is None else indices
+        self.walk[idx] = 0.0
+        self.level[idx] = 0.0
@@ -0,0 +1,130 @@
+"""
+Publikacja wartości czujników przez MQTT z martwą strefą i limitami częstości
+
+Co takt sprawdzane są wszystkie czujniki naraz (operacje wektorowe):
+czujnik trafia do publikacji, gdy jego wartość zmieniła się od ostatnio
+opublikowanej o więcej niż martwa strefa i minął min_interval_s, albo gdy
+od ostatniej publikacji minęło max_interval_s (odświeżenie). Wszystkie
+czujniki do publikacji w danym takcie idą jedną wiadomością, więc obciążenie
+brokera rośnie z tempem zmian ciśnienia, a nie z liczbą taktów.
+
+Wiadomość (JSON) na temacie `topic`:
+    {"timestamp": t, "sensors": [{"bus", "address", "name", "value", "unit"}, ...]}
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # paho potrzebne tylko bez przekazanego klienta
+    mqtt = None
+
+logger = logging.getLogger(__name__)
+
+
+class SensorPublisher:
+    """Publikuje zmiany wartości czujników PressureSensorSimulator
+
+    deadband: jedna wartość dla wszystkich czujników albo słownik
+    {(magistrala, adres) lub adres: wartość}; domyślnie nominalny szum
+    czujnika z profilu ('noise').
+    """
+
+    def __init__(self, simulator, client: Any = None, broker: str = 'mqtt', port: int = 1883,
+                 topic: str = 'c20/sensors/pressure',
+                 deadband: Optional[Union[float, Dict[Any, float]]] = None,
+                 min_interval_s: float = 0.1, max_interval_s: float = 5.0, tick_s: float = 0.1):
+        if client is None:
+            if mqtt is None:
+                raise ImportError("paho-mqtt is required when no MQTT client is given")
+            client = mqtt.Client(client_id='c20-pressure-sensors')
+        self.simulator = simulator
+        self.client = client
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.tick_s = tick_s
+
+        self._deadband = deadband
+        self.indices = np.zeros(0, dtype=np.int64)
+        self.deadband = np.zeros(0)
+        self.published_value = np.zeros(0)
+        self.published_at = np.zeros(0)
+        self._labels = []  # opisy czujników do wiadomości, budowane raz na czujnik
+        self._grow()
+        self.stats = {'ticks': 0, 'messages': 0, 'values': 0, 'suppressed': 0}
+
+    def _grow(self):
+        """Dobudowuje tablice o czujniki dodane do banku od poprzedniego wywołania"""
+        bank = self.simulator.bank
+        first, n = len(self.indices), len(bank)
+        if n == first:
+            return
+        deadband = bank.noise[first:].copy() if self._deadband is None else np.zeros(n - first)
+        if isinstance(self._deadband, dict):
+            for key, value in self._deadband.items():
+                for (bus, address), i in bank.index.items():
+                    if i >= first and (key == (bus, address) or key == address):
+                        deadband[i - first] = value
+        elif self._deadband is not None:
+            deadband[:] = self._deadband
+        self.indices = np.arange(n)
+        self.deadband = np.concatenate([self.deadband, deadband])
+        self.published_value = np.concatenate([self.published_value, np.full(n - first, np.nan)])
+        self.published_at = np.concatenate([self.published_at, np.full(n - first, -np.inf)])
+        self._labels += [
+            {'bus': int(bus), 'address': f"0x{address:02X}", 'name': bank.names[i], 'unit': bank.units[i]}
+            for (bus, address), i in sorted(bank.index.items(), key=lambda item: item[1]) if i >= first
+        ]
+
+    def connect(self):
+        try:
+            self.client.connect(self.broker, self.port, 60)
+            self.client.loop_start()
+            logger.info(f"Publishing sensor values to {self.broker}:{self.port} on {self.topic}")
+        except Exception as e:
+            logger.error(f"Failed to connect to MQTT broker: {e}")
+
+    def due(self, values: np.ndarray, t: float) -> np.ndarray:
+        """Indeksy czujników do publikacji w chwili t"""
+        elapsed = t - self.published_at
+        changed = ~(np.abs(values - self.published_value) <= self.deadband)  # NaN: jeszcze nie publikowany
+        return np.flatnonzero((changed & (elapsed >= self.min_interval_s)) | (elapsed >= self.max_interval_s))
+
+    def tick(self, t: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Sprawdza czujniki i publikuje jedną wiadomość; zwraca jej treść"""
+        simulator = self.simulator
+        self._grow()  # czujniki dodane przez SensorBank.add_sensors()
+        if simulator.lazy:
+            t = simulator.clock() if t is None else t
+            values = simulator.bank.evaluate(self.indices, t)
+        else:
+            t = simulator.bank.updated_at if t is None else t
+            values = simulator.bank.value
+        self.stats['ticks'] += 1
+        due = self.due(values, t)
+        self.stats['suppressed'] += len(values) - len(due)
+        if not len(due):
+            return None
+        self.published_value[due] = values[due]
+        self.published_at[due] = t
+        message = {
+            'timestamp': t,
+            'sensors': [dict(self._labels[i], value=float(values[i])) for i in due.tolist()],
+        }
+        self.client.publish(self.topic, json.dumps(message))
+        self.stats['messages'] += 1
+        self.stats['values'] += len(due)
+        return message
+
+    async def run(self):
+        while True:
+            self.tick()
+            await asyncio.sleep(self.tick_s)
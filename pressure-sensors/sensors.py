@@ -1,107 +1,475 @@
 import asyncio
+import math
+import os
 import struct
+import time
 import numpy as np
-from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from history import SensorHistory, run_history_server
+from i2c_server import I2CServer
+from noise import NoiseBank
+from publisher import SensorPublisher
+from trace_playback import TraceFile, TraceSource
+
+# Kodowanie wartości w rejestrze 0x00
+ENCODING_SIGNED_CENTI = 0  # signed 16-bit, rozdzielczość 0.01 jednostki (LP)
+ENCODING_UNSIGNED_SCALED = 1  # unsigned 16-bit skalowane do pełnego zakresu (MP/HP)
+
+# Rejestry czujnika
+REG_VALUE = 0x00  # 2 bajty, kodowanie wg ENCODING_*
+REG_STATUS = 0x01  # 1 bajt
+REG_CALIBRATION = 0x02  # 2 bajty
+REG_SNAPSHOT = 0x10  # wszystkie czujniki magistrali z jednego taktu
+LAST_SENSOR_REGISTER = REG_CALIBRATION  # koniec autoinkrementacji odczytu blokowego
+
+# Rejestr REG_SNAPSHOT: nagłówek (liczba czujników, chwila taktu [ms] mod 2^32)
+# i po jednym wpisie na czujnik magistrali
+SNAPSHOT_HEADER = struct.Struct('>HI')
+SNAPSHOT_ENTRY = np.dtype([('address', 'u1'), ('value', '>u2'), ('status', 'u1')])
+
+# Domyślny profil stanowiska: LP/MP/HP
+# value = offset + amplitude * sin(t / period_s + phase) + szum
+# Szum (noise.py): jitter (biały), pink (1/f), drift (błądzenie losowe na
+# sqrt(s)), step / step_rate (skoki offsetu), quantum (kwantyzacja wyniku)
+DEFAULT_PROFILE = (
+    {  # Low Pressure: -60 to +60 mbar, oscylacje wokół zera
+        'address': 0x48, 'name': 'LP', 'range': (-60, 60), 'unit': 'mbar', 'noise': 0.5,
+        'offset': 0.0, 'amplitude': 10.0, 'period_s': 10.0, 'jitter': 0.0,
+        'encoding': ENCODING_SIGNED_CENTI,
+    },
+    {  # Medium Pressure: 0-25 bar, wolne zmiany
+        'address': 0x49, 'name': 'MP', 'range': (0, 25), 'unit': 'bar', 'noise': 0.1,
+        'offset': 12.5, 'amplitude': 5.0, 'period_s': 30.0, 'jitter': 0.0,
+        'encoding': ENCODING_UNSIGNED_SCALED,
+    },
+    {  # High Pressure: 0-400 bar, stabilne z drobnymi zmianami
+        'address': 0x4A, 'name': 'HP', 'range': (0, 400), 'unit': 'bar', 'noise': 1.0,
+        'offset': 200.0, 'amplitude': 0.0, 'period_s': 1.0, 'jitter': 1.0,
+        'encoding': ENCODING_UNSIGNED_SCALED,
+    },
+)
+
+# Parametry czujnika przyjmowane przez SensorBank.add_sensor() i ich wartości domyślne
+SENSOR_DEFAULTS = {
+    'noise': 0.0, 'offset': 0.0, 'amplitude': 0.0, 'period_s': 1.0, 'phase': 0.0, 'jitter': 0.0,
+    'pink': 0.0, 'drift': 0.0, 'step': 0.0, 'step_rate': 0.0, 'quantum': 0.0,
+    'encoding': ENCODING_UNSIGNED_SCALED,
+}
+
+
+class SensorBank:
+    """Bank czujników w tablicach NumPy
+
+    Wartości, zakresy i parametry modeli wszystkich czujników (wszystkich
+    stanowisk) są tablicami, a update() przelicza je jedną operacją
+    wektorową na takt. Czujnik identyfikuje para (magistrala, adres I2C);
+    magistrala odpowiada stanowisku.
+    """
+
+    def __init__(self, seed: Optional[int] = None, resolution_s: float = 0.001,
+                 noise_block: int = 256):
+        self.rng = np.random.default_rng(seed)
+        self.resolution_s = resolution_s
+        self.noise_block = noise_block
+        self._noise = np.zeros(0)
+        self._noise_pos = 0
+        self.index: Dict[Tuple[int, int], int] = {}
+        self.names: List[str] = []
+        self.units: List[str] = []
+        self._columns: Dict[str, list] = {key: [] for key in (
+            'bus', 'address', 'range_min', 'range_max', 'noise', 'offset',
+            'amplitude', 'omega', 'phase', 'jitter', 'pink', 'drift', 'step', 'step_rate',
+            'quantum', 'encoding')}
+        self.value = np.zeros(0)
+        self._evaluated_at = np.zeros(0)
+        self.updated_at = 0.0
+        # Szum i dryft czujników (kolumna `noise` to nominalny szum z profilu)
+        empty = np.zeros(0)
+        self.noise_model = NoiseBank(self.rng, empty, empty, empty, empty, empty, block=noise_block)
+        # Model pneumatyczny -> (indeksy czujników, stanowiska)
+        self.plant_links: Dict[object, Tuple[np.ndarray, np.ndarray]] = {}
+        # Źródło śladu (TraceSource) -> (indeksy czujników, kanały śladu)
+        self.trace_links: Dict[object, Tuple[np.ndarray, np.ndarray]] = {}
+        self._linked_sensors = set()  # czujniki z wartością z modelu lub śladu
+        self._trace_of: Dict[int, Tuple[object, int]] = {}  # czujnik -> (źródło, kanał)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_sensor(self, bus: int, address: int, name: str, range: Tuple[float, float],
+                   unit: str, **params) -> int:
+        """Dodaje czujnik; params jak w SENSOR_DEFAULTS
+
+        Każde wywołanie przebudowuje tablice banku, więc wiele czujników
+        lepiej dodawać jednym add_sensors() (albo add_profile()).
+        """
+        return self.add_sensors([dict(params, bus=bus, address=address, name=name,
+                                      range=range, unit=unit)])[0]
+
+    def add_sensors(self, sensors: Sequence[dict]) -> List[int]:
+        """Dodaje czujniki (słowniki argumentów add_sensor()) jednym przebudowaniem tablic"""
+        rows = []
+        keys = set()
+        for sensor in sensors:
+            row = dict(SENSOR_DEFAULTS, **sensor)
+            unknown = set(row) - set(SENSOR_DEFAULTS) - {'bus', 'address', 'name', 'range', 'unit'}
+            if unknown:
+                raise TypeError(f"Unknown sensor parameters: {', '.join(sorted(unknown))}")
+            key = (row['bus'], row['address'])
+            if key in self.index or key in keys:
+                raise ValueError(f"Sensor 0x{key[1]:02X} already exists on bus {key[0]}")
+            keys.add(key)
+            rows.append(row)
+
+        added = []
+        for row in rows:
+            row['range_min'], row['range_max'] = row.pop('range')
+            row['omega'] = 1.0 / row.pop('period_s')
+            for column, values in self._columns.items():
+                values.append(row[column])
+            self.index[(row['bus'], row['address'])] = len(self.names)
+            added.append(len(self.names))
+            self.names.append(row['name'])
+            self.units.append(row['unit'])
+        if added:
+            self._build()
+        return added
+
+    def add_profile(self, profile=DEFAULT_PROFILE, buses=(0,)):
+        """Dodaje czujniki profilu na każdej z magistral (stanowisk)"""
+        self.add_sensors([dict(sensor, bus=bus) for bus in buses for sensor in profile])
+
+    def _build(self):
+        """Dobudowuje tablice o czujniki dodane od poprzedniego wywołania
+
+        Stan czujników już istniejących (wartość, szum, dryft) zostaje.
+        """
+        first = len(self.value)
+        added = len(self.names) - first
+        for column, values in self._columns.items():
+            dtype = np.int64 if column in ('bus', 'address', 'encoding') else np.float64
+            setattr(self, column, np.array(values, dtype=dtype))
+        self.value = np.concatenate([self.value, np.zeros(added)])
+        self._evaluated_at = np.concatenate([self._evaluated_at, np.full(added, np.nan)])  # krok resolution_s
+        self.noise_model.extend(self.jitter[first:], self.pink[first:], self.drift[first:],
+                                self.step[first:], self.step_rate[first:])
+        self._noisy = np.flatnonzero(self.noise_model.active)
+        self._quantized = np.flatnonzero(self.quantum > 0)
+        self.by_bus = {int(bus): np.flatnonzero(self.bus == bus) for bus in np.unique(self.bus)}
+        self._signed = self.encoding == ENCODING_SIGNED_CENTI
+
+    def attach_plant(self, plant, rig: int = 0, bus: int = 0, addresses=(0x48,)):
+        """Wartości czujników z komory stanowiska `rig` modelu pneumatycznego"""
+        indices, rigs = self.plant_links.get(plant, (np.zeros(0, int), np.zeros(0, int)))
+        new = np.array([self.index[(bus, addr)] for addr in addresses], dtype=int)
+        self.plant_links[plant] = (np.concatenate([indices, new]),
+                                   np.concatenate([rigs, np.full(len(new), rig)]))
+        self._linked_sensors.update(new.tolist())
+
+    def attach_trace(self, source, bus: int = 0, addresses=(0x48,), channels: Optional[Sequence[int]] = None):
+        """Wartości czujników z kanałów odtwarzanego śladu (TraceSource)"""
+        channels = range(len(addresses)) if channels is None else channels
+        if len(channels) != len(addresses):
+            raise ValueError("Each sensor address needs one trace channel")
+        if max(channels, default=0) >= source.trace.channels:
+            raise ValueError(f"Trace has only {source.trace.channels} channels")
+        indices, linked = self.trace_links.get(source, (np.zeros(0, int), np.zeros(0, int)))
+        new = np.array([self.index[(bus, addr)] for addr in addresses], dtype=int)
+        self.trace_links[source] = (np.concatenate([indices, new]),
+                                    np.concatenate([linked, np.asarray(channels, dtype=int)]))
+        self._linked_sensors.update(new.tolist())
+        self._trace_of.update((i, (source, channel)) for i, channel in zip(new.tolist(), channels))
+
+    def update(self, t: Optional[float] = None) -> np.ndarray:
+        """Przelicza wartości wszystkich czujników na chwilę t [s]"""
+        t = time.time() if t is None else t
+        value = self.offset + self.amplitude * np.sin(t * self.omega + self.phase)
+        for plant, (indices, rigs) in self.plant_links.items():
+            value[indices] = plant.read_all()[rigs]
+            noise = getattr(plant, 'sensor_noise', None)
+            if noise is not None:
+                value[indices] += self.standard_normal(len(indices)) * noise[rigs]
+        if len(self._noisy):
+            value[self._noisy] += self.noise_model.sample(self._noisy, t)
+        # Zarejestrowane ślady odtwarzane bez dodatkowego szumu
+        for source, (indices, channels) in self.trace_links.items():
+            value[indices] = source.values(t, channels)
+        if len(self._quantized):
+            quantum = self.quantum[self._quantized]
+            value[self._quantized] = np.round(value[self._quantized] / quantum) * quantum
+        np.clip(value, self.range_min, self.range_max, out=value)
+        self.value = value
+        self.updated_at = t
+        self._evaluated_at.fill(np.nan)
+        return value
+
+    def evaluate(self, indices, t: Optional[float] = None) -> np.ndarray:
+        """Wartości wybranych czujników na chwilę t [s], liczone na żądanie
+
+        Wynik jest zapamiętywany w obrębie kroku resolution_s: kolejne
+        odczyty z tego samego kroku zwracają tę samą wartość (także szum),
+        a czujników nieodczytywanych nikt nie przelicza.
+        """
+        t = time.time() if t is None else t
+        indices = np.asarray(indices, dtype=np.int64)
+        step = np.floor(t / self.resolution_s) if self.resolution_s > 0 else t
+        stale = indices[self._evaluated_at[indices] != step]
+        if len(stale):
+            self.value[stale] = self.offset[stale] + self.amplitude[stale] * np.sin(t * self.omega[stale] + self.phase[stale])
+            for plant, (linked, rigs) in self.plant_links.items():
+                selected = np.isin(linked, stale)
+                if not selected.any():
+                    continue
+                linked, rigs = linked[selected], rigs[selected]
+                value = plant.read_all()[rigs]
+                noise = getattr(plant, 'sensor_noise', None)
+                if noise is not None:
+                    value = value + self.standard_normal(len(rigs)) * noise[rigs]
+                self.value[linked] = value
+            noisy = stale[self.noise_model.active[stale]]
+            if len(noisy):
+                self.value[noisy] += self.noise_model.sample(noisy, t)
+            for source, (linked, channels) in self.trace_links.items():
+                selected = np.isin(linked, stale)
+                if selected.any():
+                    self.value[linked[selected]] = source.values(t, channels[selected])
+            quantized = stale[self.quantum[stale] > 0]
+            if len(quantized):
+                quantum = self.quantum[quantized]
+                self.value[quantized] = np.round(self.value[quantized] / quantum) * quantum
+            self.value[stale] = np.clip(self.value[stale], self.range_min[stale], self.range_max[stale])
+            self._evaluated_at[stale] = step
+        return self.value[indices]
+
+    def evaluate_one(self, i: int, t: Optional[float] = None) -> float:
+        """evaluate() dla jednego czujnika, bez narzutu indeksowania tablicami"""
+        t = time.time() if t is None else t
+        step = math.floor(t / self.resolution_s) if self.resolution_s > 0 else t
+        if self._evaluated_at[i] == step:
+            return float(self.value[i])
+        if i in self._linked_sensors:
+            if i not in self._trace_of:
+                return float(self.evaluate([i], t)[0])
+            source, channel = self._trace_of[i]
+            value = float(source.trace.sample(source.position(t))[channel])
+        else:
+            value = float(self.offset[i]) + float(self.amplitude[i]) * math.sin(t * float(self.omega[i]) + float(self.phase[i]))
+            value += self.noise_model.sample_one(i, t)
+        quantum = float(self.quantum[i])
+        if quantum > 0:
+            value = round(value / quantum) * quantum
+        value = min(max(value, float(self.range_min[i])), float(self.range_max[i]))
+        self.value[i] = value
+        self._evaluated_at[i] = step
+        return value
+
+    def standard_normal(self, n: int) -> np.ndarray:
+        """n próbek N(0, 1) z pregenerowanego bloku (losowanie blokami)"""
+        if self._noise_pos + n > len(self._noise):
+            self._noise = self.rng.standard_normal(max(self.noise_block, n))
+            self._noise_pos = 0
+        samples = self._noise[self._noise_pos:self._noise_pos + n]
+        self._noise_pos += n
+        return samples
+
+    def raw_values(self, indices=None) -> np.ndarray:
+        """Wartości w postaci 16-bitowych słów rejestru 0x00 (jako int)"""
+        idx = slice(None) if indices is None else indices
+        value = self.value[idx]
+        span = self.range_max[idx] - self.range_min[idx]
+        scaled = np.trunc((value - self.range_min[idx]) / span * 65535)
+        signed = np.trunc(value * 100)
+        return np.where(self._signed[idx], signed, scaled).astype(np.int64)
+
+    def encode_raw(self, i: int) -> bytes:
+        # Te same działania co raw_values(), na skalarach
+        value = float(self.value[i])
+        if self._signed[i]:
+            return struct.pack('>h', int(value * 100))
+        low = float(self.range_min[i])
+        return struct.pack('>H', int((value - low) / (float(self.range_max[i]) - low) * 65535))
 
 
 class PressureSensorSimulator:
-    """Symulator czujników ciśnienia LP/MP/HP dla C20"""
+    """Symulator czujników ciśnienia LP/MP/HP dla C20
+
+    Domyślnie jedno stanowisko z profilem LP/MP/HP (magistrala 0); przy
+    rigs > 1 każde stanowisko ma własną magistralę z tym samym profilem.
+
+    lazy=True: zamiast przeliczania wszystkich czujników co update_interval
+    wartość jest liczona przy odczycie na chwilę clock() (zegar można
+    podmienić na czas wirtualny) i zapamiętywana na resolution_s.
+    """
 
-    def __init__(self):
+    def __init__(self, rigs: int = 1, profile=DEFAULT_PROFILE, seed: Optional[int] = None,
+                 lazy: bool = False, resolution_s: float = 0.001,
+                 clock: Callable[[], float] = time.time):
+        self.bank = SensorBank(seed, resolution_s=resolution_s)
+        self.bank.add_profile(profile, buses=range(rigs))
+        self.update_interval = 0.1
+        self.lazy = lazy
+        self.clock = clock
+
+        # Metadane czujników magistrali 0 (adres -> opis)
         self.sensors = {
-            0x48: {  # Low Pressure: -60 to +60 mbar
-                'name': 'LP',
-                'range': (-60, 60),
-                'unit': 'mbar',
-                'value': 0.0,
-                'noise': 0.5
-            },
-            0x49: {  # Medium Pressure: 0-25 bar
-                'name': 'MP',
-                'range': (0, 25),
-                'unit': 'bar',
-                'value': 0.0,
-                'noise': 0.1
-            },
-            0x4A: {  # High Pressure: 0-400 bar
-                'name': 'HP',
-                'range': (0, 400),
-                'unit': 'bar',
-                'value': 0.0,
-                'noise': 1.0
+            sensor['address']: {
+                'name': sensor['name'],
+                'range': sensor['range'],
+                'unit': sensor['unit'],
+                'noise': sensor['noise'],
             }
+            for sensor in profile
         }
 
+    def attach_plant(self, plant, rig: int = 0, addresses=(0x48,), bus: Optional[int] = None):
+        """Podłącza czujniki do komory stanowiska w modelu pneumatycznym
+
+        plant: obiekt z metodą read_all() -> tablica ciśnień [mbar] (np. PneumaticPlant)
+        bus: magistrala czujników (domyślnie taka jak numer stanowiska)
+        """
+        self.bank.attach_plant(plant, rig=rig, bus=rig if bus is None else bus, addresses=addresses)
+
+    def attach_trace(self, trace, rig: int = 0, addresses=(0x48, 0x49, 0x4A),
+                     channels: Optional[Sequence[int]] = None, speed: float = 1.0,
+                     loop: bool = True, position_s: float = 0.0,
+                     bus: Optional[int] = None) -> TraceSource:
+        """Odtwarza zarejestrowany ślad na czujnikach stanowiska
+
+        trace: ścieżka pliku śladu albo TraceFile; stanowiska odtwarzające
+        ten sam plik współdzielą jedno mapowanie. Zwraca TraceSource do
+        sterowania odtwarzaniem (seek(), set_speed()).
+        """
+        if not isinstance(trace, TraceFile):
+            trace = TraceFile.open(trace)
+        source = TraceSource(trace, speed=speed, loop=loop, position_s=position_s)
+        source.seek(position_s, self.clock())  # odtwarzanie od chwili podłączenia
+        self.bank.attach_trace(source, bus=rig if bus is None else bus,
+                               addresses=addresses, channels=channels)
+        return source
+
+    def value(self, address: int, bus: int = 0) -> float:
+        i = self.bank.index[(bus, address)]
+        if self.lazy:
+            return self.bank.evaluate_one(i, self.clock())
+        return float(self.bank.value[i])
+
     async def simulate_pressure_changes(self):
-        """Symuluje zmiany ciśnienia w czasie"""
+        """Symuluje zmiany ciśnienia w czasie (w trybie lazy niepotrzebne)"""
+        if self.lazy:
+            return
         while True:
-            for addr, sensor in self.sensors.items():
-                # Symulacja zmian ciśnienia
-                if sensor['name'] == 'LP':
-                    # Oscylacje wokół zera
-                    sensor['value'] = 10 * np.sin(datetime.now().timestamp() / 10)
-                elif sensor['name'] == 'MP':
-                    # Wolne zmiany
-                    sensor['value'] = 12.5 + 5 * np.sin(datetime.now().timestamp() / 30)
-                else:  # HP
-                    # Stabilne z drobnymi zmianami
-                    sensor['value'] = 200 + np.random.normal(0, sensor['noise'])
-
-                # Ogranicz do zakresu
-                min_val, max_val = sensor['range']
-                sensor['value'] = max(min_val, min(max_val, sensor['value']))
-
-            await asyncio.sleep(0.1)
-
-    def read_sensor(self, address: int) -> bytes:
+            self.bank.update(self.clock())
+            await asyncio.sleep(self.update_interval)
+
+    async def record_history(self, history, interval_s: float = 0.01):
+        """Zapisuje próbki wszystkich czujników do SensorHistory co interval_s
+
+        W trybie lazy próbki są liczone na chwilę zapisu, w trybie zwykłym
+        zapisywany jest każdy nowy takt update().
+        """
+        indices = np.arange(len(self.bank))
+        recorded_at = None
+        while True:
+            if len(indices) != len(self.bank):  # czujniki dodane przez add_sensors()
+                indices = np.arange(len(self.bank))
+            if self.lazy:
+                t = self.clock()
+                history.record(t, self.bank.evaluate(indices, t))
+            elif self.bank.updated_at != recorded_at:
+                recorded_at = self.bank.updated_at
+                history.record(recorded_at, self.bank.value)
+            await asyncio.sleep(interval_s)
+
+    def read_sensor(self, address: int, bus: int = 0) -> bytes:
         """Odczytuje wartość z czujnika"""
-        if address in self.sensors:
-            sensor = self.sensors[address]
-            value = sensor['value']
-
-            # Konwersja na 16-bit (signed dla LP, unsigned dla MP/HP)
-            if sensor['name'] == 'LP':
-                # Signed 16-bit, rozdzielczość 0.01 mbar
-                raw = int(value * 100)
-                return struct.pack('>h', raw)  # Big-endian signed short
-            else:
-                # Unsigned 16-bit, skalowane do pełnego zakresu
-                min_val, max_val = sensor['range']
-                normalized = (value - min_val) / (max_val - min_val)
-                raw = int(normalized * 65535)
-                return struct.pack('>H', raw)  # Big-endian unsigned short
-
-        return b'\x00\x00'
-
-    async def handle_i2c_request(self, address: int, register: int) -> bytes:
+        i = self.bank.index.get((bus, address))
+        if i is None:
+            return b'\x00\x00'
+        if self.lazy:
+            self.bank.evaluate_one(i, self.clock())
+        # Signed 16-bit 0.01 mbar dla LP, unsigned 16-bit skalowane dla MP/HP
+        return self.bank.encode_raw(i)
+
+    def snapshot(self, bus: int = 0) -> bytes:
+        """Wartości wszystkich czujników magistrali z jednego taktu (REG_SNAPSHOT)"""
+        indices = self.bank.by_bus.get(bus)
+        if indices is None:
+            return SNAPSHOT_HEADER.pack(0, 0)
+        if self.lazy:
+            t = self.clock()
+            self.bank.evaluate(indices, t)
+        else:
+            t = self.bank.updated_at
+        entries = np.zeros(len(indices), dtype=SNAPSHOT_ENTRY)
+        entries['address'] = self.bank.address[indices]
+        entries['value'] = self.bank.raw_values(indices) & 0xFFFF
+        entries['status'] = 1
+        return SNAPSHOT_HEADER.pack(len(indices), int(t * 1000) & 0xFFFFFFFF) + entries.tobytes()
+
+    async def handle_i2c_request(self, address: int, register: int, bus: int = 0) -> bytes:
         """Obsługuje żądania I2C"""
-        if register == 0x00:  # Odczyt wartości
-            return self.read_sensor(address)
-        elif register == 0x01:  # Status czujnika
-            return b'\x01' if address in self.sensors else b'\x00'
-        elif register == 0x02:  # Kalibracja
+        if register == REG_VALUE:  # Odczyt wartości
+            return self.read_sensor(address, bus)
+        elif register == REG_STATUS:  # Status czujnika
+            return b'\x01' if (bus, address) in self.bank.index else b'\x00'
+        elif register == REG_CALIBRATION:  # Kalibracja
             # Symulacja kalibracji
             return b'OK'
+        elif register == REG_SNAPSHOT:
+            return self.snapshot(bus)
         else:
             return b'\xFF\xFF'
 
+    async def read_registers(self, address: int, register: int, length: int = 0, bus: int = 0) -> bytes:
+        """Odczyt blokowy z autoinkrementacją rejestru
+
+        length=0 zwraca sam rejestr `register`; większa długość dokleja
+        kolejne rejestry czujnika (register + 1, ... do LAST_SENSOR_REGISTER)
+        aż do length bajtów, jak przy odczycie sekwencyjnym z układu I2C.
+        Dalej 0xFF; REG_SNAPSHOT (cała magistrala) tylko odczytem wprost.
+        """
+        data = await self.handle_i2c_request(address, register, bus)
+        if not length:
+            return data
+        data = bytearray(data)
+        register += 1
+        while len(data) < length and register <= LAST_SENSOR_REGISTER:
+            data += await self.handle_i2c_request(address, register, bus)
+            register += 1
+        return bytes(data[:length]).ljust(length, b'\xFF')
+
 
 # Uruchom symulator
 async def main():
-    simulator = PressureSensorSimulator()
+    simulator = PressureSensorSimulator(lazy=os.environ.get('SENSOR_LAZY', '0') == '1')
 
     # Uruchom symulację zmian ciśnienia
     asyncio.create_task(simulator.simulate_pressure_changes())
 
+    # Historia wartości (100 Hz, domyślnie 1 h) i jej API HTTP
+    history = SensorHistory(len(simulator.bank), int(os.environ.get('HISTORY_SAMPLES', '360000')))
+    asyncio.create_task(simulator.record_history(history))
+    run_history_server(simulator, history, port=int(os.environ.get('HTTP_PORT', '5001')))
+
+    # Publikacja zmian wartości przez MQTT
+    if os.environ.get('MQTT_BROKER'):
+        publisher = SensorPublisher(simulator, broker=os.environ['MQTT_BROKER'])
+        publisher.connect()
+        asyncio.create_task(publisher.run())
+
     # Nasłuchuj na żądania I2C
-    # TODO: Implementacja serwera I2C
+    server = I2CServer(simulator)
+    await server.start()
 
     while True:
         await asyncio.sleep(1)
         # Debug output
         for addr, sensor in simulator.sensors.items():
-            print(f"{sensor['name']}: {sensor['value']:.2f} {sensor['unit']}")
+            print(f"{sensor['name']}: {simulator.value(addr):.2f} {sensor['unit']}")
+        if server.requests:
+            print(f"I2C: {server.stats()}")
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
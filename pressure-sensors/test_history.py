@@ -0,0 +1,133 @@
+"""
+Testy historii czujników i decymacji min/max oraz LTTB
+Uruchomienie: python -m pytest pressure-sensors
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from history import SensorHistory, create_history_app, downsample, downsample_lttb, downsample_minmax
+from sensors import SensorBank
+
+
+def signal(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.uniform(0.005, 0.015, n))
+    values = np.sin(times) + rng.normal(0, 0.1, n)
+    values[n // 3] = 10.0  # szpilki, które wykres musi pokazać
+    values[2 * n // 3] = -10.0
+    return times, values
+
+
+def minmax_reference(times, values, points):
+    """Ta sama decymacja pętlą po przedziałach"""
+    buckets = max(points // 2, 1)
+    size = -(-len(values) // buckets)
+    indices = []
+    for start in range(0, len(values), size):
+        chunk = values[start:start + size]
+        low, high = start + int(np.argmin(chunk)), start + int(np.argmax(chunk))
+        indices += sorted({low, high})
+    return times[indices], values[indices]
+
+
+def lttb_reference(times, values, points):
+    """LTTB wprost z definicji (Steinarsson 2013), na tych samych przedziałach"""
+    n = len(values)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = [0]
+    for bucket in range(points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        next_high = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        mean_t, mean_v = times[high:next_high].mean(), values[high:next_high].mean()
+        a = selected[-1]
+        best, best_area = low, -1.0
+        for i in range(low, high):
+            area = abs((times[a] - mean_t) * (values[i] - values[a])
+                       - (times[a] - times[i]) * (mean_v - values[a]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+    selected.append(n - 1)
+    return times[selected], values[selected]
+
+
+@pytest.mark.parametrize('n, points', [(1000, 100), (1001, 100), (997, 64), (50, 7), (10000, 2)])
+def test_minmax_matches_reference(n, points):
+    times, values = signal(n)
+    t, v = downsample_minmax(times, values, points)
+    expected_t, expected_v = minmax_reference(times, values, points)
+    np.testing.assert_array_equal(t, expected_t)
+    np.testing.assert_array_equal(v, expected_v)
+    assert len(v) <= max(points, 2)
+    assert np.all(np.diff(t) > 0)
+    assert v.max() == values.max() and v.min() == values.min()
+
+
+@pytest.mark.parametrize('n, points', [(1000, 100), (1001, 100), (997, 64), (50, 7), (10000, 3)])
+def test_lttb_matches_reference(n, points):
+    times, values = signal(n)
+    t, v = downsample_lttb(times, values, points)
+    expected_t, expected_v = lttb_reference(times, values, points)
+    np.testing.assert_array_equal(t, expected_t)
+    np.testing.assert_array_equal(v, expected_v)
+    assert len(v) == points
+    assert (t[0], t[-1]) == (times[0], times[-1])
+    assert np.all(np.diff(t) > 0)
+
+
+def test_lttb_keeps_spikes():
+    times, values = signal(5000)
+    _, v = downsample_lttb(times, values, 200)
+    assert 10.0 in v and -10.0 in v
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_short_series_pass_through(method):
+    times, values = signal(40)
+    t, v = downsample(times, values, 100, method)
+    assert t is times and v is values
+
+
+def test_unknown_method():
+    times, values = signal(10)
+    with pytest.raises(ValueError):
+        downsample(times, values, 5, 'mean')
+
+
+def test_history_window_across_wrap():
+    history = SensorHistory(sensors=2, capacity=8)
+    for i in range(13):
+        history.record(float(i), np.array([i, -i]))
+    times, values = history.window(1)
+    np.testing.assert_array_equal(times, np.arange(5, 13))
+    np.testing.assert_array_equal(values, -np.arange(5, 13))
+    times, values = history.window(0, start=6.5, end=9.0)
+    np.testing.assert_array_equal(times, [7.0, 8.0, 9.0])
+    np.testing.assert_array_equal(values, [7.0, 8.0, 9.0])
+
+
+def test_lttb_with_two_points_keeps_the_ends():
+    times, values = signal(1000)
+    t, v = downsample_lttb(times, values, 2)
+    np.testing.assert_array_equal(t, times[[0, -1]])
+    np.testing.assert_array_equal(v, values[[0, -1]])
+    with pytest.raises(ValueError):
+        downsample_lttb(times, values, 1)
+
+
+def test_history_endpoint_limits_points():
+    bank = SensorBank(seed=1)
+    bank.add_sensor(0, 0x48, 'LP', (-60, 60), 'mbar')
+    history = SensorHistory(sensors=len(bank), capacity=5000)
+    for i in range(3000):
+        history.record(i * 0.01, np.full(len(bank), np.sin(i * 0.01)))
+    client = create_history_app(SimpleNamespace(bank=bank), history).test_client()
+    for method in ('minmax', 'lttb'):
+        response = client.get(f'/api/history?address=0x48&points=2&method={method}')
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['samples'] == 3000 and len(body['values']) <= 2
+    assert client.get('/api/history?address=0x48&points=1').status_code == 400
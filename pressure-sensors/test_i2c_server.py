@@ -0,0 +1,114 @@
+"""
+Testy serwera I2C przez gniazdo TCP na pętli zwrotnej: ramki, NACK/ERROR,
+kolejność odpowiedzi przy pipeliningu i statystyki rejestrów
+Uruchomienie: python -m pytest pressure-sensors
+"""
+
+import asyncio
+import random
+
+import pytest
+
+from i2c_server import REQUEST, RESPONSE, STATUS_ERROR, STATUS_NACK, STATUS_OK, I2CClient, I2CServer
+from sensors import REG_SNAPSHOT, SNAPSHOT_ENTRY, SNAPSHOT_HEADER, PressureSensorSimulator
+
+
+def serve(test, simulator=None, unix_path=None):
+    """Uruchamia test(server, client) z serwerem na porcie efemerycznym"""
+    async def run():
+        nonlocal simulator
+        if simulator is None:
+            simulator = PressureSensorSimulator(rigs=2, seed=1)
+            simulator.bank.update(5.0)
+        server = I2CServer(simulator, unix_path=unix_path, tcp_host='127.0.0.1',
+                           tcp_port=None if unix_path else 0)
+        await server.start()
+        client = await (I2CClient.connect(unix_path) if unix_path
+                        else I2CClient.connect(host='127.0.0.1', port=server.tcp_port))
+        try:
+            return await test(server, client)
+        finally:
+            await client.close()
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_pipelined_responses_keep_request_order(capsys):
+    rng = random.Random(7)
+    requests = [(rng.choice([0x48, 0x49, 0x4A, 0x50]), rng.choice([0x00, 0x01, 0x02, 0x05]),
+                 rng.choice([0, 0, 1, 5]), rng.choice([0, 1, 7])) for _ in range(300)]
+
+    async def test(server, client):
+        simulator = server.simulator
+        expected = []
+        for address, register, length, bus in requests:
+            if (bus, address) in simulator.bank.index:
+                expected.append((STATUS_OK, await simulator.read_registers(address, register, length, bus)))
+            else:
+                expected.append((STATUS_NACK, b''))
+        assert await client.read_many(requests) == expected
+        return server.stats()
+
+    stats = serve(test)
+    assert stats['requests'] == 300
+    counts = {register: sum(1 for request in requests if request[1] == register) for register in (0, 1, 2, 5)}
+    assert {key: value['count'] for key, value in stats['registers'].items()} == {
+        f"0x{register:02X}": count for register, count in counts.items()}
+    capsys.readouterr()
+
+
+def test_requests_split_across_writes(capsys):
+    async def test(server, client):
+        frames = REQUEST.pack(0x48, 0x00, 0, 1) + REQUEST.pack(0x49, 0x01, 0, 0)
+        for i in range(len(frames)):  # bajt po bajcie
+            client.writer.write(frames[i:i + 1])
+            await client.writer.drain()
+            await asyncio.sleep(0)
+        responses = []
+        for _ in range(2):
+            status, length = RESPONSE.unpack(await client.reader.readexactly(RESPONSE.size))
+            responses.append((status, await client.reader.readexactly(length)))
+        return responses, server.simulator.read_sensor(0x48, bus=1)
+
+    responses, value = serve(test)
+    assert responses == [(STATUS_OK, value), (STATUS_OK, b'\x01')]
+
+
+def test_nack_and_error_statuses(capsys):
+    class FailingSimulator(PressureSensorSimulator):
+        async def read_registers(self, address, register, length=0, bus=0):
+            if register == 0x07:
+                raise RuntimeError("register fault")
+            return await super().read_registers(address, register, length, bus)
+
+    async def test(server, client):
+        responses = await client.read_many([(0x50, 0, 0, 0), (0x48, 0x07, 0, 0), (0x48, 0x01, 0, 0)])
+        with pytest.raises(IOError):
+            await client.read(0x48, 0x07)
+        return responses
+
+    assert serve(test, FailingSimulator(seed=1)) == [(STATUS_NACK, b''), (STATUS_ERROR, b''), (STATUS_OK, b'\x01')]
+    assert 'register fault' in capsys.readouterr().out
+
+
+def test_snapshot_longer_than_255_bytes(capsys):
+    simulator = PressureSensorSimulator(seed=2)
+    simulator.bank.add_sensors([{'bus': 0, 'address': 0x4B + i, 'name': f'S{i}', 'range': (0, 10),
+                                 'unit': 'bar', 'offset': i / 10} for i in range(100)])
+    simulator.bank.update(1.0)
+
+    async def test(server, client):
+        return await client.read(0x48, REG_SNAPSHOT)
+
+    data = serve(test, simulator)
+    count, _ = SNAPSHOT_HEADER.unpack_from(data)
+    assert count == 103 and len(data) == SNAPSHOT_HEADER.size + 103 * SNAPSHOT_ENTRY.itemsize > 255
+
+
+def test_unix_socket(tmp_path, capsys):
+    async def test(server, client):
+        return await client.read(0x49, 0x00, 5)
+
+    data = serve(test, unix_path=str(tmp_path / 'i2c' / 'sensors.sock'))
+    assert len(data) == 5 and data[2:] == b'\x01OK'
@@ -0,0 +1,115 @@
+"""
+Testy modeli szumu i dryftu (NoiseBank) oraz dobudowywania banku czujników
+Uruchomienie: python -m pytest pressure-sensors
+"""
+
+import numpy as np
+import pytest
+
+from noise import NoiseBank
+from sensors import SensorBank
+
+
+def make_bank(seed=1, block=64, **params):
+    n = max(len(np.atleast_1d(value)) for value in params.values()) if params else 1
+    columns = {name: np.broadcast_to(np.asarray(params.get(name, 0.0), dtype=float), n).copy()
+               for name in ('white', 'pink', 'drift', 'step', 'step_rate')}
+    return NoiseBank(np.random.default_rng(seed), block=block, **columns)
+
+
+def test_block_must_be_power_of_two():
+    with pytest.raises(ValueError):
+        make_bank(block=100, white=1.0)
+
+
+def test_white_noise_level():
+    bank = make_bank(white=[0.5, 2.0, 0.0])
+    samples = np.array([bank.sample(np.arange(3), t * 0.01) for t in range(4000)])
+    np.testing.assert_allclose(samples.std(axis=0)[:2], [0.5, 2.0], rtol=0.05)
+    assert not samples[:, 2].any()
+    assert not bank.active[2]
+
+
+def test_pink_noise_level_and_correlation():
+    bank = make_bank(pink=np.ones(200), block=256)
+    samples = np.array([bank.sample(np.arange(200), t * 0.01) for t in range(256)])
+    assert samples.std() == pytest.approx(1.0, rel=0.1)
+    # 1/f: sąsiednie próbki są silnie skorelowane, w odróżnieniu od szumu białego
+    lag1 = np.mean([np.corrcoef(samples[:-1, i], samples[1:, i])[0, 1] for i in range(200)])
+    assert lag1 > 0.5
+
+
+@pytest.mark.parametrize('period_s', [0.01, 0.1])
+def test_drift_does_not_depend_on_read_rate(period_s):
+    sensors = 400
+    bank = make_bank(drift=np.full(sensors, 0.2))
+    duration = 4.0
+    for t in np.arange(0.0, duration + period_s / 2, period_s):
+        values = bank.sample(np.arange(sensors), t)
+    # Błądzenie losowe: odchylenie 0.2 * sqrt(4 s)
+    assert values.std() == pytest.approx(0.2 * np.sqrt(duration), rel=0.1)
+
+
+def test_step_rate():
+    sensors = 500
+    bank = make_bank(step=np.full(sensors, 1.0), step_rate=np.full(sensors, 0.5))
+    changes = np.zeros(sensors)
+    previous = bank.sample(np.arange(sensors), 0.0)
+    for t in np.arange(0.1, 20.0, 0.1):
+        values = bank.sample(np.arange(sensors), t)
+        changes += values != previous
+        previous = values
+    # Poisson 0.5/s przez 20 s; kilka skoków może wypaść w tym samym kroku
+    assert changes.mean() == pytest.approx(10.0, rel=0.1)
+
+
+def test_same_seed_same_sequence():
+    params = dict(white=[0.1, 0.0, 0.2], pink=[0.0, 0.3, 0.1], drift=[0.0, 0.1, 0.05],
+                  step=[0.5, 0.0, 0.0], step_rate=[1.0, 0.0, 0.0])
+    first, second = make_bank(**params), make_bank(**params)
+    for t in np.arange(0.0, 5.0, 0.01):
+        np.testing.assert_array_equal(first.sample(np.arange(3), t), second.sample(np.arange(3), t))
+
+
+def test_sample_one_matches_sample():
+    params = dict(white=[0.1, 0.0, 0.2], pink=[0.0, 0.3, 0.1], drift=[0.0, 0.1, 0.05],
+                  step=[0.5, 0.0, 0.0], step_rate=[1.0, 0.0, 0.0])
+    vector, scalar = make_bank(**params), make_bank(**params)
+    for t in np.arange(0.0, 3.0, 0.01):
+        for i in range(3):
+            assert scalar.sample_one(i, t) == pytest.approx(vector.sample(np.array([i]), t)[0], abs=1e-12)
+
+
+def test_extend_keeps_existing_state():
+    params = dict(white=[0.1, 0.2], drift=[0.05, 0.1])
+    reference, extended = make_bank(block=256, **params), make_bank(block=256, **params)
+    times = np.arange(0.0, 1.0, 0.01)
+    for t in times[:50]:
+        reference.sample(np.arange(2), t)
+        extended.sample(np.arange(2), t)
+    extended.extend(white=[1.0], pink=[0.0], drift=[0.0], step=[0.0], step_rate=[0.0])
+    assert len(extended) == 3
+    # Bieżący blok i dryft dotychczasowych czujników się nie zmieniły
+    for t in times[50:]:
+        np.testing.assert_array_equal(extended.sample(np.arange(2), t), reference.sample(np.arange(2), t))
+    assert extended.sample(np.array([2]), 1.0)[0] != 0.0
+
+
+def test_sensor_bank_append_keeps_values():
+    bank = SensorBank(seed=3)
+    bank.add_profile(buses=(0,))
+    bank.add_sensor(0, 0x50, 'D', (-1000, 1000), 'mbar', drift=1.0)
+    for t in np.arange(0.0, 2.0, 0.1):
+        bank.update(t)
+    walk = bank.noise_model.walk.copy()
+    phase = bank.phase.copy()
+    added = bank.add_sensors([{'bus': 1, 'address': 0x48, 'name': 'LP', 'range': (-60, 60),
+                               'unit': 'mbar', 'jitter': 0.5}])
+    assert added == [4]
+    np.testing.assert_array_equal(bank.noise_model.walk[:4], walk)
+    np.testing.assert_array_equal(bank.phase[:4], phase)
+    assert sorted(bank.by_bus) == [0, 1]
+    with pytest.raises(ValueError):
+        bank.add_sensor(1, 0x48, 'LP', (-60, 60), 'mbar')
+    with pytest.raises(TypeError):
+        bank.add_sensor(1, 0x49, 'X', (0, 1), 'bar', colour='red')
@@ -0,0 +1,91 @@
+"""
+Testy publikacji wartości czujników (martwa strefa, limity częstości, paczki)
+Uruchomienie: python -m pytest pressure-sensors
+"""
+
+import json
+from types import SimpleNamespace
+
+import numpy as np
+
+from history import SensorHistory
+from publisher import SensorPublisher
+from sensors import SensorBank
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload):
+        self.published.append((topic, json.loads(payload)))
+
+
+def make_publisher(**kwargs):
+    bank = SensorBank(seed=1)
+    bank.add_sensors([
+        {'bus': 0, 'address': 0x48, 'name': 'LP', 'range': (-60, 60), 'unit': 'mbar', 'noise': 0.5},
+        {'bus': 0, 'address': 0x49, 'name': 'MP', 'range': (0, 25), 'unit': 'bar', 'noise': 0.1},
+        {'bus': 1, 'address': 0x48, 'name': 'LP', 'range': (-60, 60), 'unit': 'mbar', 'noise': 0.5},
+    ])
+    simulator = SimpleNamespace(bank=bank, lazy=False)
+    client = FakeClient()
+    return SensorPublisher(simulator, client=client, **kwargs), bank, client
+
+
+def tick(publisher, bank, t, values):
+    bank.value = np.array(values, dtype=float)
+    message = publisher.tick(t)
+    return None if message is None else [(s['bus'], s['address'], s['value']) for s in message['sensors']]
+
+
+def test_first_tick_publishes_every_sensor_in_one_message():
+    publisher, bank, client = make_publisher()
+    assert tick(publisher, bank, 0.0, [1.0, 2.0, 3.0]) == [(0, '0x48', 1.0), (0, '0x49', 2.0), (1, '0x48', 3.0)]
+    assert len(client.published) == 1
+    topic, message = client.published[0]
+    assert topic == 'c20/sensors/pressure' and message['timestamp'] == 0.0
+    assert message['sensors'][1] == {'bus': 0, 'address': '0x49', 'name': 'MP', 'unit': 'bar', 'value': 2.0}
+
+
+def test_deadband_defaults_to_profile_noise():
+    publisher, bank, client = make_publisher()
+    tick(publisher, bank, 0.0, [1.0, 2.0, 3.0])
+    assert tick(publisher, bank, 1.0, [1.4, 2.05, 3.5]) is None  # w martwej strefie
+    assert tick(publisher, bank, 2.0, [1.6, 2.05, 3.6]) == [(0, '0x48', 1.6), (1, '0x48', 3.6)]
+    # Odniesieniem jest wartość opublikowana, nie poprzedni odczyt
+    assert tick(publisher, bank, 3.0, [1.6, 2.15, 3.6]) == [(0, '0x49', 2.15)]
+    assert publisher.stats == {'ticks': 4, 'messages': 3, 'values': 6, 'suppressed': 6}
+
+
+def test_deadband_per_sensor():
+    publisher, bank, _ = make_publisher(deadband={(1, 0x48): 5.0, 0x49: 0.0})
+    np.testing.assert_array_equal(publisher.deadband, [0.0, 0.0, 5.0])
+    tick(publisher, bank, 0.0, [1.0, 2.0, 3.0])
+    assert tick(publisher, bank, 1.0, [1.0, 2.01, 7.0]) == [(0, '0x49', 2.01)]
+
+
+def test_min_and_max_interval():
+    publisher, bank, _ = make_publisher(deadband=0.1, min_interval_s=0.5, max_interval_s=2.0)
+    tick(publisher, bank, 0.0, [1.0, 2.0, 3.0])
+    assert tick(publisher, bank, 0.2, [5.0, 2.0, 3.0]) is None  # zmiana, ale przed min_interval_s
+    assert tick(publisher, bank, 0.5, [5.0, 2.0, 3.0]) == [(0, '0x48', 5.0)]
+    assert tick(publisher, bank, 1.9, [5.0, 2.0, 3.0]) is None
+    # Odświeżenie bez zmiany wartości po max_interval_s
+    assert tick(publisher, bank, 2.0, [5.0, 2.0, 3.0]) == [(0, '0x49', 2.0), (1, '0x48', 3.0)]
+    assert tick(publisher, bank, 2.5, [5.0, 2.0, 3.0]) == [(0, '0x48', 5.0)]
+
+
+def test_sensors_added_after_start_are_published_and_recorded():
+    publisher, bank, client = make_publisher(deadband=0.1)
+    history = SensorHistory(len(bank), capacity=16)
+    tick(publisher, bank, 0.0, [1.0, 2.0, 3.0])
+    history.record(0.0, bank.value)
+    bank.add_sensors([{'bus': 2, 'address': 0x4A, 'name': 'HP', 'range': (0, 400), 'unit': 'bar'}])
+    assert tick(publisher, bank, 1.0, [1.0, 2.0, 3.0, 200.0]) == [(2, '0x4A', 200.0)]
+    assert client.published[-1][1]['sensors'][0]['name'] == 'HP'
+    history.record(1.0, bank.value)
+    times, values = history.window(3)
+    np.testing.assert_array_equal(times, [1.0])
+    np.testing.assert_array_equal(values, [200.0])
+    np.testing.assert_array_equal(history.window(0)[1], [1.0, 1.0])
@@ -0,0 +1,217 @@
+"""
+Testy banku czujników (SensorBank) i symulatora PressureSensorSimulator
+Uruchomienie: python -m pytest pressure-sensors
+"""
+
+import asyncio
+import math
+
+import numpy as np
+import pytest
+
+from sensors import (
+    DEFAULT_PROFILE, REG_CALIBRATION, REG_SNAPSHOT, REG_STATUS, REG_VALUE, SNAPSHOT_ENTRY, SNAPSHOT_HEADER,
+    PressureSensorSimulator, SensorBank
+)
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def noisy_bank(resolution_s=0.01):
+    bank = SensorBank(seed=5, resolution_s=resolution_s)
+    bank.add_sensors([
+        {'bus': 0, 'address': 0x48, 'name': 'A', 'range': (-100, 100), 'unit': 'mbar',
+         'amplitude': 10.0, 'period_s': 2.0, 'jitter': 1.0},
+        {'bus': 0, 'address': 0x49, 'name': 'B', 'range': (-100, 100), 'unit': 'mbar',
+         'offset': 5.0, 'drift': 0.5, 'quantum': 0.25},
+        {'bus': 1, 'address': 0x48, 'name': 'C', 'range': (0, 1), 'unit': 'bar', 'offset': 3.0},
+    ])
+    return bank
+
+
+def test_evaluate_is_memoized_within_resolution_step():
+    bank = noisy_bank()
+    indices = np.arange(3)
+    first = bank.evaluate(indices, 1.001).copy()
+    # Ten sam krok 10 ms: ta sama wartość, także szum
+    np.testing.assert_array_equal(bank.evaluate(indices, 1.009), first)
+    assert bank.evaluate_one(0, 1.005) == first[0]
+    later = bank.evaluate(indices, 1.011)
+    assert later[0] != first[0]
+    assert later[1] % 0.25 == 0.0 and later[2] == 1.0  # kwantyzacja i zakres
+
+
+def test_evaluate_one_matches_evaluate():
+    vector, scalar = noisy_bank(), noisy_bank()
+    for t in np.arange(0.0, 2.0, 0.013):
+        # Ta sama kolejność losowania: czujnik po czujniku
+        for i in range(3):
+            assert scalar.evaluate_one(i, t) == pytest.approx(vector.evaluate([i], t)[0], abs=1e-12)
+
+
+class CountingPlant:
+    def __init__(self):
+        self.reads = 0
+
+    def read_all(self):
+        self.reads += 1
+        return np.array([42.0])
+
+
+def test_only_read_sensors_are_evaluated():
+    bank = noisy_bank()
+    plant = CountingPlant()
+    bank.attach_plant(plant, bus=1, addresses=(0x48,))
+    bank.evaluate([0, 1], 0.5)
+    assert plant.reads == 0  # czujnik modelu nie był odczytywany
+    assert bank.evaluate_one(2, 0.5) == 1.0  # 42 mbar obcięte do zakresu 0-1
+    bank.evaluate([2], 0.505)
+    assert plant.reads == 1
+    bank.evaluate([2], 0.51)
+    assert plant.reads == 2
+
+
+def test_update_invalidates_memoized_values():
+    bank = noisy_bank()
+    memoized = bank.evaluate([0], 1.0)[0]
+    bank.update(3.0)
+    assert bank.evaluate([0], 1.0)[0] != memoized
+
+
+def test_phase_parameter():
+    bank = SensorBank(seed=1)
+    bank.add_sensors([
+        {'bus': 0, 'address': 0x48 + i, 'name': str(i), 'range': (-2, 2), 'unit': 'mbar',
+         'amplitude': 1.0, 'period_s': 1.0, 'phase': phase}
+        for i, phase in enumerate((0.0, math.pi / 2, math.pi))
+    ])
+    np.testing.assert_allclose(bank.update(0.0), [0.0, 1.0, 0.0], atol=1e-12)
+    np.testing.assert_allclose(bank.evaluate([1, 2], 0.25), np.sin([0.25 + math.pi / 2, 0.25 + math.pi]))
+
+
+def test_lazy_simulator_reads_on_its_clock():
+    clock = FakeClock(100.0)
+    simulator = PressureSensorSimulator(seed=2, lazy=True, resolution_s=0.001, clock=clock)
+    value = simulator.value(0x4A)
+    raw = simulator.read_sensor(0x4A)
+    assert simulator.value(0x4A) == value
+    clock.now += 0.0005
+    assert simulator.read_sensor(0x4A) == raw
+    clock.now += 0.01
+    assert simulator.value(0x4A) != value  # HP ma szum biały
+    expected_lp = 10.0 * math.sin(clock.now / 10.0)
+    assert simulator.value(0x48) == pytest.approx(expected_lp)
+
+
+def test_burst_read_covers_sensor_registers_only():
+    simulator = PressureSensorSimulator(seed=3)
+    simulator.bank.update(12.0)
+
+    async def read(register, length):
+        return await simulator.read_registers(0x49, register, length)
+
+    value = asyncio.run(read(REG_VALUE, 0))
+    assert asyncio.run(read(REG_VALUE, 5)) == value + b'\x01' + b'OK'
+    assert asyncio.run(read(REG_STATUS, 3)) == b'\x01OK'
+    # Za rejestrem kalibracji: 0xFF, bez wejścia w REG_SNAPSHOT
+    assert asyncio.run(read(REG_VALUE, 40)) == value + b'\x01OK' + b'\xFF' * 35
+    assert asyncio.run(read(REG_CALIBRATION, 1)) == b'O'
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_snapshot_words_match_value_register(lazy):
+    clock = FakeClock(50.0)
+    simulator = PressureSensorSimulator(rigs=2, seed=4, lazy=lazy, clock=clock)
+    if not lazy:
+        simulator.bank.update(clock.now)
+    data = asyncio.run(simulator.read_registers(0x48, REG_SNAPSHOT, 0, bus=1))
+    count, tick_ms = SNAPSHOT_HEADER.unpack_from(data)
+    entries = np.frombuffer(data, SNAPSHOT_ENTRY, offset=SNAPSHOT_HEADER.size)
+    assert (count, tick_ms) == (3, 50000)
+    assert entries['address'].tolist() == [0x48, 0x49, 0x4A]
+    for entry in entries:
+        raw = simulator.read_sensor(int(entry['address']), bus=1)  # ten sam krok zegara
+        assert int(entry['value']).to_bytes(2, 'big') == raw
+        assert entry['status'] == 1
+
+
+def reference_values(t, sensors, plant_channels=None):
+    """Dawna pętla po czujnikach (przed SensorBank), bez szumu HP"""
+    values = {}
+    for addr, sensor in sensors.items():
+        if addr in (plant_channels or {}):
+            plant, rig = plant_channels[addr]
+            value = plant.read_pressure(rig)
+        elif sensor['name'] == 'LP':
+            value = 10 * np.sin(t / 10)
+        elif sensor['name'] == 'MP':
+            value = 12.5 + 5 * np.sin(t / 30)
+        else:
+            value = 200.0
+        min_val, max_val = sensor['range']
+        values[addr] = max(min_val, min(max_val, value))
+    return values
+
+
+def reference_raw(value, sensor):
+    if sensor['name'] == 'LP':
+        return int(value * 100)
+    min_val, max_val = sensor['range']
+    return int((value - min_val) / (max_val - min_val) * 65535)
+
+
+REFERENCE_SENSORS = {
+    0x48: {'name': 'LP', 'range': (-60, 60)},
+    0x49: {'name': 'MP', 'range': (0, 25)},
+    0x4A: {'name': 'HP', 'range': (0, 400)},
+}
+
+
+def test_vectorized_update_matches_per_sensor_loop():
+    profile = [dict(sensor, jitter=0.0) for sensor in DEFAULT_PROFILE]
+    bank = SensorBank(seed=1)
+    bank.add_profile(profile, buses=range(3))
+    for t in np.linspace(0.0, 200.0, 97):
+        values = bank.update(t)
+        raw = bank.raw_values()
+        expected = reference_values(t, REFERENCE_SENSORS)
+        for (bus, address), i in bank.index.items():
+            assert values[i] == pytest.approx(expected[address], abs=1e-9)
+            word = reference_raw(expected[address], REFERENCE_SENSORS[address])
+            assert raw[i] == word
+            assert int.from_bytes(bank.encode_raw(i), 'big', signed=address == 0x48) == word
+
+
+class FixedPlant:
+    def __init__(self, pressures):
+        self.pressures = np.array(pressures)
+
+    def read_all(self):
+        return self.pressures
+
+    def read_pressure(self, rig):
+        return float(self.pressures[rig])
+
+
+def test_vectorized_update_clips_and_reads_plants():
+    bank = SensorBank(seed=1)
+    bank.add_profile(buses=(0, 1))
+    plant = FixedPlant([80.0, -75.0])
+    bank.attach_plant(plant, rig=0, bus=0)
+    bank.attach_plant(plant, rig=1, bus=1)
+    values = bank.update(12.0)
+    for bus in (0, 1):
+        expected = reference_values(12.0, REFERENCE_SENSORS, {0x48: (plant, bus)})
+        assert values[bank.index[(bus, 0x48)]] == expected[0x48]
+        assert values[bank.index[(bus, 0x49)]] == pytest.approx(expected[0x49])
+    assert values[bank.index[(0, 0x48)]] == 60.0 and values[bank.index[(1, 0x48)]] == -60.0
+    # HP: 200 bar z szumem białym o odchyleniu z profilu
+    hp = [bank.update(t)[bank.index[(0, 0x4A)]] for t in np.arange(2000) * 0.01]
+    assert np.mean(hp) == pytest.approx(200.0, abs=0.2)
+    assert np.std(hp) == pytest.approx(1.0, rel=0.1)
@@ -0,0 +1,87 @@
+"""
+Testy odtwarzania śladów: interpolacja, końce śladu, pętla, przewijanie,
+zmiana prędkości i współdzielone mapowanie pliku
+Uruchomienie: python -m pytest pressure-sensors
+"""
+
+import numpy as np
+import pytest
+
+from sensors import PressureSensorSimulator
+from trace_playback import TraceFile, TraceSource, write_trace
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    # Dwa kanały: rampa 0..40 i jej odbicie, próbki co 0.5 s przez 4 s
+    times = 10.0 + np.arange(9) * 0.5
+    channels = np.column_stack([np.arange(9) * 5.0, 100.0 - np.arange(9) * 5.0])
+    path = tmp_path / 'ramp.c20trace'
+    write_trace(str(path), times, channels)
+    return path
+
+
+def test_write_trace_rejects_bad_timestamps(tmp_path):
+    with pytest.raises(ValueError):
+        write_trace(str(tmp_path / 'bad'), [0.0, 0.0, 1.0], np.zeros((3, 1)))
+
+
+def test_sample_interpolates_and_clamps(trace_path):
+    trace = TraceFile(str(trace_path))
+    assert (trace.channels, trace.rows, trace.start, trace.duration) == (2, 9, 10.0, 4.0)
+    np.testing.assert_allclose(trace.sample(0.25), [2.5, 97.5])
+    np.testing.assert_allclose(trace.sample(1.0), [10.0, 90.0])
+    np.testing.assert_allclose(trace.sample(3.9), [39.0, 61.0])
+    np.testing.assert_array_equal(trace.sample(-1.0), [0.0, 100.0])
+    np.testing.assert_array_equal(trace.sample(4.0), [40.0, 60.0])
+    np.testing.assert_array_equal(trace.sample(100.0), [40.0, 60.0])
+
+
+def test_not_a_trace_file(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        TraceFile(str(path))
+
+
+def test_loop_and_hold_at_end(trace_path):
+    trace = TraceFile(str(trace_path))
+    looped, held = TraceSource(trace), TraceSource(trace, loop=False)
+    for source in (looped, held):
+        source.seek(0.0, 100.0)
+    assert looped.values(105.0, [0]) == pytest.approx([10.0])  # 5 s mod 4 s = 1 s
+    assert held.values(105.0, [0, 1]) == pytest.approx([40.0, 60.0])
+
+
+def test_seek_and_speed_keep_position_continuous(trace_path):
+    source = TraceSource(TraceFile(str(trace_path)), speed=2.0, loop=False)
+    source.seek(0.5, 0.0)
+    assert source.position(1.0) == pytest.approx(2.5)
+    source.set_speed(0.5, 1.0)
+    assert source.position(1.0) == pytest.approx(2.5)  # bez skoku
+    assert source.position(2.0) == pytest.approx(3.0)
+    source.seek(1.0, 3.0)
+    assert source.values(3.0, [1]) == pytest.approx([90.0])
+
+
+def test_first_read_starts_playback(trace_path):
+    source = TraceSource(TraceFile(str(trace_path)), position_s=1.0)
+    assert source.position(50.0) == 1.0
+    assert source.position(50.5) == pytest.approx(1.5)
+
+
+def test_rigs_share_one_mapping(trace_path):
+    simulator = PressureSensorSimulator(rigs=2, seed=1)
+    first = simulator.attach_trace(str(trace_path), rig=0, addresses=(0x48, 0x49), position_s=0.0)
+    second = simulator.attach_trace(trace_path.parent / '.' / trace_path.name, rig=1,
+                                    addresses=(0x48,), channels=(1,), position_s=2.0)
+    assert first.trace is second.trace is TraceFile.open(str(trace_path))
+    first.seek(0.0, 7.0)
+    second.seek(2.0, 7.0)
+    values = simulator.bank.update(8.0)
+    bank = simulator.bank
+    assert values[bank.index[(0, 0x48)]] == pytest.approx(10.0)
+    assert values[bank.index[(0, 0x49)]] == 25.0  # 90 obcięte do zakresu MP 0-25 bar
+    assert values[bank.index[(1, 0x48)]] == pytest.approx(60.0)  # obcięte do zakresu LP
+    with pytest.raises(ValueError):
+        simulator.attach_trace(first.trace, rig=1, addresses=(0x49,), channels=(2,))
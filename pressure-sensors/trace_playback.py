@@ -0,0 +1,121 @@
+"""
+Odtwarzanie zarejestrowanych przebiegów ciśnienia (plik mapowany w pamięci)
+
+Format pliku śladu (little-endian):
+    nagłówek HEADER: magic b'C20TRACE', wersja, liczba kanałów, liczba wierszy
+    wiersze float64: [czas_s, kanał_0, ..., kanał_n-1], czas rosnący
+
+Plik jest mapowany (np.memmap), nie wczytywany: otwarcie śladu o dowolnym
+rozmiarze jest natychmiastowe, a odczyt dotyka tylko stron wokół
+odtwarzanej chwili. Jeden TraceFile na ścieżkę jest współdzielony przez
+wszystkie źródła (stanowiska), więc strony są w pamięci raz.
+"""
+
+import os
+import struct
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+HEADER = struct.Struct('<8sHHQ')
+HEADER_SIZE = 32  # nagłówek wyrównany, wiersze zaczynają się od 32. bajtu
+MAGIC = b'C20TRACE'
+VERSION = 1
+
+
+def write_trace(path: str, times: np.ndarray, channels: np.ndarray):
+    """Zapisuje ślad: times (n,), channels (n, liczba kanałów)"""
+    times = np.asarray(times, dtype='<f8')
+    channels = np.asarray(channels, dtype='<f8').reshape(len(times), -1)
+    if len(times) < 2 or np.any(np.diff(times) <= 0):
+        raise ValueError("Trace needs at least two samples with increasing timestamps")
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, channels.shape[1], len(times)).ljust(HEADER_SIZE, b'\0'))
+        f.write(np.column_stack([times, channels]).tobytes())
+
+
+class TraceFile:
+    """Ślad zmapowany w pamięci (tylko do odczytu)"""
+
+    _open: Dict[str, 'TraceFile'] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            magic, version, channels, rows = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a C20 trace file (version {VERSION})")
+        self.path = path
+        self.channels = channels
+        self.rows = rows
+        self.data = np.memmap(path, dtype='<f8', mode='r', offset=HEADER_SIZE, shape=(rows, channels + 1))
+        self.times = self.data[:, 0]
+        self.start = float(self.times[0])
+        self.end = float(self.times[-1])
+        self.duration = self.end - self.start
+
+    @classmethod
+    def open(cls, path: str) -> 'TraceFile':
+        """Współdzielona instancja dla ścieżki"""
+        path = os.path.realpath(path)
+        with cls._lock:
+            trace = cls._open.get(path)
+            if trace is None:
+                trace = cls._open[path] = cls(path)
+            return trace
+
+    def sample(self, position: float) -> np.ndarray:
+        """Wartości wszystkich kanałów w chwili position [s od początku śladu]
+
+        Interpolacja liniowa między sąsiednimi wierszami; poza śladem
+        wartości pierwszego / ostatniego wiersza.
+        """
+        t = self.start + position
+        row = int(np.searchsorted(self.times, t, 'right'))
+        if row <= 0:
+            return np.array(self.data[0, 1:])
+        if row >= self.rows:
+            return np.array(self.data[-1, 1:])
+        t0, t1 = self.times[row - 1], self.times[row]
+        before, after = self.data[row - 1, 1:], self.data[row, 1:]
+        return before + (after - before) * ((t - t0) / (t1 - t0))
+
+
+class TraceSource:
+    """Odtwarzanie śladu dla jednego stanowiska: prędkość, pętla, przewijanie
+
+    Pozycja w śladzie rośnie z czasem symulacji pomnożonym przez speed;
+    bez loop wartości po końcu śladu zostają na ostatnim wierszu.
+    """
+
+    def __init__(self, trace: TraceFile, speed: float = 1.0, loop: bool = True,
+                 position_s: float = 0.0):
+        self.trace = trace
+        self.speed = speed
+        self.loop = loop
+        self._base_position = position_s
+        self._base_t: Optional[float] = None  # chwila symulacji odpowiadająca _base_position
+
+    def position(self, t: float) -> float:
+        if self._base_t is None:
+            self._base_t = t
+        position = self._base_position + (t - self._base_t) * self.speed
+        if self.loop and self.trace.duration > 0:
+            position %= self.trace.duration
+        return position
+
+    def seek(self, position_s: float, t: Optional[float] = None):
+        """Przewija do position_s [s od początku śladu] w chwili t"""
+        self._base_position = position_s
+        self._base_t = t
+
+    def set_speed(self, speed: float, t: Optional[float] = None):
+        """Zmienia prędkość od chwili t, bez skoku pozycji"""
+        t = time.time() if t is None else t
+        self.seek(self.position(t), t)
+        self.speed = speed
+
+    def values(self, t: float, channels: Sequence[int]) -> np.ndarray:
+        return self.trace.sample(self.position(t))[list(channels)]
@@ -4,24 +4,31 @@ Klient Modbus RTU do sterowania modułem IO 8CH
 Zgodny z przykładami z dokumentacji Waveshare
 """
 
+import asyncio
 import serial
 import struct
 import time
 import socket
 
 class ModbusRTUClient:
-    def __init__(self, port=None, tcp_host=None, tcp_port=5020):
+    def __init__(self, port=None, tcp_host=None, tcp_port=5020, max_retries=0, timeout=1.0):
         """
         Inicjalizacja klienta Modbus RTU
         port: port szeregowy (np. '/dev/ttyUSB0')
         tcp_host: host TCP (dla trybu bridge)
         tcp_port: port TCP
+        max_retries: liczba ponowień komendy przy braku odpowiedzi
+        timeout: czas oczekiwania na odpowiedź [s] (port szeregowy i TCP)
         """
         self.tcp_mode = tcp_host is not None
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.retries = 0  # Licznik ponowień (odczytywany m.in. przez StepProfiler)
         
         if self.tcp_mode:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((tcp_host, tcp_port))
+            self.sock.settimeout(timeout)
             print(f"Connected to TCP bridge at {tcp_host}:{tcp_port}")
         else:
             self.ser = serial.Serial(
@@ -30,11 +37,12 @@ class ModbusRTUClient:
                 bytesize=8,
                 parity='N',
                 stopbits=1,
-                timeout=1
+                timeout=timeout
             )
             print(f"Connected to serial port {port}")
     
-    def calculate_crc16(self, data):
+    @staticmethod
+    def calculate_crc16(data):
         """Oblicz CRC16 Modbus"""
         crc = 0xFFFF
         for byte in data:
@@ -55,19 +63,28 @@ class ModbusRTUClient:
         else:
             command_with_crc = command
             
-        print(f"TX: {command_with_crc.hex().upper()}")
-        
-        if self.tcp_mode:
-            self.sock.send(command_with_crc)
-            response = self.sock.recv(256)
-        else:
-            self.ser.write(command_with_crc)
-            time.sleep(0.05)
-            response = self.ser.read(256)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                print(f"Retry {attempt}/{self.max_retries}")
+
+            print(f"TX: {command_with_crc.hex().upper()}")
             
-        if response:
-            print(f"RX: {response.hex().upper()}")
-            return response
+            if self.tcp_mode:
+                self.sock.send(command_with_crc)
+                try:
+                    response = self.sock.recv(256)
+                except socket.timeout:
+                    print(f"No response within {self.timeout} s")
+                    response = None
+            else:
+                self.ser.write(command_with_crc)
+                time.sleep(0.05)
+                response = self.ser.read(256)
+                
+            if response:
+                print(f"RX: {response.hex().upper()}")
+                return response
         return None
     
     def control_single_output(self, address, channel, action):
@@ -156,6 +173,96 @@ class ModbusRTUClient:
         else:
             self.ser.close()
 
+class ModbusInputMonitor:
+    """
+    Asynchroniczna subskrypcja zmian wejść (kanał powiadomień TCP bridge)
+    Zamiast cyklicznego read_inputs_status symulator wysyła ramkę
+    [adres, 0x41, poprzedni DI, bieżący DI, timestamp, CRC16] przy każdej zmianie.
+    Układ ramki jak w modbus-io-8ch/modbus_io_simulator.py (test_input_monitor.py).
+    """
+    
+    NOTIFY_FUNCTION = 0x41
+    FRAME_FORMAT = '>BBBBd'
+    FRAME_SIZE = struct.calcsize(FRAME_FORMAT) + 2  # + CRC16
+    
+    def __init__(self, tcp_host='localhost', notify_port=5021):
+        self.host = tcp_host
+        self.port = notify_port
+        self.inputs = [False] * 8
+        self.state_received = asyncio.Event()  # pierwsza ramka (stan początkowy) odebrana
+        self.callbacks = []  # (kanał, zbocze, callback)
+        self.reader = None
+        self.writer = None
+        self._task = None
+    
+    def on_edge(self, channel, callback, edge='rising'):
+        """
+        Rejestruje callback(channel, state, timestamp) dla zbocza wejścia
+        channel: numer wejścia (0-7) lub None dla wszystkich
+        edge: 'rising', 'falling', 'both'
+        callback może być funkcją lub korutyną
+        Stan już aktywny przy rejestracji nie jest zboczem - sprawdź inputs.
+        """
+        if edge not in ('rising', 'falling', 'both'):
+            raise ValueError(f"Unknown edge: {edge}")
+        self.callbacks.append((channel, edge, callback))
+        return callback
+    
+    def remove_callback(self, callback):
+        """Usuwa wszystkie rejestracje danego callbacku"""
+        self.callbacks = [entry for entry in self.callbacks if entry[2] is not callback]
+    
+    async def wait_for_state(self, timeout=1.0):
+        """Czeka na stan początkowy wejść; False, jeśli nie nadszedł"""
+        try:
+            await asyncio.wait_for(self.state_received.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+    
+    async def connect(self):
+        """Połącz z kanałem powiadomień i zacznij odbierać zmiany"""
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        print(f"Subscribed to input notifications at {self.host}:{self.port}")
+        self._task = asyncio.create_task(self._receive())
+    
+    async def _receive(self):
+        try:
+            while True:
+                frame = await self.reader.readexactly(self.FRAME_SIZE)
+                if ModbusRTUClient.calculate_crc16(frame[:-2]) != frame[-2:]:
+                    print("Input notification CRC error")
+                    continue
+                _, function, previous, current, timestamp = struct.unpack(
+                    self.FRAME_FORMAT, frame[:-2])
+                if function == self.NOTIFY_FUNCTION:
+                    await self._dispatch(previous, current, timestamp)
+        except asyncio.IncompleteReadError:
+            print("Input notification channel closed")
+    
+    async def _dispatch(self, previous, current, timestamp):
+        self.inputs = [bool(current & (1 << i)) for i in range(8)]
+        self.state_received.set()
+        changed = previous ^ current
+        if not changed:
+            return
+        for channel, edge, callback in list(self.callbacks):
+            for i in range(8):
+                if not changed & (1 << i) or channel not in (None, i):
+                    continue
+                state = self.inputs[i]
+                if edge == 'both' or (edge == 'rising') == state:
+                    result = callback(i, state, timestamp)
+                    if asyncio.iscoroutine(result):
+                        await result
+    
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        if self.writer:
+            self.writer.close()
+            await self.writer.wait_closed()
+
 # Przykłady użycia zgodne z dokumentacją
 def example_basic_control():
     """Przykład podstawowej kontroli"""
@@ -0,0 +1,257 @@
+"""
+Profiler kroków procedur testowych (C20TestProcedures, BLSTestProcedures)
+Dla każdego kroku: czas całkowity, oczekiwanie vs I/O, liczba transakcji
+na magistrali i powtórzeń. Eksport do JSON i formatu stosów flame graph.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Metody wykonujące rzeczywiste I/O w znanych interfejsach sprzętowych
+DEFAULT_IO_METHODS = (
+    'send_command',  # ModbusRTUClient
+    'control_motor', 'set_valve', 'set_pressure', 'read_pressure', 'set_flow_rate',  # HardwareInterface
+)
+
+
+@dataclass
+class StepRecord:
+    """Pomiary jednego kroku (wartości własne, bez kroków zagnieżdżonych)"""
+    name: str
+    wall_s: float = 0.0
+    wait_s: float = 0.0
+    io_s: float = 0.0
+    transactions: int = 0
+    retries: int = 0
+    io_calls: Dict[str, float] = field(default_factory=dict)  # metoda -> czas [s]
+    children: List['StepRecord'] = field(default_factory=list)
+
+    def total(self, key: str):
+        """Wartość łączna kroku razem z krokami zagnieżdżonymi"""
+        if key == 'wall_s':
+            return self.wall_s
+        return getattr(self, key) + sum(child.total(key) for child in self.children)
+
+    def to_dict(self) -> Dict:
+        wall = self.wall_s
+        wait = self.total('wait_s')
+        io = self.total('io_s')
+        return {
+            'name': self.name,
+            'wall_s': wall,
+            'wait_s': wait,
+            'io_s': io,
+            'other_s': max(wall - wait - io, 0.0),
+            'transactions': self.total('transactions'),
+            'retries': self.total('retries'),
+            'io_calls': self.io_calls,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+class StepProfiler:
+    """Zbiera pomiary kroków procedury testowej
+
+    Użycie:
+        profiler = StepProfiler('bls_run')
+        hw = profiler.instrument(HardwareInterface())
+        tester = BLSTestProcedures(hw, profiler=profiler)
+    """
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.root = StepRecord(name=self.run_id)
+        self._current = contextvars.ContextVar(f'step_{id(self)}', default=self.root)
+        self._instrumented = []
+        self._started = time.perf_counter()
+
+    def instrument(self, obj, methods: Iterable[str] = DEFAULT_IO_METHODS):
+        """Opakowuje metody I/O obiektu pomiarem czasu i licznikiem transakcji
+
+        Metody są podmieniane na instancji, więc wywołania wewnętrzne
+        (np. set_all_valves -> set_valve) również są liczone.
+        """
+        for name in methods:
+            method = getattr(obj, name, None)
+            if method is None or not callable(method):
+                continue
+            if asyncio.iscoroutinefunction(method):
+                wrapper = self._wrap_async(name, method)
+            else:
+                wrapper = self._wrap_sync(name, method)
+            setattr(obj, name, wrapper)
+        self._instrumented.append(obj)
+        return obj
+
+    def _record_io(self, name: str, elapsed: float):
+        record = self._current.get()
+        record.io_s += elapsed
+        record.transactions += 1
+        record.io_calls[name] = record.io_calls.get(name, 0.0) + elapsed
+
+    def _wrap_sync(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record_io(name, time.perf_counter() - started)
+        return wrapper
+
+    def _wrap_async(self, name, method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self._record_io(name, time.perf_counter() - started)
+        return wrapper
+
+    def _retries(self) -> int:
+        return sum(getattr(obj, 'retries', 0) for obj in self._instrumented)
+
+    @contextmanager
+    def step(self, name: str):
+        """Oznacza krok procedury; kroki mogą być zagnieżdżone"""
+        parent = self._current.get()
+        record = StepRecord(name=name)
+        parent.children.append(record)
+        token = self._current.set(record)
+        retries_before = self._retries()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall_s = time.perf_counter() - started
+            # Powtórzenia z kroków zagnieżdżonych są już w nich policzone
+            nested = sum(child.total('retries') for child in record.children)
+            record.retries = self._retries() - retries_before - nested
+            self._current.reset(token)
+
+    async def wait(self, seconds: float):
+        """asyncio.sleep liczony jako oczekiwanie bieżącego kroku"""
+        started = time.perf_counter()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._current.get().wait_s += time.perf_counter() - started
+
+    def to_dict(self) -> Dict:
+        self.root.wall_s = time.perf_counter() - self._started
+        total = self.root.to_dict()
+        steps = total.pop('children')
+        return {
+            'run_id': self.run_id,
+            'steps': steps,
+            'total': total,
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_collapsed_stacks(self) -> str:
+        """Format 'a;b;c <mikrosekundy>' (flamegraph.pl, speedscope, inferno)"""
+        lines = []
+
+        def walk(record: StepRecord, path: List[str]):
+            path = path + [record.name.replace(';', ',')]
+            stack = ';'.join(path)
+            io_total = 0.0
+            for method, elapsed in record.io_calls.items():
+                lines.append(f"{stack};io:{method} {int(elapsed * 1e6)}")
+                io_total += elapsed
+            if record.wait_s:
+                lines.append(f"{stack};wait {int(record.wait_s * 1e6)}")
+            children_wall = sum(child.wall_s for child in record.children)
+            self_other = record.wall_s - children_wall - io_total - record.wait_s
+            if self_other > 0:
+                lines.append(f"{stack} {int(self_other * 1e6)}")
+            for child in record.children:
+                walk(child, path)
+
+        self.to_dict()  # aktualizuje czas całkowity
+        walk(self.root, [])
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path_prefix: str):
+        """Zapisuje <prefix>.json i <prefix>.folded"""
+        with open(f"{path_prefix}.json", 'w') as f:
+            f.write(self.to_json())
+        with open(f"{path_prefix}.folded", 'w') as f:
+            f.write(self.to_collapsed_stacks())
+
+
+def _flatten(steps: List[Dict], prefix: str = '') -> Dict[str, Dict]:
+    flat = {}
+    for step in steps:
+        path = f"{prefix}/{step['name']}" if prefix else step['name']
+        # Kroki o tej samej nazwie (np. w pętli) są sumowane
+        entry = flat.setdefault(path, {'wall_s': 0.0, 'wait_s': 0.0, 'io_s': 0.0,
+                                       'transactions': 0, 'retries': 0})
+        for key in entry:
+            entry[key] += step[key]
+        for child_path, child in _flatten(step['children'], path).items():
+            target = flat.setdefault(child_path, dict.fromkeys(child, 0))
+            for key in child:
+                target[key] += child[key]
+    return flat
+
+
+def compare_runs(baseline: Dict, candidate: Dict) -> List[Dict]:
+    """Porównuje dwa przebiegi (wyniki StepProfiler.to_dict() lub wczytany JSON)
+
+    Zwraca listę kroków z czasami obu przebiegów i różnicą, posortowaną
+    malejąco według bezwzględnej zmiany czasu.
+    """
+    base = _flatten(baseline['steps'])
+    cand = _flatten(candidate['steps'])
+    rows = []
+    for path in list(base) + [p for p in cand if p not in base]:
+        b = base.get(path, {})
+        c = cand.get(path, {})
+        rows.append({
+            'step': path,
+            'baseline_wall_s': b.get('wall_s'),
+            'candidate_wall_s': c.get('wall_s'),
+            'delta_wall_s': c.get('wall_s', 0.0) - b.get('wall_s', 0.0),
+            'baseline_wait_s': b.get('wait_s'),
+            'candidate_wait_s': c.get('wait_s'),
+            'baseline_transactions': b.get('transactions'),
+            'candidate_transactions': c.get('transactions'),
+        })
+    rows.sort(key=lambda row: abs(row['delta_wall_s']), reverse=True)
+    return rows
+
+
+def print_comparison(rows: List[Dict]):
+    print(f"{'step':<50} {'base [s]':>9} {'cand [s]':>9} {'delta':>8} {'tx':>9}")
+    for row in rows:
+        base = row['baseline_wall_s']
+        cand = row['candidate_wall_s']
+        tx = f"{row['baseline_transactions'] or 0}->{row['candidate_transactions'] or 0}"
+        print(f"{row['step'][:50]:<50} "
+              f"{base if base is not None else float('nan'):9.3f} "
+              f"{cand if cand is not None else float('nan'):9.3f} "
+              f"{row['delta_wall_s']:+8.3f} {tx:>9}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python step_profiler.py baseline.json candidate.json")
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        baseline_run = json.load(f)
+    with open(sys.argv[2]) as f:
+        candidate_run = json.load(f)
+    print_comparison(compare_runs(baseline_run, candidate_run))
@@ -0,0 +1,121 @@
+"""
+Testy kanału powiadomień o zmianach wejść (ramka 0x41) między symulatorem
+modbus-io-8ch a ModbusInputMonitor oraz reakcji procedury na zbocze
+Uruchomienie: python -m pytest python-control
+"""
+
+import asyncio
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'modbus-io-8ch'))
+
+from modbus_client import ModbusInputMonitor, ModbusRTUClient  # noqa: E402
+from modbus_io_simulator import ModbusRTUIO8CH, ModbusTCPBridge  # noqa: E402
+from step_profiler import StepProfiler  # noqa: E402
+from test_procedures import C20TestProcedures  # noqa: E402
+
+EMERGENCY = 5
+
+
+class SimulatorLink(ModbusRTUClient):
+    """Klient Modbus przekazujący ramki wprost do symulatora (bez gniazda)"""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.tcp_mode = True
+        self.max_retries = 0
+        self.retries = 0
+
+    def send_command(self, command):
+        return self.simulator.process_modbus_frame(command + self.calculate_crc16(command))
+
+
+def states(mask):
+    return [bool(mask & (1 << i)) for i in range(8)]
+
+
+async def until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        await asyncio.sleep(0.001)
+
+
+async def connect_monitor(simulator):
+    """Kanał powiadomień mostu TCP na porcie efemerycznym"""
+    bridge = ModbusTCPBridge(simulator)
+    bridge.loop = asyncio.get_running_loop()
+    server = await asyncio.start_server(bridge.handle_notify_client, '127.0.0.1', 0)
+    simulator.add_input_listener(bridge.on_inputs_changed)
+    monitor = ModbusInputMonitor('127.0.0.1', server.sockets[0].getsockname()[1])
+    await monitor.connect()
+    await until(lambda: bridge.notify_clients)
+    return server, monitor
+
+
+def test_notification_frame_layout_matches_monitor(capsys):
+    simulator = ModbusRTUIO8CH(device_address=0x07)
+    frame = ModbusTCPBridge(simulator).build_input_notification(states(0b101), states(0b110), 1234.5)
+    assert len(frame) == ModbusInputMonitor.FRAME_SIZE
+    assert struct.unpack(ModbusInputMonitor.FRAME_FORMAT, frame[:-2]) == (
+        0x07, ModbusInputMonitor.NOTIFY_FUNCTION, 0b101, 0b110, 1234.5)
+    assert ModbusRTUClient.calculate_crc16(frame[:-2]) == frame[-2:]
+
+
+def test_edges_are_delivered_per_channel(capsys):
+    async def run():
+        simulator = ModbusRTUIO8CH()
+        simulator.simulate_inputs(states(0b0001))  # aktywne przed subskrypcją
+        server, monitor = await connect_monitor(simulator)
+        events = []
+        monitor.on_edge(2, lambda channel, state, t: events.append(('rising', channel)), edge='rising')
+        monitor.on_edge(2, lambda channel, state, t: events.append(('falling', channel)), edge='falling')
+
+        async def any_edge(channel, state, t):
+            events.append(('both', channel, state))
+
+        monitor.on_edge(None, any_edge, edge='both')
+        assert await monitor.wait_for_state()
+        assert monitor.inputs == states(0b0001)
+        for mask in (0b0101, 0b0100, 0b0000):
+            simulator.simulate_inputs(states(mask))
+        await until(lambda: monitor.inputs == states(0))
+        await monitor.close()
+        server.close()
+        return events
+
+    assert asyncio.run(run()) == [
+        ('rising', 2), ('both', 2, True),
+        ('both', 0, False),
+        ('falling', 2), ('both', 2, False),
+    ]
+    capsys.readouterr()
+
+
+def test_emergency_stop_is_attributed_to_the_waiting_step(capsys):
+    async def run():
+        simulator = ModbusRTUIO8CH()
+        simulator.digital_outputs = [True] * 8
+        server, monitor = await connect_monitor(simulator)
+        profiler = StepProfiler('emergency')
+        procedures = C20TestProcedures(profiler.instrument(SimulatorLink(simulator)),
+                                       profiler=profiler, input_monitor=monitor)
+        task = asyncio.ensure_future(procedures.test_pressure_monitoring())
+        await until(lambda: len(monitor.callbacks) == 2 and monitor.state_received.is_set())
+        simulator.simulate_inputs(states(1 << EMERGENCY))
+        await asyncio.wait_for(task, 2.0)
+        await monitor.close()
+        server.close()
+        return simulator, profiler.to_dict()
+
+    simulator, report = asyncio.run(run())
+    assert simulator.digital_outputs == [False] * 8
+    monitoring = report['steps'][0]
+    configure, wait = monitoring['children']
+    assert (configure['name'], configure['transactions']) == ('configure_channel_modes', 2)
+    assert (wait['name'], wait['transactions']) == ('wait_input_events', 1)
+    assert 'send_command' in wait['io_calls']
+    assert 'EMERGENCY STOP' in capsys.readouterr().out
@@ -3,14 +3,34 @@
 Procedury testowe dla projektu C20 z wykorzystaniem Modbus IO
 """
 
+import argparse
 import asyncio
+import contextvars
 import time
-from modbus_client import ModbusRTUClient
+from contextlib import nullcontext
+from modbus_client import ModbusRTUClient, ModbusInputMonitor
+from step_profiler import StepProfiler
 
 class C20TestProcedures:
-    def __init__(self, modbus_client):
+    def __init__(self, modbus_client, profiler=None, input_monitor=None):
+        """
+        profiler: opcjonalny StepProfiler (step_profiler.py)
+        input_monitor: opcjonalny ModbusInputMonitor - zdarzenia zamiast odpytywania wejść
+        """
         self.client = modbus_client
         self.device_address = 1
+        self.profiler = profiler
+        self.input_monitor = input_monitor
+
+    def _step(self, name):
+        """Krok procedury mierzony przez profiler (jeśli podłączony)"""
+        return self.profiler.step(name) if self.profiler else nullcontext()
+
+    async def _wait(self, seconds):
+        if self.profiler:
+            await self.profiler.wait(seconds)
+        else:
+            await asyncio.sleep(seconds)
         
     async def test_valve_sequence(self):
         """Test sekwencji zaworów dla C20"""
@@ -42,24 +62,28 @@ class C20TestProcedures:
             ("Reset systemu", 'all', 'off')
         ]
         
-        for step in steps:
-            desc, valve, action = step
-            if desc:
-                print(f"\n{desc}")
-            
-            if valve == 'all':
-                self.client.control_all_outputs(self.device_address, action)
-            elif valve is not None:
-                valve_channel = valves[valve]
-                self.client.control_single_output(
-                    self.device_address, 
-                    valve_channel, 
-                    action
-                )
-                print(f"  Zawór {valve} (DO{valve_channel+1}): {action}")
-            else:
-                print(f"  Czekam {action} sekund...")
-                await asyncio.sleep(action)
+        with self._step('test_valve_sequence'):
+            label = ''
+            for step in steps:
+                desc, valve, action = step
+                if desc:
+                    print(f"\n{desc}")
+                    label = desc
+
+                with self._step(label):
+                    if valve == 'all':
+                        self.client.control_all_outputs(self.device_address, action)
+                    elif valve is not None:
+                        valve_channel = valves[valve]
+                        self.client.control_single_output(
+                            self.device_address, 
+                            valve_channel, 
+                            action
+                        )
+                        print(f"  Zawór {valve} (DO{valve_channel+1}): {action}")
+                    else:
+                        print(f"  Czekam {action} sekund...")
+                        await self._wait(action)
     
     async def test_pressure_monitoring(self):
         """Symulacja monitoringu ciśnienia z użyciem wejść"""
@@ -77,27 +101,79 @@ class C20TestProcedures:
             'alarm': 7           # DI8 - Alarm
         }
         
-        # Ustaw tryb Linkage dla alarmów
-        print("Konfiguracja trybów kanałów...")
-        self.client.set_channel_mode(self.device_address, 3, 1)  # DO4 = DI4 (leak)
-        self.client.set_channel_mode(self.device_address, 7, 1)  # DO8 = DI8 (alarm)
+        with self._step('test_pressure_monitoring'):
+            # Ustaw tryb Linkage dla alarmów
+            print("Konfiguracja trybów kanałów...")
+            with self._step('configure_channel_modes'):
+                self.client.set_channel_mode(self.device_address, 3, 1)  # DO4 = DI4 (leak)
+                self.client.set_channel_mode(self.device_address, 7, 1)  # DO8 = DI8 (alarm)
+            
+            if self.input_monitor:
+                await self._monitor_inputs_events(sensors, duration=10)
+                return
+
+            # Monitoruj wejścia
+            for i in range(10):
+                with self._step('poll_inputs'):
+                    inputs = self.client.read_inputs_status(self.device_address)
+                    if inputs:
+                        print(f"\nOdczyt {i+1}:")
+                        for name, channel in sensors.items():
+                            if inputs[channel]:
+                                print(f"  ⚠️  {name}: AKTYWNE")
+                            
+                        # Sprawdź stan alarmowy
+                        if inputs[sensors['emergency']]:
+                            print("  🚨 EMERGENCY STOP!")
+                            self.client.control_all_outputs(self.device_address, 'off')
+                            break
+                            
+                    await self._wait(1)
+    
+    async def _monitor_inputs_events(self, sensors, duration):
+        """Monitoring wejść na zdarzeniach - reakcja na zbocze bez odpytywania"""
+        emergency = asyncio.Event()
+        stopping = False
+        channel_names = {channel: name for name, channel in sensors.items()}
+        loop = asyncio.get_running_loop()
+        step_context = contextvars.copy_context()
+        
+        def on_input(channel, state, timestamp):
+            if state:
+                print(f"  ⚠️  {channel_names[channel]}: AKTYWNE")
         
-        # Monitoruj wejścia
-        for i in range(10):
-            inputs = self.client.read_inputs_status(self.device_address)
-            if inputs:
-                print(f"\nOdczyt {i+1}:")
-                for name, channel in sensors.items():
-                    if inputs[channel]:
-                        print(f"  ⚠️  {name}: AKTYWNE")
-                    
-                # Sprawdź stan alarmowy
-                if inputs[sensors['emergency']]:
-                    print("  🚨 EMERGENCY STOP!")
-                    self.client.control_all_outputs(self.device_address, 'off')
-                    break
-                    
-            await asyncio.sleep(1)
+        async def on_emergency(channel, state, timestamp):
+            nonlocal stopping
+            if stopping:
+                return
+            stopping = True
+            # Komenda Modbus blokuje gniazdo - w executorze, nie w pętli zdarzeń;
+            # w kontekście kroku, żeby profiler przypisał ją do tego kroku
+            await loop.run_in_executor(None, step_context.run, self.client.control_all_outputs,
+                                       self.device_address, 'off')
+            print(f"  🚨 EMERGENCY STOP! (reakcja {(time.time() - timestamp) * 1000:.1f} ms)")
+            emergency.set()
+        
+        self.input_monitor.on_edge(None, on_input, edge='rising')
+        self.input_monitor.on_edge(sensors['emergency'], on_emergency, edge='rising')
+        try:
+            with self._step('wait_input_events'):
+                # Zbocza przychodzą w zadaniu odbiorczym monitora, z jego kontekstem
+                step_context = contextvars.copy_context()
+                # Wejścia aktywne już przed subskrypcją nie dadzą zbocza
+                if await self.input_monitor.wait_for_state():
+                    inputs = self.input_monitor.inputs
+                    for name, channel in sensors.items():
+                        if inputs[channel]:
+                            print(f"  ⚠️  {name}: AKTYWNE")
+                    if inputs[sensors['emergency']]:
+                        await on_emergency(sensors['emergency'], True, time.time())
+                await asyncio.wait_for(emergency.wait(), timeout=duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.input_monitor.remove_callback(on_input)
+            self.input_monitor.remove_callback(on_emergency)
     
     async def test_bls_mask_procedure(self):
         """Procedura testowa maski BLS"""
@@ -107,40 +183,62 @@ class C20TestProcedures:
         test_pressure_channel = 0  # DO1 - Ciśnienie testowe
         vacuum_channel = 7         # DO8 - Pompa próżniowa
         
-        # Miganie LED podczas testu
-        self.client.flash_output(self.device_address, 6, 5, 5)  # DO7 - miga co 500ms
-        
-        print("1. Inicjalizacja testu...")
-        self.client.control_all_outputs(self.device_address, 'off')
-        await asyncio.sleep(1)
-        
-        print("2. Test ciśnienia dodatniego...")
-        self.client.control_single_output(self.device_address, test_pressure_channel, 'on')
-        await asyncio.sleep(3)
-        
-        # Odczyt wyniku (symulacja)
-        outputs = self.client.read_outputs_status(self.device_address)
-        if outputs and outputs[test_pressure_channel]:
-            print("   ✓ Ciśnienie utrzymane")
-        else:
-            print("   ✗ Wykryto wyciek")
-        
-        print("3. Test podciśnienia...")
-        self.client.control_single_output(self.device_address, test_pressure_channel, 'off')
-        self.client.control_single_output(self.device_address, vacuum_channel, 'on')
-        await asyncio.sleep(3)
-        
-        print("4. Zakończenie testu...")
-        self.client.control_all_outputs(self.device_address, 'off')
-        
-        # Zatrzymaj miganie
-        self.client.flash_output(self.device_address, 6, 0)
+        with self._step('test_bls_mask_procedure'):
+            # Miganie LED podczas testu
+            self.client.flash_output(self.device_address, 6, 5, 5)  # DO7 - miga co 500ms
+            
+            print("1. Inicjalizacja testu...")
+            with self._step('init'):
+                self.client.control_all_outputs(self.device_address, 'off')
+                await self._wait(1)
+            
+            print("2. Test ciśnienia dodatniego...")
+            with self._step('positive_pressure'):
+                self.client.control_single_output(self.device_address, test_pressure_channel, 'on')
+                await self._wait(3)
+                
+                # Odczyt wyniku (symulacja)
+                outputs = self.client.read_outputs_status(self.device_address)
+                if outputs and outputs[test_pressure_channel]:
+                    print("   ✓ Ciśnienie utrzymane")
+                else:
+                    print("   ✗ Wykryto wyciek")
+            
+            print("3. Test podciśnienia...")
+            with self._step('negative_pressure'):
+                self.client.control_single_output(self.device_address, test_pressure_channel, 'off')
+                self.client.control_single_output(self.device_address, vacuum_channel, 'on')
+                await self._wait(3)
+            
+            print("4. Zakończenie testu...")
+            with self._step('finish'):
+                self.client.control_all_outputs(self.device_address, 'off')
+                
+                # Zatrzymaj miganie
+                self.client.flash_output(self.device_address, 6, 0)
 
 async def main():
     """Główna funkcja testowa"""
+    parser = argparse.ArgumentParser(description='C20 test procedures over Modbus IO')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='profile procedure steps, write PREFIX.json and PREFIX.folded')
+    parser.add_argument('--retries', type=int, default=0, help='Modbus command retries on timeout')
+    args = parser.parse_args()
+
     # Połącz z symulatorem
-    client = ModbusRTUClient(tcp_host='localhost', tcp_port=5020)
-    tester = C20TestProcedures(client)
+    client = ModbusRTUClient(tcp_host='localhost', tcp_port=5020, max_retries=args.retries)
+    profiler = None
+    if args.profile:
+        profiler = StepProfiler('c20_procedures')
+        profiler.instrument(client)
+    # Subskrypcja zmian wejść (kanał powiadomień TCP bridge)
+    input_monitor = ModbusInputMonitor(tcp_host='localhost', notify_port=5021)
+    try:
+        await input_monitor.connect()
+    except OSError:
+        print("Input notifications unavailable, falling back to polling")
+        input_monitor = None
+    tester = C20TestProcedures(client, profiler=profiler, input_monitor=input_monitor)
     
     try:
         # Uruchom testy
@@ -150,6 +248,11 @@ async def main():
         
     finally:
         client.close()
+        if input_monitor:
+            await input_monitor.close()
+        if profiler:
+            profiler.save(args.profile)
+            print(f"Step profile saved to {args.profile}.json / {args.profile}.folded")
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Testy profilera kroków: zagnieżdżanie, oczekiwanie vs I/O, transakcje,
+powtórzenia, stosy flame graph i porównanie przebiegów
+Uruchomienie: python -m pytest python-control
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from step_profiler import StepProfiler, compare_runs
+
+
+class FakeBus:
+    """Urządzenie z metodami I/O i licznikiem powtórzeń jak ModbusRTUClient"""
+
+    def __init__(self):
+        self.retries = 0
+
+    def send_command(self, frame, retry=False):
+        time.sleep(0.002)
+        if retry:
+            self.retries += 1
+        return frame
+
+    async def read_pressure(self, system):
+        await asyncio.sleep(0.002)
+        return 1.0
+
+    def set_all(self, count):
+        # Wywołania wewnętrzne też przechodzą przez opakowaną metodę instancji
+        for _ in range(count):
+            self.send_command(b'')
+
+    def helper(self):
+        return 'not instrumented'
+
+
+def test_instrument_counts_sync_and_async_io():
+    profiler = StepProfiler('run')
+    bus = profiler.instrument(FakeBus())
+    assert bus.helper() == 'not instrumented'
+
+    async def run():
+        with profiler.step('io'):
+            assert await bus.read_pressure('leak') == 1.0
+            bus.set_all(3)
+
+    asyncio.run(run())
+    step = profiler.to_dict()['steps'][0]
+    assert step['transactions'] == 4
+    assert set(step['io_calls']) == {'read_pressure', 'send_command'}
+    assert step['io_s'] >= 0.008 and step['io_s'] == pytest.approx(sum(step['io_calls'].values()))
+
+
+def test_failed_io_is_still_counted():
+    class Failing:
+        def send_command(self, frame):
+            raise IOError('timeout')
+
+    profiler = StepProfiler('run')
+    device = profiler.instrument(Failing())
+    with profiler.step('write'):
+        with pytest.raises(IOError):
+            device.send_command(b'')
+    assert profiler.root.children[0].transactions == 1
+
+
+def test_nested_steps_split_wait_and_io():
+    profiler = StepProfiler('run')
+    bus = profiler.instrument(FakeBus())
+
+    async def run():
+        with profiler.step('outer'):
+            bus.send_command(b'')
+            await profiler.wait(0.01)
+            with profiler.step('inner'):
+                bus.send_command(b'', retry=True)
+                await profiler.wait(0.02)
+            bus.send_command(b'', retry=True)
+
+    asyncio.run(run())
+    outer, = profiler.to_dict()['steps']
+    inner, = outer['children']
+    assert profiler.root.children[0].transactions == 2  # wartości własne
+    assert (outer['transactions'], inner['transactions']) == (3, 1)
+    assert (outer['retries'], inner['retries']) == (2, 1)
+    assert inner['wait_s'] >= 0.02 and outer['wait_s'] >= inner['wait_s'] + 0.01
+    assert outer['wall_s'] >= outer['wait_s'] + outer['io_s']
+    assert outer['other_s'] == pytest.approx(outer['wall_s'] - outer['wait_s'] - outer['io_s'])
+
+
+def test_concurrent_tasks_keep_their_own_step():
+    profiler = StepProfiler('run')
+    bus = profiler.instrument(FakeBus())
+
+    async def task(name, count):
+        with profiler.step(name):
+            for _ in range(count):
+                await bus.read_pressure(name)
+
+    async def run():
+        await asyncio.gather(task('a', 2), task('b', 5))
+
+    asyncio.run(run())
+    assert {step['name']: step['transactions'] for step in profiler.to_dict()['steps']} == {'a': 2, 'b': 5}
+
+
+def test_collapsed_stacks_and_save(tmp_path):
+    profiler = StepProfiler('run;1')
+    bus = profiler.instrument(FakeBus())
+
+    async def run():
+        with profiler.step('fill'):
+            bus.send_command(b'')
+            await profiler.wait(0.01)
+
+    asyncio.run(run())
+    lines = profiler.to_collapsed_stacks().splitlines()
+    stacks = {line.rsplit(' ', 1)[0]: int(line.rsplit(' ', 1)[1]) for line in lines}
+    assert stacks['run,1;fill;io:send_command'] >= 2000
+    assert stacks['run,1;fill;wait'] >= 10000
+    profiler.save(str(tmp_path / 'profile'))
+    saved = json.loads((tmp_path / 'profile.json').read_text())
+    assert saved['run_id'] == 'run;1' and saved['steps'][0]['name'] == 'fill'
+    assert (tmp_path / 'profile.folded').read_text().startswith('run,1')
+
+
+def test_compare_runs_sums_repeated_steps():
+    def run(name, durations, transactions):
+        return {'run_id': name, 'steps': [
+            {'name': 'loop', 'wall_s': wall, 'wait_s': 0.0, 'io_s': 0.0, 'transactions': tx, 'retries': 0,
+             'children': [{'name': 'read', 'wall_s': wall / 2, 'wait_s': 0.0, 'io_s': 0.0,
+                           'transactions': tx, 'retries': 0, 'children': []}]}
+            for wall, tx in zip(durations, transactions)]}
+
+    rows = compare_runs(run('base', [1.0, 1.0], [2, 2]), run('cand', [0.5], [1]))
+    assert [row['step'] for row in rows] == ['loop', 'loop/read']
+    loop = rows[0]
+    assert (loop['baseline_wall_s'], loop['candidate_wall_s'], loop['delta_wall_s']) == (2.0, 0.5, -1.5)
+    assert (loop['baseline_transactions'], loop['candidate_transactions']) == (4, 1)
+    assert rows[1]['delta_wall_s'] == pytest.approx(-0.75)
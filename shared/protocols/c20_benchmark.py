@@ -0,0 +1,366 @@
+"""
+C20 Protocol Benchmarks
+Measures throughput, message size and allocations of the C20 protocol layer
+
+    python c20_benchmark.py                      # all suites, table output
+    python c20_benchmark.py --suite ops --json   # machine-readable
+    python c20_benchmark.py --output results.json
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from c20_protocol import (
+    C20Message, C20Protocol, DeviceType, MessageType, SensorData, SensorType, TestProcedure,
+    BinaryCodec, CompactC20Message, CompactSensorData, MessagePool,
+    SensorBatch, SensorBatchBuilder,
+    create_test_sensor_data, create_test_valve_state,
+    encode_message, decode_message
+)
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2) -> float:
+    """Return calls per second of func, repeated for at least min_time seconds"""
+    func()  # warm-up
+    calls = 0
+    batch = 100
+    started = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return calls / elapsed
+        batch *= 2
+
+
+def allocations(func: Callable[[], Any], count: int = 2000) -> Dict[str, float]:
+    """Memory blocks kept per call (results held) and peak bytes of one call
+
+    blocks_per_call counts the objects that make up each result;
+    peak_bytes_per_call is the high-water mark of a single call, including
+    temporaries freed before it returns.
+    """
+    func()
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        results = [func() for _ in range(count)]
+        blocks = (sys.getallocatedblocks() - before) / count
+        del results
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    return {'blocks_per_call': max(blocks, 0.0), 'peak_bytes_per_call': peak}
+
+
+def run_operation_benchmarks(min_time: float = 0.2) -> List[Dict[str, Any]]:
+    """Core C20Protocol operations and every create_*_message helper"""
+    protocol = C20Protocol(DeviceType.RPI_CONTROLLER)
+    sensor = create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)
+    valves = [create_test_valve_state(i, 0x21) for i in range(12)]
+    procedure = TestProcedure(
+        procedure_id='BLS_5000_TEST', name='BLS 5000 Mask Leak Test', description='Leak test',
+        steps=[{'name': 'fill', 'pressure_mbar': 25.0}, {'name': 'hold', 'duration_s': 10}],
+        expected_duration_s=30, required_devices=[DeviceType.PRESSURE_SENSOR, DeviceType.VALVE_CONTROLLER],
+        parameters={'leak_rate_max': 0.5}
+    )
+    batch_builder = SensorBatchBuilder(protocol, max_samples=10 ** 9, max_age_s=float('inf'))
+    for _ in range(256):
+        batch_builder.add(sensor)
+    batch = SensorBatch(batch_builder._columns, len(batch_builder))
+
+    payload = protocol.create_sensor_data_message(sensor).payload
+    message = protocol.create_sensor_data_message(sensor)
+    cached_message = protocol.create_sensor_data_message(sensor)
+    json_str = message.to_json()
+    wire = message.to_bytes()
+
+    def checksum_cold():
+        message._canonical = None
+        return protocol.calculate_checksum(message)
+
+    def verify_cold():
+        message._canonical = None
+        return protocol.verify_checksum(message)
+
+    def to_bytes_cold():
+        message._canonical = None
+        return message.to_bytes()
+
+    def decode_payload():
+        decoded = decode_message(wire)
+        return protocol.decode_payload(decoded)
+
+    operations = {
+        'create_message': lambda: protocol.create_message(MessageType.SENSOR_DATA, payload),
+        'calculate_checksum': checksum_cold,
+        'verify_checksum': verify_cold,
+        'to_json': message.to_json,
+        'from_json': lambda: C20Message.from_json(json_str),
+        'to_bytes': to_bytes_cold,
+        'to_bytes_cached': cached_message.to_bytes,
+        'from_bytes': lambda: C20Message.from_bytes(wire),
+        'from_bytes_decode_payload': decode_payload,
+        'create_sensor_data_message': lambda: protocol.create_sensor_data_message(sensor),
+        'create_sensor_batch_message': lambda: protocol.create_sensor_batch_message(batch),
+        'create_valve_control_message': lambda: protocol.create_valve_control_message(valves),
+        'create_lcd_display_message': lambda: protocol.create_lcd_display_message(
+            {'line1': 'BLS 5000', 'line2': 'Leak 0.12 mbar/s', 'backlight': True}),
+        'create_keyboard_input_message': lambda: protocol.create_keyboard_input_message(
+            {'key': 'ENTER', 'code': 13, 'pressed': True}),
+        'create_test_procedure_message': lambda: protocol.create_test_procedure_message(procedure, 'START'),
+        'create_modbus_data_message': lambda: protocol.create_modbus_data_message(
+            {'device_address': 1, 'inputs': [False] * 8, 'outputs': [True, False] * 4}),
+        'create_error_response': lambda: protocol.create_error_response(message, 'CHECKSUM_ERROR'),
+    }
+
+    results = []
+    for name, func in operations.items():
+        row = {'operation': name, 'calls_per_s': measure(func, min_time), **allocations(func)}
+        result = func()
+        if isinstance(result, (C20Message, CompactC20Message)):
+            row['bytes_binary'] = len(result.to_bytes())
+            row['bytes_json'] = len(result.to_json().encode('utf-8')) \
+                if result.message_type is not MessageType.SENSOR_BATCH else None
+        results.append(row)
+    return results
+
+
+def sample_messages() -> Dict[str, Any]:
+    """Representative messages for each benchmark case"""
+    protocol = C20Protocol(DeviceType.PRESSURE_SENSOR)
+    sensor = create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)
+    valves = [create_test_valve_state(i, 0x21) for i in range(12)]
+    return {
+        'sensor_data': protocol.create_sensor_data_message(sensor),
+        'valve_control': protocol.create_valve_control_message(valves),
+    }
+
+
+def run_codec_benchmarks(min_time: float = 0.2) -> List[Dict[str, Any]]:
+    """Compare JSON and binary wire formats for each sample message
+
+    'binary' encodes from scratch; 'binary-cached' reuses the canonical
+    bytes cached by the checksum, which is what create_message + send does.
+    """
+    results = []
+    for name, message in sample_messages().items():
+        for codec in ('json', 'binary-json', 'binary', 'binary-cached'):
+            wire_format = 'binary' if codec == 'binary-cached' else codec
+            if codec == 'binary-cached':
+                message._canonical = BinaryCodec.canonical_bytes(message)
+
+            def encode():
+                if codec == 'binary':
+                    message._canonical = None
+                return encode_message(message, wire_format)
+
+            encoded = encode()
+            assert decode_message(encoded) == message
+            results.append({
+                'message': name,
+                'codec': codec,
+                'bytes': len(encoded.encode('utf-8') if isinstance(encoded, str) else encoded),
+                'encode_per_s': measure(encode, min_time),
+                'decode_per_s': measure(lambda: decode_message(encoded), min_time),
+                'encode_blocks': allocations(encode)['blocks_per_call'],
+                'decode_blocks': allocations(lambda: decode_message(encoded))['blocks_per_call'],
+            })
+    return results
+
+
+def retained_bytes(factory: Callable[[], Any], count: int = 10000) -> float:
+    """Average bytes kept alive per object created by factory"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del objects
+    return size / count
+
+
+def producer_peak(produce: Callable[[], None], count: int = 20000) -> float:
+    """Peak traced memory [bytes] while running produce count times"""
+    tracemalloc.start()
+    for _ in range(count):
+        produce()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run_memory_benchmarks(min_time: float = 0.2) -> List[Dict[str, Any]]:
+    """Dataclass vs slotted objects, and pooled vs unpooled SENSOR_DATA producers"""
+    protocol = C20Protocol(DeviceType.PRESSURE_SENSOR)
+    sensor = create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)
+    compact_sensor = CompactSensorData.from_dataclass(sensor)
+    message = protocol.create_sensor_data_message(sensor)
+    sensor_values = tuple(getattr(sensor, name) for name in CompactSensorData.FIELDS)
+
+    results = [
+        {'case': 'SensorData', 'bytes_per_object': retained_bytes(
+            lambda: SensorData(*sensor_values))},
+        {'case': 'CompactSensorData', 'bytes_per_object': retained_bytes(
+            lambda: CompactSensorData(*sensor_values))},
+        {'case': 'C20Message', 'bytes_per_object': retained_bytes(
+            lambda: C20Message(message.timestamp, message.message_type, message.source_device,
+                               None, 1, message.payload))},
+        {'case': 'CompactC20Message', 'bytes_per_object': retained_bytes(
+            lambda: CompactC20Message(message.timestamp, message.message_type, message.source_device,
+                                      None, 1, message.payload))},
+    ]
+
+    # Both producers turn a fresh reading into wire bytes; the pooled one
+    # reuses its record, the message and the message's payload dict
+    def unpooled():
+        protocol.create_sensor_data_message(SensorData(*sensor_values)).to_bytes()
+
+    pool = MessagePool(lambda: CompactC20Message(0.0, None, None, None, 0, None))
+
+    def pooled():
+        compact_sensor.pressure_mbar = sensor.pressure_mbar
+        msg = protocol.create_pooled_message(pool, MessageType.SENSOR_DATA, compact_sensor)
+        msg.to_bytes()
+        pool.release(msg)
+
+    for name, produce in (('producer_unpooled', unpooled), ('producer_pooled', pooled)):
+        results.append({
+            'case': name,
+            'messages_per_s': measure(produce, min_time),
+            'peak_bytes': producer_peak(produce),
+        })
+    return results
+
+
+def run_batch_benchmarks(batch_size: int = 256, min_time: float = 0.2) -> List[Dict[str, Any]]:
+    """Per-sample cost of single SENSOR_DATA messages vs columnar SENSOR_BATCH"""
+    protocol = C20Protocol(DeviceType.PRESSURE_SENSOR)
+    sensor = create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)
+
+    def single():
+        encode_message(protocol.create_sensor_data_message(sensor))
+
+    single_wire = encode_message(protocol.create_sensor_data_message(sensor))
+
+    def single_consume():
+        SensorData(**decode_message(single_wire).payload)
+
+    builder = SensorBatchBuilder(protocol, max_samples=batch_size, max_age_s=float('inf'))
+
+    def batched():
+        message = None
+        while message is None:
+            message = builder.add(sensor)
+        encode_message(message)
+
+    for _ in range(batch_size - 1):
+        builder.add(sensor)
+    batch_wire = encode_message(builder.add(sensor))
+
+    def batch_consume():
+        SensorBatch.from_message(decode_message(batch_wire))
+
+    return [
+        {'case': 'sensor_data', 'samples_per_message': 1,
+         'bytes_per_sample': len(single_wire),
+         'produce_samples_per_s': measure(single, min_time),
+         'consume_samples_per_s': measure(single_consume, min_time)},
+        {'case': 'sensor_batch', 'samples_per_message': batch_size,
+         'bytes_per_sample': len(batch_wire) / batch_size,
+         'produce_samples_per_s': measure(batched, min_time) * batch_size,
+         'consume_samples_per_s': measure(batch_consume, min_time) * batch_size},
+    ]
+
+
+def print_operation_results(results: List[Dict[str, Any]]):
+    print(f"{'operation':<30} {'calls/s':>10} {'blocks':>7} {'peak B':>8} {'binary B':>9} {'json B':>7}")
+    for row in results:
+        binary = row.get('bytes_binary')
+        json_bytes = row.get('bytes_json')
+        print(f"{row['operation']:<30} {row['calls_per_s']:>10,.0f} {row['blocks_per_call']:>7.1f} "
+              f"{row['peak_bytes_per_call']:>8,} {binary if binary is not None else '':>9} "
+              f"{json_bytes if json_bytes is not None else '':>7}")
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"{'message':<15} {'codec':<14} {'bytes':>6} {'encode/s':>12} {'decode/s':>12} {'enc/dec blocks':>15}")
+    for row in results:
+        blocks = f"{row['encode_blocks']:.0f}/{row['decode_blocks']:.0f}"
+        print(f"{row['message']:<15} {row['codec']:<14} {row['bytes']:>6} "
+              f"{row['encode_per_s']:>12,.0f} {row['decode_per_s']:>12,.0f} {blocks:>15}")
+
+
+def print_memory_results(results: List[Dict[str, Any]]):
+    for row in results:
+        if 'bytes_per_object' in row:
+            print(f"{row['case']:<20} {row['bytes_per_object']:>8.0f} bytes/object")
+        else:
+            print(f"{row['case']:<20} {row['messages_per_s']:>10,.0f} msg/s  "
+                  f"peak {row['peak_bytes']:,} bytes")
+
+
+def print_batch_results(results: List[Dict[str, Any]]):
+    print(f"{'case':<14} {'samples/msg':>11} {'bytes/sample':>13} {'produce/s':>12} {'consume/s':>12}")
+    for row in results:
+        print(f"{row['case']:<14} {row['samples_per_message']:>11} {row['bytes_per_sample']:>13.1f} "
+              f"{row['produce_samples_per_s']:>12,.0f} {row['consume_samples_per_s']:>12,.0f}")
+
+
+SUITES = {
+    'ops': (run_operation_benchmarks, print_operation_results),
+    'codecs': (run_codec_benchmarks, print_results),
+    'memory': (run_memory_benchmarks, print_memory_results),
+    'batch': (run_batch_benchmarks, print_batch_results),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='C20 protocol benchmarks')
+    parser.add_argument('--suite', choices=list(SUITES) + ['all'], default='all')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per measurement')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--output', help='also write JSON results to this file')
+    args = parser.parse_args()
+
+    suites = list(SUITES) if args.suite == 'all' else [args.suite]
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'min_time_s': args.min_time,
+        },
+    }
+    for suite in suites:
+        report[suite] = SUITES[suite][0](min_time=args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for suite in suites:
+        print(f"== {suite} ==")
+        SUITES[suite][1](report[suite])
+        print()
+
+
+if __name__ == '__main__':
+    main()
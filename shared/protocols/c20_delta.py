@@ -0,0 +1,307 @@
+"""
+C20 Delta-Encoded State
+SYSTEM_STATUS and VALVE_CONTROL states sent as changes against a base
+snapshot, with periodic full keyframes
+"""
+
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from c20_protocol import (
+    C20Message, C20Protocol, DeviceType, MessageType, PAYLOAD_SCHEMAS,
+    MESSAGE_TYPES_BY_CODE, PayloadError, StateAck, StateDelta
+)
+
+DELTA_TYPES = (MessageType.SYSTEM_STATUS, MessageType.VALVE_CONTROL)
+
+
+def diff_state(old: Any, new: Any) -> Tuple[List[List[Any]], List[List[Any]]]:
+    """Changes ([path, value] pairs) and removed paths turning old into new
+
+    Dicts are compared per key and equal-length lists per index; any other
+    difference replaces the value at that path.
+    """
+    changes: List[List[Any]] = []
+    removed: List[List[Any]] = []
+
+    def walk(a, b, path):
+        if type(a) is dict and type(b) is dict:
+            for key, value in b.items():
+                if key not in a:
+                    changes.append([path + [key], value])
+                else:
+                    walk(a[key], value, path + [key])
+            for key in a:
+                if key not in b:
+                    removed.append(path + [key])
+        elif type(a) is list and type(b) is list and len(a) == len(b):
+            for index, (x, y) in enumerate(zip(a, b)):
+                walk(x, y, path + [index])
+        elif type(a) is not type(b) or a != b:
+            changes.append([path, b])
+
+    walk(old, new, [])
+    return changes, removed
+
+
+def apply_delta(base: Any, changes: List[List[Any]], removed: List[List[Any]]) -> Any:
+    """New state from base and a diff_state() result (base is not modified)"""
+    state = copy.deepcopy(base)
+    for path, value in changes:
+        if not path:
+            state = copy.deepcopy(value)
+            continue
+        container = state
+        for key in path[:-1]:
+            container = container[key]
+        container[path[-1]] = value
+    for path in removed:
+        container = state
+        for key in path[:-1]:
+            container = container[key]
+        del container[path[-1]]
+    return state
+
+
+class DeltaEncoder:
+    """Sends SYSTEM_STATUS / VALVE_CONTROL states as deltas
+
+    Per subscriber group and state type the encoder keeps a base snapshot:
+    the last keyframe, or a later state the group acknowledged with a
+    STATE_ACK (see attach() and DeltaDecoder.attach()). Every delta is
+    relative to that base, so a lost delta does not break the next one.
+    A full keyframe (the regular message type, understood by any receiver)
+    is sent first, every keyframe_interval messages, at least every
+    keyframe_period_s seconds and when a group changes its target device.
+    """
+
+    def __init__(self, protocol: C20Protocol, keyframe_interval: int = 50,
+                 keyframe_period_s: float = 10.0, history: int = 64):
+        self.protocol = protocol
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_period_s = keyframe_period_s
+        self.history = history
+        # (group, type) -> [base sequence id, base payload, messages since keyframe,
+        #                   keyframe time, last sent payload]
+        self._bases: Dict[Tuple[Hashable, MessageType], list] = {}
+        # (group, type) -> recently sent states, for acknowledge()
+        self._sent: Dict[Tuple[Hashable, MessageType], OrderedDict] = {}
+        # (group, type) -> target device of the group's messages (None: broadcast)
+        self._targets: Dict[Tuple[Hashable, MessageType], Optional[DeviceType]] = {}
+        # (group, type) -> {sequence id: receivers that acknowledged a broadcast state}
+        self._acks: Dict[Tuple[Hashable, MessageType], Dict[int, Set[DeviceType]]] = {}
+        self.broadcast_receivers: frozenset = frozenset()
+        self.stats = {'keyframes': 0, 'deltas': 0, 'unchanged': 0, 'acks': 0, 'rebased': 0}
+
+    def encode(self, message_type: MessageType, state: Any, group: Hashable = 'default',
+               target_device: Optional[DeviceType] = None) -> Optional[C20Message]:
+        """Message for the new state, or None if nothing changed
+
+        state: SystemStatus / ValveControl object or an already encoded payload
+        """
+        if message_type not in DELTA_TYPES:
+            raise ValueError(f"Delta encoding not supported for {message_type.name}")
+        # Encoded payloads still share lists and dicts with the caller's state;
+        # a snapshot keeps the base and sent messages from changing with it
+        payload = copy.deepcopy(
+            state if type(state) is dict else PAYLOAD_SCHEMAS[message_type].encode(state))
+        key = (group, message_type)
+        base = self._bases.get(key)
+        now = time.monotonic()
+
+        # Sequence ids are per target stream, so a base is only valid for one target
+        if (base is None or base[2] >= self.keyframe_interval
+                or now - base[3] >= self.keyframe_period_s
+                or self._targets.get(key) != target_device):
+            message = self.protocol.create_message(message_type, payload, target_device)
+            self._bases[key] = [message.sequence_id, payload, 0, now, payload]
+            self._sent[key] = OrderedDict()
+            self._targets[key] = target_device
+            self._acks.pop(key, None)
+            self.stats['keyframes'] += 1
+            return message
+
+        if payload == base[4]:
+            self.stats['unchanged'] += 1
+            return None
+        changes, removed = diff_state(base[1], payload)
+        message = self.protocol.create_message(
+            MessageType.STATE_DELTA,
+            PAYLOAD_SCHEMAS[MessageType.STATE_DELTA].encode(
+                StateDelta(message_type.value, base[0], changes, removed)),
+            target_device
+        )
+        base[2] += 1
+        base[4] = payload
+        sent = self._sent[key]
+        sent[message.sequence_id] = payload
+        if len(sent) > self.history:
+            oldest, _ = sent.popitem(last=False)
+            self._acks.get(key, {}).pop(oldest, None)
+        self.stats['deltas'] += 1
+        return message
+
+    def acknowledge(self, message_type: MessageType, sequence_id: int, group: Hashable = 'default'):
+        """Group confirmed the state sent with sequence_id: use it as the new base"""
+        key = (group, message_type)
+        sent = self._sent.get(key)
+        if not sent or sequence_id not in sent:
+            return
+        base = self._bases[key]
+        base[0] = sequence_id
+        base[1] = sent[sequence_id]
+        # Older states can no longer become the base
+        while next(iter(sent)) != sequence_id:
+            oldest, _ = sent.popitem(last=False)
+            self._acks.get(key, {}).pop(oldest, None)
+        self.stats['rebased'] += 1
+
+    def receive_ack(self, receiver: DeviceType, ack: StateAck):
+        """Apply a STATE_ACK from receiver to the groups it concerns
+
+        A state sent to receiver's device becomes the base at once; a
+        broadcast state once every device in broadcast_receivers has
+        acknowledged it (never, if that set is empty).
+        """
+        self.stats['acks'] += 1
+        state_type = MESSAGE_TYPES_BY_CODE.get(ack.state_type)
+        target = None if ack.broadcast else receiver
+        for key, group_target in list(self._targets.items()):
+            if key[1] is not state_type or group_target != target:
+                continue
+            sent = self._sent.get(key)
+            if not sent or ack.sequence_id not in sent:
+                continue
+            if target is None:
+                receivers = self._acks.setdefault(key, {}).setdefault(ack.sequence_id, set())
+                receivers.add(receiver)
+                if not self.broadcast_receivers or not receivers >= self.broadcast_receivers:
+                    continue
+            self.acknowledge(state_type, ack.sequence_id, key[0])
+
+    def attach(self, broadcast_receivers: Iterable[DeviceType] = ()):
+        """Handle STATE_ACK messages arriving at self.protocol"""
+        self.broadcast_receivers = frozenset(broadcast_receivers)
+
+        def handle_state_ack(message: C20Message) -> None:
+            self.receive_ack(message.source_device, self.protocol.decode_payload(message))
+            return None
+
+        self.protocol.message_handlers[MessageType.STATE_ACK] = handle_state_ack
+        return self
+
+    def force_keyframe(self, group: Optional[Hashable] = None):
+        for key in list(self._bases):
+            if group is None or key[0] == group:
+                del self._bases[key]
+
+
+class DeltaDecoder:
+    """Reconstructs full states from keyframes and STATE_DELTA messages
+
+    apply() returns the full payload of the state type, or None while the
+    base of a delta is unknown (lost keyframe); the next keyframe resyncs.
+    attach() hooks the decoder into a protocol: deltas are rebuilt into
+    regular SYSTEM_STATUS / VALVE_CONTROL messages and passed to the
+    handlers registered for those types; with a `send` callable every
+    ack_interval-th rebuilt state of a stream is confirmed to its source
+    with a STATE_ACK, so the encoder can move its base forward.
+    """
+
+    def __init__(self, history: int = 64):
+        self.history = history
+        # (source, target, type) -> {sequence id: full payload}; sequence
+        # ids are only unique within one (source, target) stream
+        self._states: Dict[Tuple[DeviceType, Optional[DeviceType], MessageType], OrderedDict] = {}
+        # (source, target, type) -> rebuilt states since the last STATE_ACK
+        self._unacked: Dict[Tuple[DeviceType, Optional[DeviceType], MessageType], int] = {}
+        self.stats = {'keyframes': 0, 'deltas': 0, 'missing_base': 0, 'acks': 0}
+
+    def _remember(self, key, sequence_id: int, payload: Dict[str, Any]):
+        states = self._states.setdefault(key, OrderedDict())
+        states[sequence_id] = payload
+        if len(states) > self.history:
+            states.popitem(last=False)
+
+    def apply(self, message: C20Message) -> Optional[Dict[str, Any]]:
+        if message.message_type in DELTA_TYPES:
+            self._remember((message.source_device, message.target_device, message.message_type),
+                           message.sequence_id, message.payload)
+            self.stats['keyframes'] += 1
+            return message.payload
+        if message.message_type is not MessageType.STATE_DELTA:
+            raise ValueError(f"Not a state message: {message.message_type.name}")
+
+        delta = PAYLOAD_SCHEMAS[MessageType.STATE_DELTA].decode(message.payload)
+        state_type = MESSAGE_TYPES_BY_CODE.get(delta.state_type)
+        if state_type not in DELTA_TYPES:
+            raise PayloadError(f"StateDelta.state_type: unexpected value {delta.state_type!r}")
+        key = (message.source_device, message.target_device, state_type)
+        base = self._states.get(key, {}).get(delta.base_sequence)
+        if base is None:
+            self.stats['missing_base'] += 1
+            return None
+        try:
+            payload = apply_delta(base, delta.changes, delta.removed)
+        except (KeyError, IndexError, TypeError) as e:
+            raise PayloadError(f"StateDelta does not match its base: {e!r}") from None
+        self._remember(key, message.sequence_id, payload)
+        self.stats['deltas'] += 1
+        return payload
+
+    def attach(self, protocol: C20Protocol, send: Optional[Callable[[C20Message], Any]] = None,
+               ack_interval: int = 8):
+        """Call after the SYSTEM_STATUS / VALVE_CONTROL handlers are registered"""
+        handlers = protocol.message_handlers
+        encode_ack = PAYLOAD_SCHEMAS[MessageType.STATE_ACK].encode
+
+        def confirm(state: C20Message):
+            key = (state.source_device, state.target_device, state.message_type)
+            count = self._unacked.get(key, 0) + 1
+            if count >= ack_interval:
+                count = 0
+                send(protocol.create_message(
+                    MessageType.STATE_ACK,
+                    encode_ack(StateAck(state.message_type.value, state.sequence_id,
+                                        broadcast=state.target_device is None)),
+                    state.source_device
+                ))
+                self.stats['acks'] += 1
+            self._unacked[key] = count
+        state_handlers = {message_type: handlers.get(message_type) for message_type in DELTA_TYPES}
+
+        def wrap_keyframe(message_type):
+            handler = state_handlers[message_type]
+
+            def handle_keyframe(message: C20Message):
+                self.apply(message)
+                return handler(message) if handler else None
+            return handle_keyframe
+
+        def handle_delta(message: C20Message):
+            try:
+                payload = self.apply(message)
+                if payload is None:
+                    return None
+                state = C20Message(
+                    timestamp=message.timestamp,
+                    message_type=MESSAGE_TYPES_BY_CODE[protocol.decode_payload(message).state_type],
+                    source_device=message.source_device,
+                    target_device=message.target_device,
+                    sequence_id=message.sequence_id,
+                    payload=payload
+                )
+                protocol.decode_payload(state)  # validate the reconstructed state
+            except PayloadError:
+                return protocol.create_error_response(message, "INVALID_PAYLOAD")
+            if send is not None:
+                confirm(state)
+            handler = state_handlers[state.message_type]
+            return handler(state) if handler else None
+
+        for message_type in DELTA_TYPES:
+            handlers[message_type] = wrap_keyframe(message_type)
+        handlers[MessageType.STATE_DELTA] = handle_delta
+        return self
@@ -0,0 +1,271 @@
+"""
+C20 Message Dispatcher
+Asyncio dispatcher with bounded per-type queues and strict priorities, so
+floods of bulk data cannot delay ALARM and HEARTBEAT handling
+"""
+
+import asyncio
+import inspect
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from c20_protocol import C20Message, C20Protocol, MessageType
+
+# Lower value = handled first
+DEFAULT_PRIORITIES = {
+    MessageType.ALARM: 0,
+    MessageType.HEARTBEAT: 1,
+    MessageType.SYSTEM_STATUS: 2,
+    MessageType.RETRANSMIT_REQUEST: 2,
+    MessageType.VALVE_CONTROL: 3,
+    MessageType.STATE_DELTA: 3,
+    MessageType.TEST_PROCEDURE: 3,
+    MessageType.KEYBOARD_INPUT: 3,
+    MessageType.CONFIG_UPDATE: 4,
+    MessageType.LCD_DISPLAY: 5,
+    MessageType.MODBUS_DATA: 6,
+    MessageType.SENSOR_DATA: 7,
+    MessageType.SENSOR_BATCH: 7,
+}
+
+DEFAULT_QUEUE_SIZES = {
+    MessageType.ALARM: 1000,
+    MessageType.SENSOR_DATA: 5000,
+    MessageType.SENSOR_BATCH: 100,
+}
+
+
+class QueueMetrics:
+    """Counters and latency statistics of one message type queue"""
+
+    def __init__(self, window: int = 1000):
+        self.submitted = 0
+        self.handled = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.wait_max_s = 0.0
+        self.service_max_s = 0.0
+        self._wait = deque(maxlen=window)  # queue wait [s] of recent messages
+        self._service = deque(maxlen=window)  # handler run time [s]
+
+    def record(self, wait_s: float, service_s: float):
+        self.handled += 1
+        self._wait.append(wait_s)
+        self._service.append(service_s)
+        if wait_s > self.wait_max_s:
+            self.wait_max_s = wait_s
+        if service_s > self.service_max_s:
+            self.service_max_s = service_s
+
+    @staticmethod
+    def _percentile(values, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = [w + s for w, s in zip(self._wait, self._service)]
+        return {
+            'submitted': self.submitted,
+            'handled': self.handled,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'max_depth': self.max_depth,
+            'wait_p50_s': self._percentile(self._wait, 0.5),
+            'wait_max_s': self.wait_max_s,
+            'service_p50_s': self._percentile(self._service, 0.5),
+            'service_max_s': self.service_max_s,
+            'latency_p50_s': self._percentile(latency, 0.5),
+            'latency_p99_s': self._percentile(latency, 0.99),
+        }
+
+
+class MessageDispatcher:
+    """Prioritized asyncio front end for C20Protocol.process_message
+
+    Every message type has its own bounded queue. The scheduler always
+    starts the highest-priority queued message whose type still has a free
+    concurrency slot, so an ALARM waits at most for handlers that are
+    already running, never for queued bulk data. Bulk types default to a
+    concurrency of 1.
+
+    Handlers are the protocol's message_handlers; coroutine handlers are
+    awaited. Responses go to on_response (plain function or coroutine).
+    submit() blocks the producer while the queue of that type is full;
+    submit_nowait() drops the message and returns False instead.
+
+    Create the dispatcher inside the event loop that will run it.
+    """
+
+    def __init__(self, protocol: C20Protocol,
+                 priorities: Optional[Dict[MessageType, int]] = None,
+                 queue_sizes: Optional[Dict[MessageType, int]] = None,
+                 default_queue_size: int = 1000,
+                 concurrency: Optional[Dict[MessageType, int]] = None,
+                 default_concurrency: int = 1,
+                 on_response: Optional[Callable[[C20Message], Any]] = None):
+        self.protocol = protocol
+        self.on_response = on_response
+        priorities = {**DEFAULT_PRIORITIES, **(priorities or {})}
+        queue_sizes = {**DEFAULT_QUEUE_SIZES, **(queue_sizes or {})}
+        concurrency = concurrency or {}
+
+        self._order = sorted(MessageType, key=lambda t: priorities.get(t, max(priorities.values()) + 1))
+        self._queues = {t: asyncio.Queue(queue_sizes.get(t, default_queue_size)) for t in MessageType}
+        self._concurrency = {t: concurrency.get(t, default_concurrency) for t in MessageType}
+        self._in_flight = dict.fromkeys(MessageType, 0)
+        self._metrics = {t: QueueMetrics() for t in MessageType}
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+        self._scheduler: Optional[asyncio.Task] = None
+
+    def set_concurrency(self, message_type: MessageType, limit: int):
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1")
+        self._concurrency[message_type] = limit
+        self._wakeup.set()
+
+    async def submit(self, message: C20Message):
+        """Queue a message, waiting while its type's queue is full"""
+        queue = self._queues[message.message_type]
+        await queue.put((time.perf_counter(), message))
+        self._queued(message.message_type, queue)
+
+    def submit_nowait(self, message: C20Message) -> bool:
+        """Queue a message without waiting; returns False if it was dropped"""
+        queue = self._queues[message.message_type]
+        try:
+            queue.put_nowait((time.perf_counter(), message))
+        except asyncio.QueueFull:
+            self._metrics[message.message_type].dropped += 1
+            return False
+        self._queued(message.message_type, queue)
+        return True
+
+    def _queued(self, message_type: MessageType, queue: asyncio.Queue):
+        metrics = self._metrics[message_type]
+        metrics.submitted += 1
+        if queue.qsize() > metrics.max_depth:
+            metrics.max_depth = queue.qsize()
+        self._wakeup.set()
+
+    def _next(self):
+        for message_type in self._order:
+            queue = self._queues[message_type]
+            if queue.qsize() and self._in_flight[message_type] < self._concurrency[message_type]:
+                return message_type, queue.get_nowait()
+        return None, None
+
+    async def _schedule(self):
+        while True:
+            message_type, item = self._next()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self._in_flight[message_type] += 1
+            task = asyncio.ensure_future(self._handle(message_type, *item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            # Let the new handler start before picking the next message
+            await asyncio.sleep(0)
+
+    async def _handle(self, message_type: MessageType, enqueued: float, message: C20Message):
+        started = time.perf_counter()
+        try:
+            response = self.protocol.process_message(message)
+            if inspect.isawaitable(response):
+                response = await response
+            if response is not None and self.on_response:
+                result = self.on_response(response)
+                if inspect.isawaitable(result):
+                    await result
+        except Exception as e:
+            self._metrics[message_type].errors += 1
+            print(f"Handler error for {message_type.name}: {e}")
+        finally:
+            self._metrics[message_type].record(started - enqueued, time.perf_counter() - started)
+            self._in_flight[message_type] -= 1
+            self._wakeup.set()
+
+    def start(self):
+        """Start the scheduler on the running event loop"""
+        if self._scheduler is None:
+            self._scheduler = asyncio.ensure_future(self._schedule())
+
+    async def stop(self, drain: bool = True):
+        """Stop scheduling; with drain=True queued messages are handled first"""
+        if drain:
+            while any(q.qsize() for q in self._queues.values()) or self._tasks:
+                await asyncio.sleep(0.001)
+        if self._scheduler:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {t.name: q.qsize() for t, q in self._queues.items() if q.qsize()}
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-type counters, current depth and latency statistics"""
+        report = {}
+        for message_type, metrics in self._metrics.items():
+            if not metrics.submitted:
+                continue
+            report[message_type.name] = {
+                'depth': self._queues[message_type].qsize(),
+                'in_flight': self._in_flight[message_type],
+                **metrics.to_dict(),
+            }
+        return report
+
+
+async def _flood_demo(n_sensor: int = 20000, n_alarms: int = 50):
+    """Alarm latency while a producer floods SENSOR_DATA"""
+    from c20_protocol import DeviceType, SensorType, create_test_sensor_data
+
+    sender = C20Protocol(DeviceType.PRESSURE_SENSOR)
+    receiver = C20Protocol(DeviceType.RPI_CONTROLLER)
+
+    async def handle_sensor(message):
+        await asyncio.sleep(0)  # stands in for storage/forwarding
+
+    receiver.message_handlers[MessageType.SENSOR_DATA] = handle_sensor
+    receiver.message_handlers[MessageType.ALARM] = lambda message: None
+    dispatcher = MessageDispatcher(receiver)
+    dispatcher.start()
+
+    sensor_message = sender.create_sensor_data_message(
+        create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48))
+    alarm = sender.create_message(MessageType.ALARM, {'error_code': 'OVERPRESSURE'})
+
+    async def flood():
+        for _ in range(n_sensor):
+            await dispatcher.submit(sensor_message)
+
+    async def alarms():
+        for _ in range(n_alarms):
+            await asyncio.sleep(0.005)
+            dispatcher.submit_nowait(alarm)
+
+    started = time.perf_counter()
+    await asyncio.gather(flood(), alarms())
+    await dispatcher.stop()
+    elapsed = time.perf_counter() - started
+
+    for name, row in dispatcher.metrics().items():
+        print(f"{name:<12} handled {row['handled']:>6} max depth {row['max_depth']:>5} "
+              f"latency p50 {row['latency_p50_s'] * 1e3:7.3f} ms  p99 {row['latency_p99_s'] * 1e3:7.3f} ms")
+    print(f"{n_sensor / elapsed:,.0f} SENSOR_DATA msg/s")
+
+
+if __name__ == '__main__':
+    asyncio.run(_flood_demo())
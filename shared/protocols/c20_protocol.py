@@ -4,10 +4,16 @@ Defines communication protocols and data structures for C20 system components
 """
 
 import json
+import numbers
+import re
+import sys
 import time
+import zlib
+from array import array
 from enum import Enum
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Any, Union
+from dataclasses import MISSING, dataclass, field, fields, is_dataclass
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional, Any, Union, get_args, get_origin, get_type_hints
 import struct
 
 class MessageType(Enum):
@@ -22,6 +28,10 @@ class MessageType(Enum):
     HEARTBEAT = 0x08
     CONFIG_UPDATE = 0x09
     MODBUS_DATA = 0x0A
+    SENSOR_BATCH = 0x0B
+    RETRANSMIT_REQUEST = 0x0C
+    STATE_DELTA = 0x0D
+    STATE_ACK = 0x0E
 
 class DeviceType(Enum):
     """C20 Device Types"""
@@ -49,28 +59,51 @@ class C20Message:
     sequence_id: int
     payload: Dict[str, Any]
     checksum: Optional[str] = None
+    # Canonical encoding (BinaryCodec.canonical_bytes) cached by checksum
+    # calculation and binary decoding; messages are immutable once created
+    _canonical: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    # Typed payload cached by C20Protocol.decode_payload
+    _decoded: Any = field(default=None, init=False, repr=False, compare=False)
 
     def to_json(self) -> str:
         """Convert message to JSON string"""
-        data = asdict(self)
-        data['message_type'] = self.message_type.value
-        data['source_device'] = self.source_device.value
-        data['target_device'] = self.target_device.value if self.target_device else None
-        return json.dumps(data)
+        # Built directly instead of asdict(): the payload is already JSON-ready,
+        # so the recursive deep copy is pure overhead on the hot path
+        return json.dumps({
+            'timestamp': self.timestamp,
+            'message_type': self.message_type.value,
+            'source_device': self.source_device.value,
+            'target_device': self.target_device.value if self.target_device else None,
+            'sequence_id': self.sequence_id,
+            'payload': self.payload,
+            'checksum': self.checksum
+        })
 
     @classmethod
     def from_json(cls, json_str: str) -> 'C20Message':
-        """Create message from JSON string"""
+        """Create message from JSON string (ValueError if malformed)"""
         data = json.loads(json_str)
-        return cls(
-            timestamp=data['timestamp'],
-            message_type=MessageType(data['message_type']),
-            source_device=DeviceType(data['source_device']),
-            target_device=DeviceType(data['target_device']) if data['target_device'] else None,
-            sequence_id=data['sequence_id'],
-            payload=data['payload'],
-            checksum=data.get('checksum')
-        )
+        try:
+            return cls(
+                timestamp=data['timestamp'],
+                message_type=MessageType(data['message_type']),
+                source_device=DeviceType(data['source_device']),
+                target_device=DeviceType(data['target_device']) if data['target_device'] else None,
+                sequence_id=data['sequence_id'],
+                payload=data['payload'],
+                checksum=data.get('checksum')
+            )
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Malformed JSON message: {e!r}") from None
+
+    def to_bytes(self, payload_encoding: str = 'compact') -> bytes:
+        """Convert message to the binary wire format (see BinaryCodec)"""
+        return BinaryCodec.encode(self, payload_encoding)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'C20Message':
+        """Create message from the binary wire format"""
+        return BinaryCodec.decode(data)
 
 @dataclass
 class SensorData:
@@ -116,13 +149,404 @@ class TestProcedure:
     required_devices: List[DeviceType]
     parameters: Dict[str, Any]
 
+@dataclass
+class TestProcedureCommand:
+    """TEST_PROCEDURE payload: action plus the procedure fields (flat on the wire)"""
+    action: str  # "START", "STOP", "PAUSE", "RESUME", "STATUS"
+    procedure: TestProcedure
+
+@dataclass
+class ValveControl:
+    """VALVE_CONTROL payload"""
+    valves: List[ValveState]
+
+@dataclass
+class Heartbeat:
+    """HEARTBEAT payload"""
+    status: str
+    device_type: str
+    timestamp: float
+
+@dataclass
+class RetransmitRequest:
+    """RETRANSMIT_REQUEST payload: sequence ids the receiver is missing
+
+    The ids belong to the sender's stream addressed to the requesting
+    device, or to its broadcast stream when broadcast is set.
+    """
+    sequence_ids: List[int]
+    broadcast: bool = False
+
+@dataclass
+class StateDelta:
+    """STATE_DELTA payload: changes of a SYSTEM_STATUS / VALVE_CONTROL state
+
+    changes: [path, value] pairs, removed: paths; a path is a list of dict
+    keys and list indices into the payload of `state_type`. The base is the
+    full state sent with sequence id `base_sequence`.
+    """
+    state_type: int
+    base_sequence: int
+    changes: List[List[Any]]
+    removed: List[List[Any]]
+
+@dataclass
+class StateAck:
+    """STATE_ACK payload: the receiver holds the full `state_type` state sent
+    with `sequence_id` (in the sender's broadcast stream if broadcast is set)
+    """
+    state_type: int
+    sequence_id: int
+    broadcast: bool = False
+
+@dataclass
+class Alarm:
+    """ALARM payload"""
+    error_code: str
+    original_sequence: Optional[int] = None
+    original_type: Optional[int] = None
+
+# Compact Message Objects
+class _SlottedRecord:
+    """Base for slotted records; subclasses set FIELDS and matching __slots__"""
+
+    __slots__ = ()
+    FIELDS: tuple = ()
+    DEFAULTS: Dict[str, Any] = {}
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.FIELDS, args):
+            setattr(self, name, value)
+        for name in self.FIELDS[len(args):]:
+            if name in kwargs:
+                setattr(self, name, kwargs[name])
+            elif name in self.DEFAULTS:
+                setattr(self, name, self.DEFAULTS[name])
+            else:
+                raise TypeError(f"{type(self).__name__} missing argument: '{name}'")
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+class CompactSensorData(_SlottedRecord):
+    """Slotted counterpart of SensorData (no per-instance __dict__)"""
+    FIELDS = tuple(f.name for f in fields(SensorData))
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_dataclass(cls, data: SensorData) -> 'CompactSensorData':
+        return cls(*attrgetter(*cls.FIELDS)(data))
+
+    def to_dataclass(self) -> SensorData:
+        return SensorData(*attrgetter(*self.FIELDS)(self))
+
+
+class CompactValveState(_SlottedRecord):
+    """Slotted counterpart of ValveState (no per-instance __dict__)"""
+    FIELDS = tuple(f.name for f in fields(ValveState))
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_dataclass(cls, state: ValveState) -> 'CompactValveState':
+        return cls(*attrgetter(*cls.FIELDS)(state))
+
+    def to_dataclass(self) -> ValveState:
+        return ValveState(*attrgetter(*self.FIELDS)(self))
+
+
+class CompactC20Message(_SlottedRecord):
+    """Slotted counterpart of C20Message
+
+    Accepted everywhere a C20Message is (BinaryCodec, checksum
+    calculation) and reusable through MessagePool.
+    """
+    FIELDS = ('timestamp', 'message_type', 'source_device', 'target_device',
+              'sequence_id', 'payload', 'checksum')
+    DEFAULTS = {'checksum': None}
+    __slots__ = FIELDS + ('_canonical', '_decoded')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._canonical = None
+        self._decoded = None
+
+    def reset(self):
+        """Drop cached encodings before the instance goes back to the pool
+
+        The payload dict is kept: create_pooled_message overwrites it in
+        place for the next message instead of allocating a new one.
+        """
+        self.checksum = None
+        self._canonical = None
+        self._decoded = None
+
+    to_json = C20Message.to_json
+    to_bytes = C20Message.to_bytes
+
+    @classmethod
+    def from_message(cls, message: C20Message) -> 'CompactC20Message':
+        compact = cls(*attrgetter(*cls.FIELDS)(message))
+        compact._canonical = message._canonical
+        return compact
+
+    def to_message(self) -> C20Message:
+        """Independent C20Message (the payload dict is copied)"""
+        message = C20Message(*attrgetter(*self.FIELDS)(self))
+        if self.payload is not None:
+            message.payload = dict(self.payload)
+        message._canonical = self._canonical
+        return message
+
+
+class MessagePool:
+    """Free list of reusable objects for high-rate producers
+
+    acquire() returns a recycled instance when one is available; release()
+    resets it and keeps at most max_size instances.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = 256):
+        self.factory = factory
+        self.max_size = max_size
+        self._free: List[Any] = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self):
+        if self._free:
+            self.reused += 1
+            return self._free.pop()
+        self.created += 1
+        return self.factory()
+
+    def release(self, obj):
+        if len(self._free) < self.max_size:
+            reset = getattr(obj, 'reset', None)
+            if reset:
+                reset()
+            self._free.append(obj)
+
+
+# Payload Schemas
+class PayloadError(ValueError):
+    """Payload does not match the schema of its message type"""
+
+
+class RecordSchema:
+    """Payload schema derived from a dataclass, compiled to Python functions
+
+    Field types come from the dataclass annotations (float, int, str, bool,
+    enums, List[...], Dict[...], Optional[...], nested dataclasses). They
+    are turned once into straight-line source code for three functions:
+
+        encode(obj) -> payload dict
+        encode_into(obj, payload) -> payload, overwritten in place
+        decode(payload) -> dataclass instance, validating as it goes
+        validate(payload) -> None, raises PayloadError
+
+    Fields named in `inline` hold a nested dataclass whose fields are stored
+    flat in the same payload dict.
+    """
+
+    _compiled: Dict[type, 'RecordSchema'] = {}
+
+    def __init__(self, cls: type, inline: tuple = ()):
+        self.cls = cls
+        self.inline = inline
+        hints = get_type_hints(cls)
+        self.fields = [(f.name, hints[f.name], f.default) for f in fields(cls)]
+        self._namespace = {'PayloadError': PayloadError, 'cls': cls, 'MISSING': MISSING}
+        self.encode = self._compile_encoder()
+        self.encode_into = self._compile_in_place_encoder()
+        self.decode = self._compile_decoder(build=True)
+        self.validate = self._compile_decoder(build=False)
+
+    @classmethod
+    def for_class(cls, record_cls: type) -> 'RecordSchema':
+        schema = cls._compiled.get(record_cls)
+        if schema is None:
+            schema = cls._compiled[record_cls] = cls(record_cls)
+        return schema
+
+    def _bind(self, value) -> str:
+        name = f"_n{len(self._namespace)}"
+        self._namespace[name] = value
+        return name
+
+    @staticmethod
+    def _unwrap_optional(hint):
+        args = get_args(hint)
+        if get_origin(hint) is Union and type(None) in args:
+            rest = [a for a in args if a is not type(None)]
+            return (rest[0] if len(rest) == 1 else Any), True
+        return hint, False
+
+    def _compile(self, name: str, source: str):
+        exec(source, self._namespace)
+        function = self._namespace.pop(name)
+        function.source = source
+        return function
+
+    def _encode_expr(self, expr: str, hint) -> str:
+        hint, nullable = self._unwrap_optional(hint)
+        origin = get_origin(hint)
+        if isinstance(hint, type) and issubclass(hint, Enum):
+            value = f"{expr}.value"
+        elif is_dataclass(hint):
+            value = f"{self._bind(RecordSchema.for_class(hint).encode)}({expr})"
+        elif origin is list and get_args(hint):
+            item = self._encode_expr('i', get_args(hint)[0])
+            value = expr if item == 'i' else f"[{item} for i in {expr}]"
+        else:
+            return expr
+        return f"({value} if {expr} is not None else None)" if nullable else value
+
+    def _compile_encoder(self):
+        items = []
+        for name, hint, _ in self.fields:
+            if name in self.inline:
+                items.append(f"**{self._bind(RecordSchema.for_class(hint).encode)}(o.{name})")
+            else:
+                items.append(f"{name!r}: {self._encode_expr(f'o.{name}', hint)}")
+        return self._compile('encode', f"def encode(o):\n    return {{{', '.join(items)}}}\n")
+
+    def _compile_in_place_encoder(self):
+        # Assigning existing keys reuses the dict's storage (MessagePool)
+        lines = ["def encode_into(o, p):"]
+        for name, hint, _ in self.fields:
+            if name in self.inline:
+                lines.append(f"    {self._bind(RecordSchema.for_class(hint).encode_into)}(o.{name}, p)")
+            else:
+                lines.append(f"    p[{name!r}] = {self._encode_expr(f'o.{name}', hint)}")
+        lines.append("    return p")
+        return self._compile('encode_into', '\n'.join(lines) + '\n')
+
+    def _check(self, var: str, hint, label: str, build: bool, indent: str) -> List[str]:
+        """Source lines checking (and for decode, converting) variable `var`"""
+        hint, nullable = self._unwrap_optional(hint)
+        bad = f"{indent}    raise PayloadError(f'{self.cls.__name__}.{label}: unexpected value {{{var}!r}}')"
+        origin = get_origin(hint)
+        lines = []
+        if hint is float:
+            lines += [f"{indent}if type({var}) is not float and type({var}) is not int:", bad]
+        elif hint in (int, str, bool):
+            lines += [f"{indent}if type({var}) is not {hint.__name__}:", bad]
+        elif origin is dict or hint is dict:
+            lines += [f"{indent}if type({var}) is not dict:", bad]
+        elif isinstance(hint, type) and issubclass(hint, Enum):
+            lookup = self._bind({member.value: member for member in hint})
+            lines += [f"{indent}{var}_ = {lookup}.get({var})",
+                      f"{indent}if {var}_ is None:", bad]
+            if build:
+                lines.append(f"{indent}{var} = {var}_")
+        elif is_dataclass(hint):
+            schema = RecordSchema.for_class(hint)
+            function = self._bind(schema.decode if build else schema.validate)
+            lines.append(f"{indent}{var + ' = ' if build else ''}{function}({var})")
+        elif origin is list or hint is list:
+            lines += [f"{indent}if type({var}) is not list:", bad]
+            item_hint = get_args(hint)[0] if get_args(hint) else Any
+            item_lines = self._check('i', item_hint, f"{label}[]", build, indent + '    ')
+            if item_lines:
+                converts = build and any(line.strip().startswith('i =') for line in item_lines)
+                if converts:
+                    lines.append(f"{indent}{var}_l = []")
+                lines.append(f"{indent}for i in {var}:")
+                lines += item_lines
+                if converts:
+                    lines += [f"{indent}    {var}_l.append(i)", f"{indent}{var} = {var}_l"]
+        if nullable and lines:
+            lines = [f"{indent}if {var} is not None:"] + ['    ' + line for line in lines]
+        return lines
+
+    def _compile_decoder(self, build: bool):
+        name = 'decode' if build else 'validate'
+        body = [
+            f"def {name}(p):",
+            "    if type(p) is not dict:",
+            f"        raise PayloadError('{self.cls.__name__}: payload must be an object, got ' + type(p).__name__)",
+            "    try:",
+        ]
+        arguments = []
+        for index, (field_name, hint, default) in enumerate(self.fields):
+            var = f"v{index}"
+            arguments.append(var)
+            if field_name in self.inline:
+                schema = RecordSchema.for_class(hint)
+                function = self._bind(schema.decode if build else schema.validate)
+                body.append(f"        {var} = {function}(p)")
+                continue
+            if default is MISSING:
+                body.append(f"        {var} = p[{field_name!r}]")
+            else:
+                body.append(f"        {var} = p.get({field_name!r}, {self._bind(default)})")
+            body += self._check(var, hint, field_name, build, '        ')
+        body += [
+            "    except KeyError as e:",
+            f"        raise PayloadError(f'{self.cls.__name__}: missing field {{e}}') from None",
+            "    except TypeError as e:",
+            f"        raise PayloadError(f'{self.cls.__name__}: {{e}}') from None",
+            f"    return cls({', '.join(arguments)})" if build else "    return None",
+        ]
+        return self._compile(name, '\n'.join(body) + '\n')
+
+
+class FreeFormSchema:
+    """Schema of message types without a fixed layout: any JSON object"""
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> Dict[str, Any]:
+        return payload
+
+    @staticmethod
+    def encode_into(payload: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+        target.clear()
+        target.update(payload)
+        return target
+
+    @staticmethod
+    def validate(payload: Any):
+        if type(payload) is not dict:
+            raise PayloadError(f"Payload must be an object, got {type(payload).__name__}")
+
+    @classmethod
+    def decode(cls, payload: Any) -> Dict[str, Any]:
+        cls.validate(payload)
+        return payload
+
+
+# SENSOR_BATCH is registered next to SensorBatch
+PAYLOAD_SCHEMAS: Dict[MessageType, Any] = {
+    MessageType.SYSTEM_STATUS: RecordSchema.for_class(SystemStatus),
+    MessageType.SENSOR_DATA: RecordSchema.for_class(SensorData),
+    MessageType.VALVE_CONTROL: RecordSchema.for_class(ValveControl),
+    MessageType.TEST_PROCEDURE: RecordSchema(TestProcedureCommand, inline=('procedure',)),
+    MessageType.ALARM: RecordSchema.for_class(Alarm),
+    MessageType.HEARTBEAT: RecordSchema.for_class(Heartbeat),
+    MessageType.RETRANSMIT_REQUEST: RecordSchema.for_class(RetransmitRequest),
+    MessageType.STATE_DELTA: RecordSchema.for_class(StateDelta),
+    MessageType.STATE_ACK: RecordSchema.for_class(StateAck),
+}
+
+
 class C20Protocol:
     """C20 Communication Protocol Handler"""
     
     def __init__(self, device_type: DeviceType):
         self.device_type = device_type
-        self.sequence_counter = 0
+        # Sequence ids count per target device (None: broadcasts), so each
+        # receiver sees a gap-free stream from every source
+        self.sequence_counters: Dict[Optional[DeviceType], int] = {}
         self.message_handlers = {}
+        # Sent messages kept for retransmission (c20_sequence.ReplayBuffer)
+        self.replay_buffer = None
         self.setup_default_handlers()
 
     def setup_default_handlers(self):
@@ -138,35 +562,105 @@ class C20Protocol:
         target_device: Optional[DeviceType] = None
     ) -> C20Message:
         """Create a new protocol message"""
-        self.sequence_counter += 1
-        
         message = C20Message(
             timestamp=time.time(),
             message_type=message_type,
             source_device=self.device_type,
             target_device=target_device,
-            sequence_id=self.sequence_counter,
+            sequence_id=self.next_sequence(target_device),
             payload=payload
         )
         
         # Calculate checksum
         message.checksum = self.calculate_checksum(message)
+        if self.replay_buffer is not None:
+            self.replay_buffer.store(message)
         return message
 
+    def create_pooled_message(
+        self,
+        pool: MessagePool,
+        message_type: MessageType,
+        record: Any,
+        target_device: Optional[DeviceType] = None
+    ) -> CompactC20Message:
+        """Like create_message, but fills a CompactC20Message from the pool
+
+        `record` is what PAYLOAD_SCHEMAS[message_type].encode takes (a
+        dataclass or its slotted counterpart, a dict for free-form types).
+        It is encoded into the payload dict the pooled instance already
+        owns, so a producer that also reuses its record allocates no
+        containers per message. The caller returns the message with
+        pool.release() once it has been encoded; with a replay buffer
+        attached an independent copy is stored for retransmission.
+        """
+        message = pool.acquire()
+        payload = message.payload
+        if payload is None:
+            payload = message.payload = {}
+        elif message.message_type is not message_type:
+            payload.clear()
+        PAYLOAD_SCHEMAS.get(message_type, FreeFormSchema).encode_into(record, payload)
+        message.timestamp = time.time()
+        message.message_type = message_type
+        message.source_device = self.device_type
+        message.target_device = target_device
+        message.sequence_id = self.next_sequence(target_device)
+        message._canonical = None
+        message._decoded = None
+        message.checksum = self.calculate_checksum(message)
+        if self.replay_buffer is not None:
+            self.replay_buffer.store(message.to_message())
+        return message
+
+    def next_sequence(self, target_device: Optional[DeviceType] = None) -> int:
+        """Next sequence id of the stream to target_device"""
+        sequence_id = self.sequence_counters.get(target_device, 0) + 1
+        self.sequence_counters[target_device] = sequence_id
+        return sequence_id
+
     def calculate_checksum(self, message: C20Message) -> str:
-        """Calculate message checksum for integrity verification"""
-        data = f"{message.timestamp}{message.message_type.value}{message.sequence_id}{json.dumps(message.payload, sort_keys=True)}"
-        return hex(hash(data) & 0xFFFFFFFF)[2:]
+        """Calculate message checksum for integrity verification
+
+        CRC32 over the canonical binary encoding, so the result is the same
+        in every process. The encoded bytes are cached on the message and
+        reused by BinaryCodec.encode and by verification.
+        """
+        canonical = message._canonical
+        if canonical is None:
+            canonical = message._canonical = BinaryCodec.canonical_bytes(message)
+        return format(zlib.crc32(canonical), '08x')
 
     def verify_checksum(self, message: C20Message) -> bool:
         """Verify message checksum"""
         expected = self.calculate_checksum(message)
         return expected == message.checksum
 
+    def decode_payload(self, message: C20Message) -> Any:
+        """Typed payload of a message (see PAYLOAD_SCHEMAS), decoded once
+
+        Raises PayloadError for malformed payloads. Message types without a
+        schema return the payload dict.
+        """
+        decoded = message._decoded
+        if decoded is None:
+            schema = PAYLOAD_SCHEMAS.get(message.message_type, FreeFormSchema)
+            decoded = message._decoded = schema.decode(message.payload)
+        return decoded
+
     def process_message(self, message: C20Message) -> Optional[C20Message]:
-        """Process incoming message and return response if needed"""
+        """Process incoming message and return response if needed
+
+        Payloads are validated and decoded before the handler runs;
+        handlers get the typed payload from decode_payload(message).
+        """
         if not self.verify_checksum(message):
             return self.create_error_response(message, "CHECKSUM_ERROR")
+
+        try:
+            self.decode_payload(message)
+        except PayloadError:
+            return self.create_error_response(message, "INVALID_PAYLOAD")
         
         handler = self.message_handlers.get(message.message_type)
         if handler:
@@ -174,15 +668,19 @@ class C20Protocol:
         else:
             return self.create_error_response(message, "UNKNOWN_MESSAGE_TYPE")
 
-    def handle_heartbeat(self, message: C20Message) -> C20Message:
-        """Handle heartbeat message"""
+    def handle_heartbeat(self, message: C20Message) -> Optional[C20Message]:
+        """Handle heartbeat message
+
+        "alive" heartbeats are answers (or periodic broadcasts) and are not
+        answered again; otherwise two devices on a shared bus would keep
+        replying to each other.
+        """
+        if self.decode_payload(message).status == "alive":
+            return None
         return self.create_message(
             MessageType.HEARTBEAT,
-            {
-                "status": "alive",
-                "device_type": self.device_type.value,
-                "timestamp": time.time()
-            },
+            PAYLOAD_SCHEMAS[MessageType.HEARTBEAT].encode(
+                Heartbeat("alive", self.device_type.value, time.time())),
             message.source_device
         )
 
@@ -200,11 +698,11 @@ class C20Protocol:
         """Create error response message"""
         return self.create_message(
             MessageType.ALARM,
-            {
-                "error_code": error_code,
-                "original_sequence": original_message.sequence_id,
-                "original_type": original_message.message_type.value
-            },
+            PAYLOAD_SCHEMAS[MessageType.ALARM].encode(Alarm(
+                error_code,
+                original_message.sequence_id,
+                original_message.message_type.value
+            )),
             original_message.source_device
         )
 
@@ -212,34 +710,27 @@ class C20Protocol:
         """Create sensor data message"""
         return self.create_message(
             MessageType.SENSOR_DATA,
-            {
-                "sensor_type": sensor_data.sensor_type.value,
-                "i2c_address": sensor_data.i2c_address,
-                "pressure_mbar": sensor_data.pressure_mbar,
-                "temperature_c": sensor_data.temperature_c,
-                "voltage_v": sensor_data.voltage_v,
-                "status": sensor_data.status,
-                "calibration_date": sensor_data.calibration_date,
-                "serial_number": sensor_data.serial_number
-            }
+            PAYLOAD_SCHEMAS[MessageType.SENSOR_DATA].encode(sensor_data)
+        )
+
+    def create_sensor_batch_message(
+        self,
+        batch: 'SensorBatch',
+        target_device: Optional[DeviceType] = None,
+        binary: bool = True
+    ) -> C20Message:
+        """Create columnar batched sensor data message"""
+        return self.create_message(
+            MessageType.SENSOR_BATCH,
+            batch.to_payload(binary),
+            target_device
         )
 
     def create_valve_control_message(self, valve_states: List[ValveState]) -> C20Message:
         """Create valve control message"""
         return self.create_message(
             MessageType.VALVE_CONTROL,
-            {
-                "valves": [
-                    {
-                        "valve_id": v.valve_id,
-                        "i2c_address": v.i2c_address,
-                        "output_state": v.output_state,
-                        "pwm_duty_cycle": v.pwm_duty_cycle,
-                        "current_ma": v.current_ma,
-                        "status": v.status
-                    } for v in valve_states
-                ]
-            }
+            PAYLOAD_SCHEMAS[MessageType.VALVE_CONTROL].encode(ValveControl(valve_states))
         )
 
     def create_lcd_display_message(self, display_data: Dict[str, Any]) -> C20Message:
@@ -261,16 +752,8 @@ class C20Protocol:
         """Create test procedure message"""
         return self.create_message(
             MessageType.TEST_PROCEDURE,
-            {
-                "action": action,  # "START", "STOP", "PAUSE", "RESUME", "STATUS"
-                "procedure_id": procedure.procedure_id,
-                "name": procedure.name,
-                "description": procedure.description,
-                "steps": procedure.steps,
-                "expected_duration_s": procedure.expected_duration_s,
-                "required_devices": [d.value for d in procedure.required_devices],
-                "parameters": procedure.parameters
-            }
+            PAYLOAD_SCHEMAS[MessageType.TEST_PROCEDURE].encode(
+                TestProcedureCommand(action, procedure))
         )
 
     def create_modbus_data_message(self, modbus_data: Dict[str, Any]) -> C20Message:
@@ -280,6 +763,581 @@ class C20Protocol:
             modbus_data
         )
 
+# Binary Wire Format
+DEVICE_CODES = {
+    DeviceType.RPI_CONTROLLER: 0x01,
+    DeviceType.LCD_DISPLAY: 0x02,
+    DeviceType.HUI_KEYBOARD: 0x03,
+    DeviceType.PRESSURE_SENSOR: 0x04,
+    DeviceType.VALVE_CONTROLLER: 0x05,
+    DeviceType.MODBUS_IO: 0x06,
+    DeviceType.TEST_UNIT: 0x07
+}
+DEVICES_BY_CODE = {code: device for device, code in DEVICE_CODES.items()}
+MESSAGE_TYPES_BY_CODE = {message_type.value: message_type for message_type in MessageType}
+
+
+class CompactPayloadCodec:
+    """Tagged binary encoding for JSON-compatible payloads
+
+    Every value is a one-byte tag followed by a fixed-size or
+    length-prefixed body (big-endian). Integers use the smallest of
+    int8/int32/int64, floats are always float64 so values round-trip
+    exactly like JSON.
+
+    Binary values (BYTES) decode to read-only memoryviews of the input
+    buffer instead of copies.
+
+    Flat dicts of str/float/int/bool values (the typical sensor and valve
+    record) are packed as a RECORD: a descriptor with the keys and a
+    struct format, followed by all values in one struct.pack call.
+    Descriptors are cached on both sides, so repeated layouts cost one
+    dict lookup and a single unpack.
+    """
+
+    NONE, FALSE, TRUE = 0x00, 0x01, 0x02
+    INT8, INT32, INT64 = 0x03, 0x04, 0x05
+    FLOAT = 0x06
+    STR, LIST, DICT, BYTES = 0x07, 0x08, 0x09, 0x0A
+    RECORD = 0x0B
+
+    _record_field = re.compile(r'\d+s|[dq?]')
+    _record_format = re.compile(r'(?:\d+s|[dq?])*')
+    _record_encoders: Dict[tuple, tuple] = {}
+    _record_decoders: Dict[bytes, tuple] = {}
+    MAX_CACHED_LAYOUTS = 1024
+
+    _tag = struct.Struct('>B')
+    _int8 = struct.Struct('>Bb')
+    _int32 = struct.Struct('>Bi')
+    _int64 = struct.Struct('>Bq')
+    _float = struct.Struct('>Bd')
+    _sized = struct.Struct('>BI')
+    _u32 = struct.Struct('>I')
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        out = bytearray()
+        cls._encode(value, out)
+        return bytes(out)
+
+    @classmethod
+    def _encode(cls, value: Any, out: bytearray):
+        # Checked in order of frequency in C20 payloads; bool before int
+        value_type = type(value)
+        if value_type is float:
+            out += cls._float.pack(cls.FLOAT, value)
+        elif value_type is str:
+            raw = value.encode('utf-8')
+            out += cls._sized.pack(cls.STR, len(raw))
+            out += raw
+        elif value_type is bool:
+            out.append(cls.TRUE if value else cls.FALSE)
+        elif value_type is int:
+            if -0x80 <= value < 0x80:
+                out += cls._int8.pack(cls.INT8, value)
+            elif -0x80000000 <= value < 0x80000000:
+                out += cls._int32.pack(cls.INT32, value)
+            elif -0x8000000000000000 <= value < 0x8000000000000000:
+                out += cls._int64.pack(cls.INT64, value)
+            else:
+                raise ValueError(f"Integer {value} out of int64 range")
+        elif value is None:
+            out.append(cls.NONE)
+        elif value_type is dict:
+            if cls._encode_record(value, out):
+                return
+            out += cls._sized.pack(cls.DICT, len(value))
+            for key, item in value.items():
+                raw = str(key).encode('utf-8')
+                out += cls._u32.pack(len(raw))
+                out += raw
+                cls._encode(item, out)
+        elif value_type in (list, tuple):
+            out += cls._sized.pack(cls.LIST, len(value))
+            for item in value:
+                cls._encode(item, out)
+        elif value_type in (bytes, bytearray, memoryview):
+            out += cls._sized.pack(cls.BYTES, len(value))
+            out += value
+        elif isinstance(value, Enum):
+            cls._encode(value.value, out)
+        # Other numeric types, e.g. NumPy scalars
+        elif isinstance(value, numbers.Integral):
+            cls._encode(int(value), out)
+        elif isinstance(value, numbers.Real):
+            cls._encode(float(value), out)
+        else:
+            raise TypeError(f"Object of type {value_type.__name__} is not C20 payload serializable")
+
+    @classmethod
+    def _encode_record(cls, value: Dict[str, Any], out: bytearray) -> bool:
+        """Pack a flat dict as RECORD; returns False if it has other value types"""
+        fmt = ['>']
+        args = []
+        for item in value.values():
+            item_type = type(item)
+            if item_type is float:
+                fmt.append('d')
+                args.append(item)
+            elif item_type is str:
+                raw = item.encode('utf-8')
+                fmt.append(f'{len(raw)}s')
+                args.append(raw)
+            elif item_type is bool:
+                fmt.append('?')
+                args.append(item)
+            elif item_type is int and -0x8000000000000000 <= item < 0x8000000000000000:
+                fmt.append('q')
+                args.append(item)
+            elif isinstance(item, numbers.Integral) and -0x8000000000000000 <= item < 0x8000000000000000:
+                fmt.append('q')
+                args.append(int(item))
+            elif isinstance(item, numbers.Real) and item_type is not int:
+                fmt.append('d')
+                args.append(float(item))
+            else:
+                return False
+
+        layout = (tuple(value), ''.join(fmt))
+        encoder = cls._record_encoders.get(layout)
+        if encoder is None:
+            if not all(type(key) is str and '\x1f' not in key and '\x1e' not in key for key in layout[0]):
+                return False
+            keys = '\x1f'.join(layout[0]).encode('utf-8')
+            descriptor = keys + b'\x1e' + layout[1].encode('ascii')
+            prefix = cls._tag.pack(cls.RECORD) + cls._u32.pack(len(descriptor)) + descriptor
+            encoder = (prefix, struct.Struct(layout[1]))
+            if len(cls._record_encoders) < cls.MAX_CACHED_LAYOUTS:
+                cls._record_encoders[layout] = encoder
+
+        out += encoder[0]
+        out += encoder[1].pack(*args)
+        return True
+
+    @classmethod
+    def _decode_record(cls, data: memoryview, offset: int):
+        size = cls._u32.unpack_from(data, offset + 1)[0]
+        start = offset + 5
+        descriptor = bytes(data[start:start + size])
+        decoder = cls._record_decoders.get(descriptor)
+        if decoder is None:
+            keys, fmt = descriptor.split(b'\x1e')
+            keys = tuple(keys.decode('utf-8').split('\x1f')) if keys else ()
+            fmt = fmt.decode('ascii')
+            # One value per key: repeat counts other than string sizes are
+            # never produced by the encoder
+            codes = cls._record_field.findall(fmt, 1)
+            if (not fmt.startswith('>') or cls._record_format.fullmatch(fmt, 1) is None
+                    or len(codes) != len(keys)):
+                raise ValueError("Record layout does not match its keys")
+            layout = struct.Struct(fmt)
+            text_fields = tuple(i for i, code in enumerate(codes) if code[-1] == 's')
+            decoder = (keys, layout, text_fields)
+            if len(cls._record_decoders) < cls.MAX_CACHED_LAYOUTS:
+                cls._record_decoders[descriptor] = decoder
+
+        keys, layout, text_fields = decoder
+        body = start + size
+        # The layout size comes from the sender: check it against the frame
+        if body + layout.size > len(data):
+            raise ValueError("Record body is truncated")
+        values = layout.unpack_from(data, body)
+        if text_fields:
+            values = list(values)
+            for i in text_fields:
+                values[i] = values[i].decode('utf-8')
+        return dict(zip(keys, values)), body + layout.size
+
+    @classmethod
+    def decode(cls, data: bytes) -> Any:
+        """Payload value; any malformed input raises ValueError"""
+        try:
+            value, offset = cls._decode(memoryview(data), 0)
+        except (struct.error, IndexError, RecursionError) as e:
+            raise ValueError(f"Malformed payload: {e!r}") from None
+        if offset != len(data):
+            raise ValueError(f"Trailing data in payload ({len(data) - offset} bytes)")
+        return value
+
+    @classmethod
+    def _decode(cls, data: memoryview, offset: int):
+        tag = data[offset]
+        if tag == cls.FLOAT:
+            return cls._float.unpack_from(data, offset)[1], offset + 9
+        if tag == cls.RECORD:
+            return cls._decode_record(data, offset)
+        if tag == cls.STR:
+            size = cls._u32.unpack_from(data, offset + 1)[0]
+            start = offset + 5
+            return str(data[start:start + size], 'utf-8'), start + size
+        if tag == cls.INT8:
+            return cls._int8.unpack_from(data, offset)[1], offset + 2
+        if tag == cls.INT32:
+            return cls._int32.unpack_from(data, offset)[1], offset + 5
+        if tag == cls.INT64:
+            return cls._int64.unpack_from(data, offset)[1], offset + 9
+        if tag == cls.TRUE:
+            return True, offset + 1
+        if tag == cls.FALSE:
+            return False, offset + 1
+        if tag == cls.NONE:
+            return None, offset + 1
+        if tag == cls.DICT:
+            count = cls._u32.unpack_from(data, offset + 1)[0]
+            offset += 5
+            result = {}
+            for _ in range(count):
+                size = cls._u32.unpack_from(data, offset)[0]
+                offset += 4
+                key = str(data[offset:offset + size], 'utf-8')
+                result[key], offset = cls._decode(data, offset + size)
+            return result, offset
+        if tag == cls.LIST:
+            count = cls._u32.unpack_from(data, offset + 1)[0]
+            offset += 5
+            result = []
+            for _ in range(count):
+                item, offset = cls._decode(data, offset)
+                result.append(item)
+            return result, offset
+        if tag == cls.BYTES:
+            # Zero-copy: a read-only view into the received buffer
+            size = cls._u32.unpack_from(data, offset + 1)[0]
+            start = offset + 5
+            return data[start:start + size], start + size
+        raise ValueError(f"Unknown payload tag 0x{tag:02X} at offset {offset}")
+
+
+class BinaryCodec:
+    """Binary wire format for C20Message
+
+    Fixed 25-byte header followed by the payload:
+        magic (B)        0xC2
+        message_type (B) MessageType value
+        source (B)       DEVICE_CODES of source device
+        target (B)       DEVICE_CODES of target device, 0 = broadcast
+        flags (B)        bit 0: checksum present, bit 1: JSON payload
+        sequence_id (I)
+        timestamp (d)
+        checksum (I)     32-bit checksum (0 when absent)
+        payload_len (I)
+    """
+
+    MAGIC = 0xC2
+    FLAG_CHECKSUM = 0x01
+    FLAG_JSON_PAYLOAD = 0x02
+    HEADER = struct.Struct('>BBBBBIdII')
+    FLAGS_OFFSET = 4
+    CHECKSUM_OFFSET = 17
+    CHECKSUM_FIELD = struct.Struct('>I')
+
+    @classmethod
+    def canonical_bytes(cls, message: C20Message) -> bytes:
+        """Compact encoding with the checksum field and flag cleared
+
+        This is the input of the message checksum. A compact-encoded
+        message differs from it only in the flags byte and checksum field.
+        """
+        payload = CompactPayloadCodec.encode(message.payload)
+        header = cls.HEADER.pack(
+            cls.MAGIC,
+            message.message_type.value,
+            DEVICE_CODES[message.source_device],
+            DEVICE_CODES[message.target_device] if message.target_device else 0,
+            0,
+            message.sequence_id,
+            message.timestamp,
+            0,
+            len(payload)
+        )
+        return header + payload
+
+    @classmethod
+    def encode(cls, message: C20Message, payload_encoding: str = 'compact') -> bytes:
+        if payload_encoding == 'compact':
+            canonical = message._canonical or cls.canonical_bytes(message)
+            if message.checksum is None:
+                return canonical
+            data = bytearray(canonical)
+            data[cls.FLAGS_OFFSET] = cls.FLAG_CHECKSUM
+            cls.CHECKSUM_FIELD.pack_into(data, cls.CHECKSUM_OFFSET, int(message.checksum, 16))
+            return bytes(data)
+        elif payload_encoding == 'json':
+            payload = json.dumps(message.payload, separators=(',', ':')).encode('utf-8')
+            flags = cls.FLAG_JSON_PAYLOAD
+        else:
+            raise ValueError(f"Unknown payload encoding: {payload_encoding}")
+
+        checksum = 0
+        if message.checksum is not None:
+            flags |= cls.FLAG_CHECKSUM
+            checksum = int(message.checksum, 16)
+
+        header = cls.HEADER.pack(
+            cls.MAGIC,
+            message.message_type.value,
+            DEVICE_CODES[message.source_device],
+            DEVICE_CODES[message.target_device] if message.target_device else 0,
+            flags,
+            message.sequence_id,
+            message.timestamp,
+            checksum,
+            len(payload)
+        )
+        return header + payload
+
+    @classmethod
+    def decode(cls, data: bytes) -> C20Message:
+        """Message from one frame; any malformed input raises ValueError"""
+        if len(data) < cls.HEADER.size:
+            raise ValueError("Message shorter than header")
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        (magic, message_type, source, target, flags,
+         sequence_id, timestamp, checksum, payload_len) = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError(f"Bad magic byte 0x{magic:02X}")
+        end = cls.HEADER.size + payload_len
+        if len(data) != end:
+            raise ValueError(f"Payload length mismatch ({len(data) - cls.HEADER.size} != {payload_len})")
+
+        if flags & cls.FLAG_JSON_PAYLOAD:
+            payload = json.loads(data[cls.HEADER.size:end])
+        else:
+            payload = CompactPayloadCodec.decode(memoryview(data)[cls.HEADER.size:end])
+
+        try:
+            message_type = MESSAGE_TYPES_BY_CODE[message_type]
+            source = DEVICES_BY_CODE[source]
+            target = DEVICES_BY_CODE[target] if target else None
+        except KeyError as e:
+            raise ValueError(f"Unknown message type or device code {e}") from None
+
+        message = C20Message(
+            timestamp=timestamp,
+            message_type=message_type,
+            source_device=source,
+            target_device=target,
+            sequence_id=sequence_id,
+            payload=payload,
+            checksum=format(checksum, '08x') if flags & cls.FLAG_CHECKSUM else None
+        )
+
+        if not flags & cls.FLAG_JSON_PAYLOAD:
+            # Received bytes are the canonical encoding once the checksum is
+            # cleared, so verification needs no re-serialization
+            canonical = bytearray(data)
+            canonical[cls.FLAGS_OFFSET] = 0
+            cls.CHECKSUM_FIELD.pack_into(canonical, cls.CHECKSUM_OFFSET, 0)
+            message._canonical = bytes(canonical)
+        return message
+
+
+# Batched Sensor Data
+class SensorBatch:
+    """Columnar block of sensor readings carried by one SENSOR_BATCH message
+
+    Columns are typed buffers (timestamp: float64, i2c_address: uint8,
+    pressure/temperature/voltage: float32) in the sender's native byte
+    order. On the binary wire format each column is a single BYTES value,
+    and the decoded columns are memoryview casts of the received buffer
+    with no per-sample objects.
+    """
+
+    COLUMNS = (
+        ('timestamp', 'd'),
+        ('i2c_address', 'B'),
+        ('pressure_mbar', 'f'),
+        ('temperature_c', 'f'),
+        ('voltage_v', 'f')
+    )
+
+    def __init__(self, columns: Dict[str, Any], count: int):
+        self.columns = columns
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def to_payload(self, binary: bool = True) -> Dict[str, Any]:
+        """Payload dict; binary=False gives plain lists for the JSON wire format"""
+        payload = {'count': self.count, 'byteorder': sys.byteorder}
+        for name, _ in self.COLUMNS:
+            column = self.columns[name]
+            if binary:
+                payload[name] = column if isinstance(column, memoryview) else memoryview(column).cast('B')
+            else:
+                payload[name] = column.tolist()
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> 'SensorBatch':
+        count = payload['count']
+        swap = payload.get('byteorder', sys.byteorder) != sys.byteorder
+        columns = {}
+        for name, typecode in cls.COLUMNS:
+            raw = payload[name]
+            if isinstance(raw, list):
+                columns[name] = array(typecode, raw)
+            elif swap:
+                column = array(typecode, bytes(raw))
+                column.byteswap()
+                columns[name] = column
+            else:
+                columns[name] = memoryview(raw).cast(typecode)
+            if len(columns[name]) != count:
+                raise ValueError(f"Column {name} has {len(columns[name])} values, expected {count}")
+        return cls(columns, count)
+
+    @classmethod
+    def from_message(cls, message: C20Message) -> 'SensorBatch':
+        return cls.from_payload(message.payload)
+
+    def as_numpy(self) -> Dict[str, Any]:
+        """Columns as NumPy arrays sharing the message buffer (requires numpy)"""
+        import numpy as np
+        return {name: np.frombuffer(self.columns[name], dtype=typecode)
+                for name, typecode in self.COLUMNS}
+
+    def readings(self):
+        """Iterate rows as dicts (convenience for non-columnar consumers)"""
+        names = [name for name, _ in self.COLUMNS]
+        for row in zip(*(self.columns[name] for name in names)):
+            yield dict(zip(names, row))
+
+
+class SensorBatchSchema:
+    """SENSOR_BATCH payload schema (columns validated by SensorBatch.from_payload)"""
+
+    @staticmethod
+    def encode(batch: SensorBatch) -> Dict[str, Any]:
+        return batch.to_payload()
+
+    @staticmethod
+    def encode_into(batch: SensorBatch, target: Dict[str, Any]) -> Dict[str, Any]:
+        target.clear()
+        target.update(batch.to_payload())
+        return target
+
+    @staticmethod
+    def decode(payload: Any) -> SensorBatch:
+        if type(payload) is not dict:
+            raise PayloadError(f"SensorBatch: payload must be an object, got {type(payload).__name__}")
+        try:
+            return SensorBatch.from_payload(payload)
+        except (KeyError, TypeError, ValueError) as e:
+            raise PayloadError(f"SensorBatch: {e!r}") from None
+
+    @classmethod
+    def validate(cls, payload: Any):
+        cls.decode(payload)
+
+
+PAYLOAD_SCHEMAS[MessageType.SENSOR_BATCH] = SensorBatchSchema
+
+
+class SensorBatchBuilder:
+    """Accumulates readings and emits SENSOR_BATCH messages by size or age
+
+    add() returns a message when max_samples is reached; poll() returns one
+    when the oldest buffered reading is older than max_age_s.
+    """
+
+    def __init__(self, protocol: 'C20Protocol', max_samples: int = 256,
+                 max_age_s: float = 0.1, target_device: Optional[DeviceType] = None,
+                 binary: bool = True):
+        self.protocol = protocol
+        self.max_samples = max_samples
+        self.max_age_s = max_age_s
+        self.target_device = target_device
+        self.binary = binary
+        self._columns = {name: array(typecode) for name, typecode in SensorBatch.COLUMNS}
+        self._append = [self._columns[name].append for name, _ in SensorBatch.COLUMNS]
+        self._first_added: Optional[float] = None
+
+    def __len__(self):
+        return len(self._columns['timestamp'])
+
+    def add_reading(self, i2c_address: int, pressure_mbar: float, temperature_c: float,
+                    voltage_v: float, timestamp: Optional[float] = None) -> Optional[C20Message]:
+        now = time.time()
+        if self._first_added is None:
+            self._first_added = now
+        append_t, append_addr, append_p, append_temp, append_v = self._append
+        append_t(now if timestamp is None else timestamp)
+        append_addr(i2c_address)
+        append_p(pressure_mbar)
+        append_temp(temperature_c)
+        append_v(voltage_v)
+        if len(self._columns['timestamp']) >= self.max_samples:
+            return self.flush()
+        return None
+
+    def add(self, sensor_data: SensorData, timestamp: Optional[float] = None) -> Optional[C20Message]:
+        return self.add_reading(sensor_data.i2c_address, sensor_data.pressure_mbar,
+                                sensor_data.temperature_c, sensor_data.voltage_v, timestamp)
+
+    def poll(self, now: Optional[float] = None) -> Optional[C20Message]:
+        """Flush if the oldest buffered reading exceeded max_age_s"""
+        if self._first_added is None:
+            return None
+        if (now if now is not None else time.time()) - self._first_added >= self.max_age_s:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[C20Message]:
+        count = len(self)
+        if not count:
+            return None
+        batch = SensorBatch(self._columns, count)
+        message = self.protocol.create_sensor_batch_message(batch, self.target_device, self.binary)
+        # Fresh buffers: the message payload keeps views of the old ones
+        self._columns = {name: array(typecode) for name, typecode in SensorBatch.COLUMNS}
+        self._append = [self._columns[name].append for name, _ in SensorBatch.COLUMNS]
+        self._first_added = None
+        return message
+
+
+def encode_message(message: C20Message, wire_format: str = 'binary') -> Union[bytes, str]:
+    """Encode message for the wire ('binary', 'binary-json' or 'json')"""
+    if wire_format == 'binary':
+        return BinaryCodec.encode(message, 'compact')
+    if wire_format == 'binary-json':
+        return BinaryCodec.encode(message, 'json')
+    if wire_format == 'json':
+        return message.to_json()
+    raise ValueError(f"Unknown wire format: {wire_format}")
+
+
+def decode_message(data: Union[bytes, bytearray, str]) -> C20Message:
+    """Decode message in any supported wire format (detected from the first byte)"""
+    if isinstance(data, str):
+        return C20Message.from_json(data)
+    if data[:1] == b'{':
+        return C20Message.from_json(data.decode('utf-8'))
+    return BinaryCodec.decode(data)
+
+
+def decode_messages(data: Union[bytes, bytearray, str]) -> List[C20Message]:
+    """Decode a batch: concatenated binary frames or newline-delimited JSON"""
+    if isinstance(data, str):
+        return [C20Message.from_json(line) for line in data.splitlines() if line]
+    if data[:1] == b'{':
+        return [C20Message.from_json(line) for line in data.decode('utf-8').splitlines() if line]
+    messages = []
+    offset = 0
+    header_size = BinaryCodec.HEADER.size
+    length_field = struct.Struct('>I')
+    while offset < len(data):
+        if len(data) - offset < header_size:
+            raise ValueError("Truncated frame header")
+        end = offset + header_size + length_field.unpack_from(data, offset + header_size - 4)[0]
+        messages.append(BinaryCodec.decode(data[offset:end]))
+        offset = end
+    return messages
+
+
 # Protocol Constants
 class ProtocolConstants:
     """C20 Protocol Constants"""
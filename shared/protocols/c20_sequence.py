@@ -0,0 +1,282 @@
+"""
+C20 Sequence Tracking
+Per-stream receive windows (duplicates, reordering, gaps) and selective
+retransmission, so high-rate data can go over unacknowledged transports
+(MQTT QoS 0) and still recover losses
+"""
+
+import time
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from c20_protocol import (
+    C20Message, C20Protocol, DeviceType, MessageType, PAYLOAD_SCHEMAS, RetransmitRequest
+)
+
+# Sequence ids are counted per (source, target) stream, see C20Protocol.next_sequence
+stream_key = attrgetter('source_device', 'target_device')
+
+
+class SequenceStatus(Enum):
+    """Classification of a received sequence id"""
+    NEW = "new"  # next expected id
+    GAP = "gap"  # new, but ids were skipped
+    LATE = "late"  # fills an earlier gap (reordered or retransmitted)
+    DUPLICATE = "duplicate"
+    RESTART = "restart"  # far behind the window, near the start: sender restarted its counter
+    STALE = "stale"  # far behind the window otherwise: too old to classify, dropped
+
+
+_DROPPED = (SequenceStatus.DUPLICATE, SequenceStatus.STALE)
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count('1')
+
+
+class ReceiveWindow:
+    """Sliding bitmap over the last `size` sequence ids of one stream
+
+    Bit k of the bitmap is set when id (highest - k) has been received.
+    Each receive() is a shift and a mask on one integer, independent of
+    how many ids are outstanding.
+
+    Counters start at 1 (C20Protocol.next_sequence), so an id that is
+    behind the window and at most `restart_below` (default: size) means
+    the sender restarted; any other id behind the window is STALE.
+    """
+
+    def __init__(self, size: int = 1024, restart_below: Optional[int] = None):
+        if size < 2:
+            raise ValueError("Window size must be at least 2")
+        self.size = size
+        self.restart_below = size if restart_below is None else restart_below
+        self._mask = (1 << size) - 1
+        self.highest: Optional[int] = None
+        self.bits = 0
+        self.received = 0
+        self.duplicates = 0
+        self.late = 0
+        self.lost = 0  # gaps that left the window unfilled
+        self.restarts = 0
+        self.stale = 0
+
+    def receive(self, seq: int) -> SequenceStatus:
+        if self.highest is None:
+            return self._reset(seq, SequenceStatus.NEW)
+
+        ahead = seq - self.highest
+        if ahead > 0:
+            self.received += 1
+            if ahead >= self.size:
+                self.lost += self.size - _popcount(self.bits) + ahead - self.size
+                self.bits = 1
+            else:
+                leaving = self.bits >> (self.size - ahead)
+                self.lost += ahead - _popcount(leaving)
+                self.bits = ((self.bits << ahead) | 1) & self._mask
+            self.highest = seq
+            return SequenceStatus.NEW if ahead == 1 else SequenceStatus.GAP
+
+        behind = -ahead
+        if behind >= self.size:
+            if seq > self.restart_below:
+                self.stale += 1
+                return SequenceStatus.STALE
+            self.restarts += 1
+            return self._reset(seq, SequenceStatus.RESTART)
+        bit = 1 << behind
+        if self.bits & bit:
+            self.duplicates += 1
+            return SequenceStatus.DUPLICATE
+        self.bits |= bit
+        self.received += 1
+        self.late += 1
+        return SequenceStatus.LATE
+
+    def _reset(self, seq: int, status: SequenceStatus) -> SequenceStatus:
+        # Ids before the first one seen are not reported as missing
+        self.highest = seq
+        self.bits = self._mask
+        self.received += 1
+        return status
+
+    def missing(self) -> List[int]:
+        """Ids inside the window that have not been received, oldest first"""
+        if self.highest is None:
+            return []
+        holes = ~self.bits & self._mask
+        ids = []
+        while holes:
+            low = holes & -holes
+            ids.append(self.highest - (low.bit_length() - 1))
+            holes ^= low
+        return ids[::-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'highest': self.highest,
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'late': self.late,
+            'lost': self.lost,
+            'restarts': self.restarts,
+            'stale': self.stale,
+            'missing': len(self.missing()),
+        }
+
+
+class SequenceTracker:
+    """Receive windows per (source, target) stream
+
+    accept(message) returns False for duplicates and stale ids, which
+    callers drop before dispatching. With a protocol attached, poll() turns missing ids
+    into RETRANSMIT_REQUEST messages to the stream's source, repeating each
+    id at most max_attempts times, retry_interval_s apart.
+
+    `sender` (the publisher's instance id from MQTTTransport) keeps the
+    streams of several devices of the same type in separate windows.
+    """
+
+    def __init__(self, window_size: int = 1024,
+                 key: Callable[[C20Message], Hashable] = stream_key,
+                 protocol: Optional[C20Protocol] = None,
+                 retry_interval_s: float = 0.05, max_attempts: int = 3,
+                 max_ids_per_request: int = 256):
+        self.window_size = window_size
+        self.key = key
+        self.protocol = protocol
+        self.retry_interval_s = retry_interval_s
+        self.max_attempts = max_attempts
+        self.max_ids_per_request = max_ids_per_request
+        self.windows: Dict[Hashable, ReceiveWindow] = {}
+        self._requested: Dict[Hashable, Dict[int, List[float]]] = {}  # id -> [last request, attempts]
+        self._streams: Dict[Hashable, Tuple[DeviceType, Optional[DeviceType]]] = {}
+        self._labels: Dict[Hashable, str] = {}
+
+    def observe(self, message: C20Message, sender: Optional[Hashable] = None) -> SequenceStatus:
+        stream = self.key(message)
+        key = stream if sender is None else (sender, stream)
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = ReceiveWindow(self.window_size)
+            self._streams[key] = (message.source_device, message.target_device)
+            label = self._label(stream)
+            self._labels[key] = label if sender is None else f"{sender}:{label}"
+        status = window.receive(message.sequence_id)
+        if status is SequenceStatus.LATE:
+            self._requested.get(key, {}).pop(message.sequence_id, None)
+        elif status is SequenceStatus.RESTART:
+            self._requested.pop(key, None)
+        return status
+
+    def accept(self, message: C20Message, sender: Optional[Hashable] = None) -> bool:
+        return self.observe(message, sender) not in _DROPPED
+
+    def missing(self) -> Dict[Hashable, List[int]]:
+        report = {}
+        for key, window in self.windows.items():
+            ids = window.missing()
+            if ids:
+                report[key] = ids
+        return report
+
+    def poll(self, now: Optional[float] = None) -> List[C20Message]:
+        """RETRANSMIT_REQUEST messages for ids that are due for (re)request"""
+        if self.protocol is None:
+            raise RuntimeError("SequenceTracker needs a protocol to create retransmit requests")
+        now = time.monotonic() if now is None else now
+        encode = PAYLOAD_SCHEMAS[MessageType.RETRANSMIT_REQUEST].encode
+        requests = []
+        for key, window in self.windows.items():
+            missing = window.missing()
+            pending = self._requested.setdefault(key, {})
+            # Forget ids that were filled or have left the window
+            outstanding = set(missing)
+            for seq in [seq for seq in pending if seq not in outstanding]:
+                del pending[seq]
+            due = []
+            for seq in missing:
+                state = pending.get(seq)
+                if state is None:
+                    # First request one interval after the gap was seen, so
+                    # plain reordering does not trigger retransmissions
+                    pending[seq] = [now, 0]
+                    continue
+                if state[1] < self.max_attempts and now - state[0] >= self.retry_interval_s:
+                    state[0] = now
+                    state[1] += 1
+                    due.append(seq)
+            source, target = self._streams[key]
+            for start in range(0, len(due), self.max_ids_per_request):
+                requests.append(self.protocol.create_message(
+                    MessageType.RETRANSMIT_REQUEST,
+                    encode(RetransmitRequest(due[start:start + self.max_ids_per_request],
+                                             broadcast=target is None)),
+                    source
+                ))
+        return requests
+
+    @staticmethod
+    def _label(key: Hashable) -> str:
+        parts = key if type(key) is tuple else (key,)
+        return '->'.join('all' if part is None else str(getattr(part, 'value', part)) for part in parts)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Window counters per stream, e.g. 'sensor->rpi', 'valve-3f9a1c2e:valve->all'"""
+        return {self._labels[key]: window.to_dict() for key, window in self.windows.items()}
+
+
+class ReplayBuffer:
+    """Rings of recently sent messages, one per target stream
+
+    attach() makes the protocol store every message it creates and
+    answers RETRANSMIT_REQUEST messages by passing the stored originals
+    (same sequence id and checksum) to `send`. For pooled messages from
+    create_pooled_message, which are recycled, a copy is stored.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._rings: Dict[Optional[DeviceType], List[Optional[C20Message]]] = {}
+        self.replayed = 0
+        self.unavailable = 0
+
+    def store(self, message: C20Message):
+        ring = self._rings.get(message.target_device)
+        if ring is None:
+            ring = self._rings[message.target_device] = [None] * self.capacity
+        ring[message.sequence_id % self.capacity] = message
+
+    def get(self, seq: int, target_device: Optional[DeviceType] = None) -> Optional[C20Message]:
+        ring = self._rings.get(target_device)
+        message = ring[seq % self.capacity] if ring is not None else None
+        if message is not None and message.sequence_id == seq:
+            return message
+        return None
+
+    def replay(self, sequence_ids: List[int],
+               target_device: Optional[DeviceType] = None) -> List[C20Message]:
+        found = []
+        for seq in sequence_ids:
+            message = self.get(seq, target_device)
+            if message is None:
+                self.unavailable += 1
+            else:
+                found.append(message)
+        self.replayed += len(found)
+        return found
+
+    def attach(self, protocol: C20Protocol, send: Callable[[C20Message], Any]):
+        protocol.replay_buffer = self
+
+        def handle_retransmit_request(message: C20Message) -> None:
+            request = protocol.decode_payload(message)
+            stream = None if request.broadcast else message.source_device
+            for original in self.replay(request.sequence_ids, stream):
+                send(original)
+            return None
+
+        protocol.message_handlers[MessageType.RETRANSMIT_REQUEST] = handle_retransmit_request
+        return self
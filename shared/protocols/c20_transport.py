@@ -0,0 +1,226 @@
+"""
+C20 MQTT Transport
+Shared MQTT path for C20Protocol: topic mapping, batched publishing,
+decoding with the shared codec and delivery to a MessageDispatcher
+
+Topics: <prefix>/<target device|all>/<message type>/<source device>[/<instance>]
+    e.g. c20/rpi/sensor_data/sensor/sensor-3f9a1c2e, c20/all/alarm/valve
+"""
+
+import asyncio
+import inspect
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from c20_protocol import (
+    C20Message, C20Protocol, DeviceType, MessageType,
+    decode_messages, encode_message
+)
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # paho is only needed when no client is passed in
+    mqtt = None
+
+BROADCAST = 'all'
+
+# Bulk data is sent unacknowledged; losses are recovered through
+# c20_sequence retransmit requests where needed
+DEFAULT_QOS = {
+    MessageType.ALARM: 1,
+    MessageType.VALVE_CONTROL: 1,
+    MessageType.STATE_DELTA: 1,
+    MessageType.TEST_PROCEDURE: 1,
+    MessageType.CONFIG_UPDATE: 1,
+    MessageType.RETRANSMIT_REQUEST: 1,
+}
+
+# Published without waiting for the batching window
+IMMEDIATE_TYPES = (MessageType.ALARM, MessageType.HEARTBEAT, MessageType.RETRANSMIT_REQUEST)
+
+
+def message_topic(message: C20Message, prefix: str = 'c20', instance: Optional[str] = None) -> str:
+    target = message.target_device.value if message.target_device else BROADCAST
+    topic = f"{prefix}/{target}/{message.message_type.name.lower()}/{message.source_device.value}"
+    return f"{topic}/{instance}" if instance else topic
+
+
+def subscription_topics(device_type: DeviceType, prefix: str = 'c20') -> List[str]:
+    """Topics a device listens on: addressed to it and broadcasts"""
+    return [f"{prefix}/{device_type.value}/#", f"{prefix}/{BROADCAST}/#"]
+
+
+class MQTTTransport:
+    """Carries C20 messages of one protocol instance over MQTT
+
+    send() queues a message under its topic; messages for the same topic
+    within batch_window_s are concatenated into a single MQTT publish
+    (binary frames are self-delimiting, JSON is newline-delimited).
+    Types in IMMEDIATE_TYPES flush their topic at once.
+
+    Each transport has an instance_id (unique by default, also used for
+    the MQTT client id) that ends the topics it publishes to. Publishes
+    carrying its own id are broker echoes and are skipped before decoding;
+    other devices of the same type are delivered as usual.
+
+    Incoming publishes are split with decode_messages(), duplicates are
+    dropped by the optional SequenceTracker, and messages go to the
+    dispatcher (MessageDispatcher.submit_nowait) or, without one, straight
+    to protocol.process_message. Responses are sent back through send();
+    responses of coroutine handlers once they complete.
+
+    paho callbacks run in the paho network thread and only decode; all
+    batching, handler calls and sends happen on the asyncio loop passed
+    to start().
+    """
+
+    def __init__(self, protocol: C20Protocol, client: Any = None,
+                 host: str = 'c20-mqtt', port: int = 1883,
+                 dispatcher: Any = None, sequence_tracker: Any = None,
+                 wire_format: str = 'binary', batch_window_s: float = 0.005,
+                 max_batch_bytes: int = 65536, topic_prefix: str = 'c20',
+                 qos: Optional[Dict[MessageType, int]] = None,
+                 instance_id: Optional[str] = None):
+        if instance_id is None:
+            instance_id = f"{protocol.device_type.value}-{uuid.uuid4().hex[:8]}"
+        if client is None:
+            if mqtt is None:
+                raise ImportError("paho-mqtt is required when no MQTT client is given")
+            client = mqtt.Client(client_id=f"c20-{instance_id}")
+        self.protocol = protocol
+        self.instance_id = instance_id
+        self._echo_suffix = f"/{instance_id}"
+        # Topic levels without the instance: prefix, target, type, source
+        self._topic_levels = topic_prefix.count('/') + 4
+        self.client = client
+        self.host = host
+        self.port = port
+        self.dispatcher = dispatcher
+        self.sequence_tracker = sequence_tracker
+        self.wire_format = wire_format
+        self.batch_window_s = batch_window_s
+        self.max_batch_bytes = max_batch_bytes
+        self.topic_prefix = topic_prefix
+        self.qos = {**DEFAULT_QOS, **(qos or {})}
+        self._separator = b'' if wire_format.startswith('binary') else b'\n'
+        self._pending: Dict[str, List[bytes]] = {}
+        self._pending_bytes: Dict[str, int] = {}
+        self._pending_qos: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._retransmit_task: Optional[asyncio.Task] = None
+        self.stats = {'sent': 0, 'publishes': 0, 'received': 0, 'duplicates': 0, 'decode_errors': 0}
+
+        if dispatcher is not None and dispatcher.on_response is None:
+            dispatcher.on_response = self.send
+
+    async def start(self, connect: bool = True):
+        """Bind to the running loop, subscribe and start the network loop"""
+        self._loop = asyncio.get_running_loop()
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        if connect:
+            self.client.connect(self.host, self.port, 60)
+            self.client.loop_start()
+        if self.dispatcher is not None:
+            self.dispatcher.start()
+        if self.sequence_tracker is not None and self.sequence_tracker.protocol is not None:
+            self._retransmit_task = asyncio.ensure_future(self._request_retransmits())
+
+    async def stop(self):
+        if self._retransmit_task:
+            self._retransmit_task.cancel()
+        for topic in list(self._pending):
+            self._flush(topic)
+        if self.dispatcher is not None:
+            await self.dispatcher.stop()
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        for topic in subscription_topics(self.protocol.device_type, self.topic_prefix):
+            client.subscribe(topic, qos=max(self.qos.values(), default=0))
+
+    # Outgoing
+    def send(self, message: C20Message):
+        """Queue message for publishing (call from the event loop thread)"""
+        topic = message_topic(message, self.topic_prefix, self.instance_id)
+        data = encode_message(message, self.wire_format)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        pending = self._pending.get(topic)
+        if pending is None:
+            pending = self._pending[topic] = []
+            self._pending_bytes[topic] = 0
+            self._pending_qos[topic] = 0
+            if self.batch_window_s > 0 and message.message_type not in IMMEDIATE_TYPES:
+                self._loop.call_later(self.batch_window_s, self._flush, topic)
+        pending.append(data)
+        self._pending_bytes[topic] += len(data)
+        self._pending_qos[topic] = max(self._pending_qos[topic], self.qos.get(message.message_type, 0))
+        self.stats['sent'] += 1
+        if (message.message_type in IMMEDIATE_TYPES or self.batch_window_s <= 0
+                or self._pending_bytes[topic] >= self.max_batch_bytes):
+            self._flush(topic)
+
+    def send_threadsafe(self, message: C20Message):
+        self._loop.call_soon_threadsafe(self.send, message)
+
+    def _flush(self, topic: str):
+        pending = self._pending.pop(topic, None)
+        if not pending:
+            return
+        del self._pending_bytes[topic]
+        qos = self._pending_qos.pop(topic)
+        self.client.publish(topic, self._separator.join(pending), qos=qos)
+        self.stats['publishes'] += 1
+
+    # Incoming
+    def _on_message(self, client, userdata, msg):
+        if msg.topic.endswith(self._echo_suffix):
+            return  # own publish echoed by the broker
+        try:
+            messages = decode_messages(msg.payload)
+        except ValueError as e:  # the codecs report any malformed input as ValueError
+            self.stats['decode_errors'] += 1
+            print(f"Undecodable publish on {msg.topic}: {e}")
+            return
+        levels = msg.topic.split('/')
+        sender = levels[-1] if len(levels) > self._topic_levels else None
+        self._loop.call_soon_threadsafe(self._deliver, messages, sender)
+
+    def _deliver(self, messages: List[C20Message], sender: Optional[str] = None):
+        for message in messages:
+            self.stats['received'] += 1
+            if (self.sequence_tracker is not None
+                    and not self.sequence_tracker.accept(message, sender)):
+                self.stats['duplicates'] += 1
+                continue
+            if self.dispatcher is not None:
+                self.dispatcher.submit_nowait(message)
+                continue
+            try:
+                response = self.protocol.process_message(message)
+            except Exception as e:
+                print(f"Handler error for {message.message_type.name}: {e}")
+                continue
+            if inspect.isawaitable(response):
+                asyncio.ensure_future(self._send_when_done(message, response))
+            elif response is not None:
+                self.send(response)
+
+    async def _send_when_done(self, message: C20Message, pending: Any):
+        try:
+            response = await pending
+        except Exception as e:
+            print(f"Handler error for {message.message_type.name}: {e}")
+            return
+        if response is not None:
+            self.send(response)
+
+    async def _request_retransmits(self):
+        interval = self.sequence_tracker.retry_interval_s
+        while True:
+            await asyncio.sleep(interval)
+            for request in self.sequence_tracker.poll(time.monotonic()):
+                self.send(request)
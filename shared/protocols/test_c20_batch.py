@@ -0,0 +1,97 @@
+"""
+Tests for columnar SENSOR_BATCH messages and SensorBatchBuilder flushing
+Run: python -m pytest shared/protocols
+"""
+
+import sys
+import time
+from array import array
+
+import pytest
+
+from c20_protocol import (
+    C20Protocol, DeviceType, MessageType, PayloadError, SensorBatch, SensorBatchBuilder,
+    decode_message, encode_message
+)
+
+
+@pytest.fixture
+def protocol():
+    return C20Protocol(DeviceType.PRESSURE_SENSOR)
+
+
+def add(builder, count, start=0):
+    messages = [builder.add_reading(0x48 + i % 3, 10.0 + i, 25.0, 3.3, timestamp=100.0 + i)
+                for i in range(start, start + count)]
+    return [message for message in messages if message is not None]
+
+
+def test_flushes_by_size(protocol):
+    builder = SensorBatchBuilder(protocol, max_samples=4, max_age_s=float('inf'))
+    messages = add(builder, 10)
+    assert len(messages) == 2 and len(builder) == 2
+    first = protocol.decode_payload(messages[0])
+    assert first.count == 4
+    assert list(first.columns['timestamp']) == [100.0, 101.0, 102.0, 103.0]
+    assert list(first.columns['i2c_address']) == [0x48, 0x49, 0x4A, 0x48]
+    assert messages[0].message_type == MessageType.SENSOR_BATCH
+    assert [row['pressure_mbar'] for row in protocol.decode_payload(messages[1]).readings()] == [
+        14.0, 15.0, 16.0, 17.0]
+
+
+def test_flushes_by_age_of_oldest_reading(protocol):
+    builder = SensorBatchBuilder(protocol, max_samples=100, max_age_s=0.5)
+    assert builder.poll() is None  # nothing buffered
+    before = time.time()
+    add(builder, 1)
+    add(builder, 1, start=1)
+    assert builder.poll(before) is None
+    # Age counts from the first buffered reading, not the latest one
+    message = builder.poll(time.time() + 0.5)
+    assert message is not None and len(builder) == 0
+    assert protocol.decode_payload(message).count == 2
+    assert builder.poll(time.time() + 10.0) is None
+    assert builder.flush() is None
+
+
+def test_flushed_message_keeps_its_columns(protocol):
+    builder = SensorBatchBuilder(protocol, max_samples=2, max_age_s=float('inf'))
+    message, = add(builder, 2)
+    add(builder, 3, start=2)
+    assert list(protocol.decode_payload(message).columns['pressure_mbar']) == [10.0, 11.0]
+
+
+# BYTES columns travel only on the binary format; the JSON formats take plain lists
+@pytest.mark.parametrize('binary, wire_format', [
+    (True, 'binary'), (False, 'binary'), (False, 'binary-json'), (False, 'json')])
+def test_batch_round_trip(protocol, binary, wire_format):
+    builder = SensorBatchBuilder(protocol, max_samples=3, max_age_s=float('inf'),
+                                 target_device=DeviceType.VALVE_CONTROLLER, binary=binary)
+    message, = add(builder, 3)
+    decoded = decode_message(encode_message(message, wire_format))
+    assert decoded.target_device == DeviceType.VALVE_CONTROLLER
+    batch = protocol.decode_payload(decoded)
+    assert list(batch.columns['timestamp']) == [100.0, 101.0, 102.0]
+    assert list(batch.columns['voltage_v']) == pytest.approx([3.3] * 3)
+
+
+def test_foreign_byte_order_is_swapped():
+    columns = {name: array(typecode, [1, 2]) for name, typecode in SensorBatch.COLUMNS}
+    payload = SensorBatch(columns, 2).to_payload()
+    for name, _ in SensorBatch.COLUMNS:
+        swapped = array(columns[name].typecode, columns[name])
+        swapped.byteswap()
+        payload[name] = bytes(swapped)
+    payload['byteorder'] = 'big' if sys.byteorder == 'little' else 'little'
+    batch = SensorBatch.from_payload(payload)
+    assert list(batch.columns['timestamp']) == [1.0, 2.0]
+    assert list(batch.columns['pressure_mbar']) == [1.0, 2.0]
+
+
+def test_column_length_mismatch_is_a_payload_error(protocol):
+    builder = SensorBatchBuilder(protocol, max_samples=2, max_age_s=float('inf'))
+    message, = add(builder, 2)
+    message.payload['count'] = 3
+    message._decoded = None
+    with pytest.raises(PayloadError):
+        protocol.decode_payload(message)
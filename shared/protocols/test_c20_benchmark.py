@@ -0,0 +1,62 @@
+"""
+Smoke tests for the C20 benchmark suites (tiny measurement times)
+Run: python -m pytest shared/protocols
+"""
+
+import json
+import sys
+
+import pytest
+
+import c20_benchmark
+from c20_benchmark import SUITES, allocations, measure
+
+
+def test_measure_and_allocations():
+    calls = []
+    rate = measure(lambda: calls.append(None), min_time=0.001)
+    assert rate > 0 and len(calls) >= 101  # warm-up + at least one batch
+    kept = allocations(lambda: [0.5] * 100, count=100)
+    assert kept['blocks_per_call'] >= 1 and kept['peak_bytes_per_call'] > 800
+
+
+@pytest.fixture(scope='module')
+def report():
+    return {suite: run(min_time=0.001) for suite, (run, _) in SUITES.items()}
+
+
+@pytest.mark.parametrize('suite', list(SUITES))
+def test_suite_rows_print(report, suite, capsys):
+    assert report[suite]
+    SUITES[suite][1](report[suite])
+    assert len(capsys.readouterr().out.splitlines()) >= len(report[suite])
+
+
+def test_operations_cover_every_message_helper(report):
+    rows = {row['operation']: row for row in report['ops']}
+    helpers = [name for name in dir(c20_benchmark.C20Protocol)
+               if name.startswith('create_') and name.endswith('_message')
+               and name not in ('create_message', 'create_pooled_message')]
+    assert set(helpers) <= set(rows)
+    assert rows['create_sensor_batch_message']['bytes_json'] is None
+    assert rows['create_sensor_data_message']['bytes_binary'] < rows['create_sensor_data_message']['bytes_json']
+
+
+def test_relative_results(report):
+    codecs = {(row['message'], row['codec']): row for row in report['codecs']}
+    assert codecs[('sensor_data', 'binary')]['bytes'] < codecs[('sensor_data', 'json')]['bytes']
+    memory = {row['case']: row for row in report['memory']}
+    assert memory['CompactSensorData']['bytes_per_object'] < memory['SensorData']['bytes_per_object']
+    assert memory['producer_pooled']['peak_bytes'] < memory['producer_unpooled']['peak_bytes']
+    single, batch = report['batch']
+    assert batch['bytes_per_sample'] < single['bytes_per_sample'] / 4
+
+
+def test_main_writes_json(tmp_path, monkeypatch, capsys):
+    output = tmp_path / 'results.json'
+    monkeypatch.setattr(sys, 'argv', ['c20_benchmark.py', '--suite', 'batch', '--min-time', '0.001',
+                                      '--json', '--output', str(output)])
+    c20_benchmark.main()
+    printed = json.loads(capsys.readouterr().out)
+    assert printed == json.loads(output.read_text())
+    assert set(printed) == {'meta', 'batch'} and printed['meta']['min_time_s'] == 0.001
@@ -0,0 +1,172 @@
+"""
+Round-trip tests for the C20 wire formats (binary, binary-json, JSON)
+Run: python -m pytest shared/protocols
+"""
+
+import random
+import tracemalloc
+
+import pytest
+
+from c20_protocol import (
+    BinaryCodec, C20Protocol, CompactC20Message, CompactPayloadCodec, CompactSensorData,
+    DeviceType, MessagePool, MessageType, SensorBatchBuilder, SensorType,
+    create_test_sensor_data, create_test_valve_state,
+    decode_message, decode_messages, encode_message
+)
+from c20_sequence import ReplayBuffer
+
+WIRE_FORMATS = ('binary', 'binary-json', 'json')
+
+
+@pytest.fixture
+def protocol():
+    return C20Protocol(DeviceType.PRESSURE_SENSOR)
+
+
+@pytest.fixture
+def messages(protocol):
+    return [
+        protocol.create_sensor_data_message(create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)),
+        protocol.create_valve_control_message(
+            [create_test_valve_state(i, 0x21) for i in range(4)]),
+        protocol.create_message(MessageType.CONFIG_UPDATE, {
+            'name': 'zażółć', 'limits': [-1, 0, 2 ** 40, 1.5], 'nested': {'on': True, 'off': None},
+        }, DeviceType.RPI_CONTROLLER),
+    ]
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False, 0, -128, 127, 128, -2 ** 31, 2 ** 31, -2 ** 63, 1.25, -0.0, '', 'ąę',
+    [], [1, [2, [3]]], {}, {'a': 1, 'b': 'x', 'c': 2.5},  # flat dicts use the record layout
+    {'k': [{'x': 1.0, 'y': 'z'}, {'x': 2.0, 'y': 'w'}]},
+])
+def test_compact_payload_round_trip(value):
+    assert CompactPayloadCodec.decode(CompactPayloadCodec.encode(value)) == value
+
+
+@pytest.mark.parametrize('wire_format', WIRE_FORMATS)
+def test_message_round_trip(protocol, messages, wire_format):
+    for message in messages:
+        decoded = decode_message(encode_message(message, wire_format))
+        assert decoded == message
+        assert protocol.verify_checksum(decoded)
+
+
+def test_binary_bytes_are_stable(messages):
+    for message in messages:
+        data = message.to_bytes()
+        assert BinaryCodec.decode(data).to_bytes() == data
+
+
+@pytest.mark.parametrize('wire_format', WIRE_FORMATS)
+def test_decode_messages_splits_batches(messages, wire_format):
+    frames = [encode_message(message, wire_format) for message in messages]
+    joined = '\n'.join(frames) if wire_format == 'json' else b''.join(frames)
+    assert decode_messages(joined) == messages
+
+
+def test_corrupted_message_fails_checksum(protocol, messages):
+    data = bytearray(messages[0].to_bytes())
+    data[-1] ^= 0x01
+    assert not protocol.verify_checksum(BinaryCodec.decode(bytes(data)))
+
+
+def test_sensor_batch_round_trip(protocol):
+    builder = SensorBatchBuilder(protocol, max_samples=3, max_age_s=float('inf'))
+    readings = [create_test_sensor_data(SensorType.HIGH_PRESSURE, 0x49) for _ in range(3)]
+    message = None
+    for reading in readings:
+        message = builder.add(reading)
+    decoded = decode_message(encode_message(message))
+    rows = list(protocol.decode_payload(decoded).readings())
+    # Batch columns are float32
+    assert [row['pressure_mbar'] for row in rows] == pytest.approx(
+        [r.pressure_mbar for r in readings], rel=1e-6)
+    assert [row['i2c_address'] for row in rows] == [0x49] * 3
+
+
+def test_pooled_message_matches_regular_message(protocol):
+    reading = create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)
+    record = CompactSensorData.from_dataclass(reading)
+    pool = MessagePool(lambda: CompactC20Message(0.0, None, None, None, 0, None))
+    for pressure in (1.0, 2.0):
+        reading.pressure_mbar = record.pressure_mbar = pressure
+        pooled = protocol.create_pooled_message(pool, MessageType.SENSOR_DATA, record)
+        regular = protocol.create_sensor_data_message(reading)
+        assert pooled.payload == regular.payload
+        assert decode_message(pooled.to_bytes()).payload == regular.payload
+        pool.release(pooled)
+    assert (pool.created, pool.reused) == (1, 1)
+
+
+def test_pooled_messages_are_stored_for_replay(protocol):
+    replay = ReplayBuffer().attach(protocol, lambda message: None)
+    pool = MessagePool(lambda: CompactC20Message(0.0, None, None, None, 0, None))
+    record = CompactSensorData.from_dataclass(create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48))
+    wire = []
+    for pressure in (1.0, 2.0):
+        record.pressure_mbar = pressure
+        message = protocol.create_pooled_message(pool, MessageType.SENSOR_DATA, record)
+        wire.append(message.to_bytes())
+        pool.release(message)
+    # The stored copies keep their own payloads after the pooled instance is reused
+    assert [replay.get(seq).to_bytes() for seq in (1, 2)] == wire
+
+
+@pytest.mark.parametrize('wire_format', WIRE_FORMATS)
+def test_malformed_frames_raise_value_error(messages, wire_format):
+    rng = random.Random(20)
+    frame = encode_message(messages[0], wire_format)
+    frame = frame.encode('utf-8') if isinstance(frame, str) else frame
+    for _ in range(3000):
+        data = bytearray(frame)
+        for _ in range(rng.randint(1, 4)):
+            position = rng.randrange(len(data))
+            if rng.random() < 0.7:
+                data[position] = rng.randrange(256)
+            else:
+                del data[position:]
+                data += bytes(rng.randrange(256) for _ in range(rng.randint(0, 8)))
+        try:
+            decode_messages(bytes(data))
+        except ValueError:
+            pass
+
+
+def test_unknown_codes_raise_value_error(messages):
+    data = bytearray(messages[0].to_bytes())
+    data[1] = 0xEE  # message type
+    with pytest.raises(ValueError):
+        BinaryCodec.decode(bytes(data))
+    with pytest.raises(ValueError):
+        decode_message('[1, 2]')
+
+
+def test_numpy_scalars_encode_like_python_numbers(protocol):
+    np = pytest.importorskip('numpy')
+    plain = {'pressure': 1013.25, 'count': 7, 'limits': [1.5, 300], 'nested': {'gain': 0.5}}
+    numpy = {'pressure': np.float64(1013.25), 'count': np.int64(7),
+             'limits': [np.float32(1.5), np.int16(300)], 'nested': {'gain': np.float32(0.5)}}
+    assert CompactPayloadCodec.encode(numpy) == CompactPayloadCodec.encode(plain)
+    sensor = create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48)
+    sensor.pressure_mbar, sensor.i2c_address = np.float64(sensor.pressure_mbar), np.int64(0x48)
+    for message in (protocol.create_sensor_data_message(sensor),
+                    protocol.create_message(MessageType.CONFIG_UPDATE, numpy)):
+        decoded = decode_message(encode_message(message, 'binary'))
+        assert protocol.verify_checksum(decoded)
+        assert decoded.payload == message.payload
+
+
+@pytest.mark.parametrize('fmt', [b'>2000000000s', b'>1000000000d', b'>3q', b'q', b'>x', b'>d d'])
+def test_hostile_record_layouts_are_rejected_cheaply(fmt):
+    descriptor = b'a' + b'\x1e' + fmt
+    frame = bytes([CompactPayloadCodec.RECORD]) + len(descriptor).to_bytes(4, 'big') + descriptor + b'\0' * 8
+    tracemalloc.start()
+    try:
+        with pytest.raises(ValueError):
+            CompactPayloadCodec.decode(frame)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 1 << 20
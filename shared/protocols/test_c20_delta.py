@@ -0,0 +1,127 @@
+"""
+Tests for delta-encoded SYSTEM_STATUS / VALVE_CONTROL states
+Run: python -m pytest shared/protocols
+"""
+
+import pytest
+
+from c20_delta import DeltaDecoder, DeltaEncoder, apply_delta, diff_state
+from c20_protocol import (
+    C20Protocol, DeviceType, MessageType, PAYLOAD_SCHEMAS, SystemStatus, ValveControl, ValveState
+)
+
+VALVE, RPI, LCD = DeviceType.VALVE_CONTROLLER, DeviceType.RPI_CONTROLLER, DeviceType.LCD_DISPLAY
+encode_valves = PAYLOAD_SCHEMAS[MessageType.VALVE_CONTROL].encode
+
+
+@pytest.mark.parametrize('old, new', [
+    ({'a': 1, 'b': [1, 2]}, {'a': 1, 'b': [1, 3]}),
+    ({'a': 1, 'b': {'c': 2}}, {'b': {'c': 2, 'd': None}}),
+    ({'a': [1, 2]}, {'a': [1, 2, 3]}),
+    ([1, {'x': 1}], [1, {'x': 2}]),
+    (1, 'x'),
+])
+def test_apply_delta_inverts_diff_state(old, new):
+    changes, removed = diff_state(old, new)
+    assert apply_delta(old, changes, removed) == new
+
+
+def test_apply_delta_does_not_modify_base():
+    base = {'a': {'b': [1, 2]}}
+    apply_delta(base, [[['a', 'b', 0], 5]], [])
+    assert base == {'a': {'b': [1, 2]}}
+
+
+def valve_states(open_count: int):
+    return encode_valves(ValveControl([
+        ValveState(i, 0x21, i < open_count, 0.0, 0.0, 'OK') for i in range(8)]))
+
+
+def make_link(ack_interval=None, keyframe_interval=1000):
+    valve, rpi = C20Protocol(VALVE), C20Protocol(RPI)
+    encoder = DeltaEncoder(valve, keyframe_interval=keyframe_interval,
+                           keyframe_period_s=float('inf')).attach()
+    states = []
+    rpi.message_handlers[MessageType.VALVE_CONTROL] = lambda message: states.append(message.payload)
+    acks = []
+    DeltaDecoder().attach(rpi, send=acks.append if ack_interval else None,
+                          ack_interval=ack_interval or 1)
+    return valve, rpi, encoder, states, acks
+
+
+def test_receiver_rebuilds_every_state():
+    valve, rpi, encoder, states, _ = make_link(keyframe_interval=3)
+    sent = [valve_states(i) for i in range(8)]
+    types = []
+    for state in sent:
+        message = encoder.encode(MessageType.VALVE_CONTROL, state, target_device=RPI)
+        types.append(message.message_type)
+        assert rpi.process_message(message) is None
+    assert states == sent
+    assert types.count(MessageType.VALVE_CONTROL) == 2  # first and after 3 deltas
+
+
+def test_lost_delta_does_not_break_the_next_one():
+    valve, rpi, encoder, states, _ = make_link()
+    for open_count in range(4):
+        message = encoder.encode(MessageType.VALVE_CONTROL, valve_states(open_count), target_device=RPI)
+        if open_count != 2:
+            rpi.process_message(message)
+    assert states[-1] == valve_states(3)
+    assert encoder.encode(MessageType.VALVE_CONTROL, valve_states(3), target_device=RPI) is None
+
+
+def test_acks_move_the_base_forward():
+    valve, rpi, encoder, states, acks = make_link(ack_interval=2)
+    sizes = []
+    for open_count in range(8):
+        message = encoder.encode(MessageType.VALVE_CONTROL, valve_states(open_count), target_device=RPI)
+        sizes.append(len(message.to_bytes()))
+        rpi.process_message(message)
+        for ack in acks:
+            assert ack.target_device is VALVE
+            assert valve.process_message(ack) is None
+        acks.clear()
+    assert states[-1] == valve_states(7)
+    assert encoder.stats['rebased'] == 3
+    # Deltas against an acknowledged base stay small
+    assert max(sizes[1:]) < sizes[1] * 2
+
+
+def test_broadcast_base_needs_every_listed_receiver():
+    valve = C20Protocol(VALVE)
+    encoder = DeltaEncoder(valve, keyframe_period_s=float('inf')).attach(broadcast_receivers=(RPI, LCD))
+    encoder.encode(MessageType.VALVE_CONTROL, valve_states(0))
+    delta = encoder.encode(MessageType.VALVE_CONTROL, valve_states(1))
+    ack = PAYLOAD_SCHEMAS[MessageType.STATE_ACK].decode(
+        {'state_type': MessageType.VALVE_CONTROL.value, 'sequence_id': delta.sequence_id, 'broadcast': True})
+    encoder.receive_ack(RPI, ack)
+    assert encoder.stats['rebased'] == 0
+    encoder.receive_ack(LCD, ack)
+    assert encoder.stats['rebased'] == 1
+
+
+def test_new_target_starts_with_a_keyframe():
+    valve = C20Protocol(VALVE)
+    encoder = DeltaEncoder(valve, keyframe_period_s=float('inf'))
+    encoder.encode(MessageType.VALVE_CONTROL, valve_states(0), target_device=RPI)
+    message = encoder.encode(MessageType.VALVE_CONTROL, valve_states(1), target_device=LCD)
+    assert message.message_type is MessageType.VALVE_CONTROL
+
+
+def test_state_mutated_in_place_is_still_sent():
+    valve, rpi = C20Protocol(VALVE), C20Protocol(RPI)
+    encoder = DeltaEncoder(valve, keyframe_period_s=float('inf'))
+    states = []
+    rpi.message_handlers[MessageType.SYSTEM_STATUS] = lambda message: states.append(message.payload)
+    DeltaDecoder().attach(rpi)
+    status = SystemStatus('TESTING', 10.0, 20.0, 40.0, 5, [], [RPI])
+    keyframe = encoder.encode(MessageType.SYSTEM_STATUS, status, target_device=RPI)
+    checksum = valve.calculate_checksum(keyframe)
+    rpi.process_message(keyframe)
+    status.active_alarms.append('OVERPRESSURE')
+    assert valve.calculate_checksum(keyframe) == checksum
+    delta = encoder.encode(MessageType.SYSTEM_STATUS, status, target_device=RPI)
+    assert delta is not None and delta.message_type is MessageType.STATE_DELTA
+    rpi.process_message(delta)
+    assert states[-1]['active_alarms'] == ['OVERPRESSURE']
@@ -0,0 +1,161 @@
+"""
+MessageDispatcher tests: strict priorities, bounded queues, concurrency
+limits and coroutine handlers
+Run: python -m pytest shared/protocols
+"""
+
+import asyncio
+
+import pytest
+
+from c20_dispatcher import MessageDispatcher
+from c20_protocol import C20Protocol, DeviceType, MessageType, SensorType, create_test_sensor_data
+
+HEARTBEAT = {'status': 'OK', 'device_type': 'test', 'timestamp': 0.0}
+
+
+@pytest.fixture
+def sender():
+    return C20Protocol(DeviceType.PRESSURE_SENSOR)
+
+
+def sensor_message(sender):
+    return sender.create_sensor_data_message(create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48))
+
+
+def recording_receiver(handled):
+    receiver = C20Protocol(DeviceType.RPI_CONTROLLER)
+    for message_type in (MessageType.ALARM, MessageType.HEARTBEAT, MessageType.SENSOR_DATA,
+                         MessageType.LCD_DISPLAY):
+        receiver.message_handlers[message_type] = (
+            lambda message: handled.append(message.message_type))
+    return receiver
+
+
+def test_queued_messages_are_handled_by_priority(sender):
+    handled = []
+
+    async def run():
+        dispatcher = MessageDispatcher(recording_receiver(handled))
+        for _ in range(3):
+            dispatcher.submit_nowait(sensor_message(sender))
+            dispatcher.submit_nowait(sender.create_message(MessageType.LCD_DISPLAY, {'line': 'x'}))
+            dispatcher.submit_nowait(sender.create_message(MessageType.HEARTBEAT, HEARTBEAT))
+            dispatcher.submit_nowait(sender.create_message(MessageType.ALARM, {'error_code': 'E'}))
+        dispatcher.start()
+        await dispatcher.stop()
+        return dispatcher.metrics()
+
+    metrics = asyncio.run(run())
+    assert handled == ([MessageType.ALARM] * 3 + [MessageType.HEARTBEAT] * 3 +
+                       [MessageType.LCD_DISPLAY] * 3 + [MessageType.SENSOR_DATA] * 3)
+    assert metrics['ALARM']['handled'] == 3 and metrics['ALARM']['max_depth'] == 3
+
+
+def test_alarm_overtakes_queued_bulk_data(sender):
+    handled = []
+    receiver = recording_receiver(handled)
+
+    async def slow_sensor(message):
+        handled.append(message.message_type)
+        await asyncio.sleep(0.001)
+
+    receiver.message_handlers[MessageType.SENSOR_DATA] = slow_sensor
+
+    async def run():
+        dispatcher = MessageDispatcher(receiver)
+        dispatcher.start()
+        for _ in range(20):
+            await dispatcher.submit(sensor_message(sender))
+        while not handled:
+            await asyncio.sleep(0)
+        dispatcher.submit_nowait(sender.create_message(MessageType.ALARM, {'error_code': 'E'}))
+        await dispatcher.stop()
+
+    asyncio.run(run())
+    # Only the SENSOR_DATA handler already running finishes before the alarm
+    assert handled.index(MessageType.ALARM) == 1
+    assert handled.count(MessageType.SENSOR_DATA) == 20
+
+
+def test_full_queue_drops_or_blocks(sender):
+    async def run():
+        dispatcher = MessageDispatcher(recording_receiver([]), queue_sizes={MessageType.SENSOR_DATA: 2})
+        results = [dispatcher.submit_nowait(sensor_message(sender)) for _ in range(3)]
+        blocked = asyncio.ensure_future(dispatcher.submit(sensor_message(sender)))
+        await asyncio.sleep(0.01)
+        waiting = not blocked.done()
+        dispatcher.start()
+        await blocked
+        await dispatcher.stop()
+        return results, waiting, dispatcher.metrics()['SENSOR_DATA']
+
+    results, waiting, metrics = asyncio.run(run())
+    assert results == [True, True, False] and waiting
+    assert (metrics['submitted'], metrics['dropped'], metrics['handled']) == (3, 1, 3)
+    assert metrics['max_depth'] == 2
+
+
+def test_concurrency_limit_per_type(sender):
+    running = []
+    peak = []
+    receiver = C20Protocol(DeviceType.RPI_CONTROLLER)
+
+    async def handler(message):
+        running.append(message)
+        peak.append(len(running))
+        await asyncio.sleep(0.005)
+        running.remove(message)
+
+    receiver.message_handlers[MessageType.SENSOR_DATA] = handler
+
+    async def run(limit):
+        dispatcher = MessageDispatcher(receiver)
+        if limit:
+            dispatcher.set_concurrency(MessageType.SENSOR_DATA, limit)
+        for _ in range(10):
+            dispatcher.submit_nowait(sensor_message(sender))
+        dispatcher.start()
+        await dispatcher.stop()
+        with pytest.raises(ValueError):
+            dispatcher.set_concurrency(MessageType.SENSOR_DATA, 0)
+
+    asyncio.run(run(None))
+    assert max(peak) == 1
+    peak.clear()
+    asyncio.run(run(3))
+    assert max(peak) == 3
+
+
+def test_coroutine_handlers_and_responses(sender, capsys):
+    responses = []
+    receiver = C20Protocol(DeviceType.RPI_CONTROLLER)
+
+    async def echo(message):
+        await asyncio.sleep(0)
+        return receiver.create_message(MessageType.LCD_DISPLAY, {'echo': message.sequence_id})
+
+    def broken(message):
+        raise RuntimeError('handler bug')
+
+    async def on_response(message):
+        await asyncio.sleep(0)
+        responses.append(message.payload['echo'])
+
+    receiver.message_handlers[MessageType.SENSOR_DATA] = echo
+    receiver.message_handlers[MessageType.LCD_DISPLAY] = broken
+
+    async def run():
+        dispatcher = MessageDispatcher(receiver, on_response=on_response)
+        dispatcher.start()
+        messages = [sensor_message(sender) for _ in range(3)]
+        for message in messages:
+            await dispatcher.submit(message)
+        await dispatcher.submit(sender.create_message(MessageType.LCD_DISPLAY, {}))
+        await dispatcher.stop()
+        return [message.sequence_id for message in messages], dispatcher.metrics()
+
+    sequence_ids, metrics = asyncio.run(run())
+    assert responses == sequence_ids
+    assert metrics['LCD_DISPLAY']['errors'] == 1 and metrics['SENSOR_DATA']['errors'] == 0
+    assert 'handler bug' in capsys.readouterr().out
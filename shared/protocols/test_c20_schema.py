@@ -0,0 +1,130 @@
+"""
+RecordSchema tests: typed round trips and PayloadError on malformed payloads
+Run: python -m pytest shared/protocols
+"""
+
+import pytest
+
+from c20_protocol import (
+    PAYLOAD_SCHEMAS, Alarm, C20Protocol, DeviceType, Heartbeat, MessageType, PayloadError,
+    RecordSchema, SensorData, SensorType, SystemStatus, ValveControl,
+    create_test_sensor_data, create_test_valve_state
+)
+# Aliased so pytest does not try to collect them as test classes
+from c20_protocol import TestProcedure as Procedure, TestProcedureCommand as ProcedureCommand
+
+PROCEDURE = Procedure('BLS-5000', 'BLS', 'leak test', [{'step': 1}], 30,
+                      [DeviceType.VALVE_CONTROLLER], {'limit': 0.5})
+
+RECORDS = [
+    (MessageType.SENSOR_DATA, create_test_sensor_data(SensorType.MEDIUM_PRESSURE, 0x49)),
+    (MessageType.VALVE_CONTROL, ValveControl([create_test_valve_state(1, 0x20),
+                                              create_test_valve_state(2, 0x20)])),
+    (MessageType.SYSTEM_STATUS, SystemStatus('TESTING', 12.5, 40.0, 45.0, 3600, ['E1'],
+                                             [DeviceType.PRESSURE_SENSOR, DeviceType.LCD_DISPLAY])),
+    (MessageType.TEST_PROCEDURE, ProcedureCommand('START', PROCEDURE)),
+    (MessageType.HEARTBEAT, Heartbeat('alive', 'sensor', 1.5)),
+    (MessageType.ALARM, Alarm('OVERPRESSURE', 7, None)),
+]
+
+
+@pytest.mark.parametrize('message_type, record', RECORDS, ids=lambda value: getattr(value, 'name', ''))
+def test_round_trip(message_type, record):
+    schema = PAYLOAD_SCHEMAS[message_type]
+    payload = schema.encode(record)
+    assert schema.decode(payload) == record
+    assert schema.validate(payload) is None
+
+
+def test_wire_values_are_plain():
+    payload = PAYLOAD_SCHEMAS[MessageType.SYSTEM_STATUS].encode(RECORDS[2][1])
+    assert payload['connected_devices'] == ['sensor', 'lcd']
+    command = PAYLOAD_SCHEMAS[MessageType.TEST_PROCEDURE].encode(RECORDS[3][1])
+    # Inline fields are stored flat next to the action
+    assert command['action'] == 'START' and command['procedure_id'] == 'BLS-5000'
+    assert 'procedure' not in command and command['required_devices'] == ['valve']
+
+
+def test_encode_into_overwrites_in_place():
+    schema = RecordSchema.for_class(SensorData)
+    assert RecordSchema.for_class(SensorData) is schema
+    target = schema.encode(create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48))
+    reading = create_test_sensor_data(SensorType.HIGH_PRESSURE, 0x4A)
+    assert schema.encode_into(reading, target) is target
+    assert target == schema.encode(reading)
+
+
+def test_defaults_and_optional_fields():
+    schema = PAYLOAD_SCHEMAS[MessageType.ALARM]
+    assert schema.decode({'error_code': 'E'}) == Alarm('E')
+    assert schema.decode({'error_code': 'E', 'original_sequence': None}) == Alarm('E')
+    with pytest.raises(PayloadError):
+        schema.decode({'error_code': 'E', 'original_sequence': '7'})
+
+
+def sensor_payload(**changes):
+    payload = PAYLOAD_SCHEMAS[MessageType.SENSOR_DATA].encode(
+        create_test_sensor_data(SensorType.LOW_PRESSURE, 0x48))
+    payload.update(changes)
+    return payload
+
+
+def without(payload, key):
+    payload.pop(key)
+    return payload
+
+
+def valve_payload(**changes):
+    payload = PAYLOAD_SCHEMAS[MessageType.VALVE_CONTROL].encode(
+        ValveControl([create_test_valve_state(1, 0x20)]))
+    payload['valves'][0].update(changes)
+    return payload
+
+
+BAD_PAYLOADS = [
+    (MessageType.SENSOR_DATA, ['not', 'an', 'object']),
+    (MessageType.SENSOR_DATA, without(sensor_payload(), 'pressure_mbar')),
+    (MessageType.SENSOR_DATA, sensor_payload(pressure_mbar='12.5')),
+    (MessageType.SENSOR_DATA, sensor_payload(pressure_mbar=None)),
+    (MessageType.SENSOR_DATA, sensor_payload(i2c_address=72.0)),
+    (MessageType.SENSOR_DATA, sensor_payload(i2c_address=True)),
+    (MessageType.SENSOR_DATA, sensor_payload(sensor_type='XX')),
+    (MessageType.SENSOR_DATA, sensor_payload(sensor_type=['LP'])),
+    (MessageType.VALVE_CONTROL, {'valves': {}}),
+    (MessageType.VALVE_CONTROL, {'valves': [None]}),
+    (MessageType.VALVE_CONTROL, valve_payload(output_state=1)),
+    (MessageType.SYSTEM_STATUS, {**PAYLOAD_SCHEMAS[MessageType.SYSTEM_STATUS].encode(RECORDS[2][1]),
+                                 'connected_devices': ['sensor', 'toaster']}),
+    (MessageType.TEST_PROCEDURE, without(PAYLOAD_SCHEMAS[MessageType.TEST_PROCEDURE].encode(RECORDS[3][1]),
+                                         'procedure_id')),
+    (MessageType.TEST_PROCEDURE, {**PAYLOAD_SCHEMAS[MessageType.TEST_PROCEDURE].encode(RECORDS[3][1]),
+                                  'parameters': []}),
+]
+
+
+@pytest.mark.parametrize('message_type, payload', BAD_PAYLOADS)
+def test_malformed_payloads_raise_payload_error(message_type, payload):
+    schema = PAYLOAD_SCHEMAS[message_type]
+    with pytest.raises(PayloadError):
+        schema.decode(payload)
+    with pytest.raises(PayloadError):
+        schema.validate(payload)
+
+
+def test_int_is_accepted_for_float():
+    reading = PAYLOAD_SCHEMAS[MessageType.SENSOR_DATA].decode(sensor_payload(pressure_mbar=12))
+    assert reading.pressure_mbar == 12
+
+
+def test_invalid_payload_never_reaches_the_handler():
+    sender = C20Protocol(DeviceType.PRESSURE_SENSOR)
+    receiver = C20Protocol(DeviceType.RPI_CONTROLLER)
+    handled = []
+    receiver.message_handlers[MessageType.SENSOR_DATA] = handled.append
+    message = sender.create_message(MessageType.SENSOR_DATA, sensor_payload(voltage_v='3.3'),
+                                    DeviceType.RPI_CONTROLLER)
+    response = receiver.process_message(message)
+    assert not handled
+    assert response.message_type == MessageType.ALARM
+    alarm = receiver.decode_payload(response)
+    assert (alarm.error_code, alarm.original_sequence) == ('INVALID_PAYLOAD', message.sequence_id)
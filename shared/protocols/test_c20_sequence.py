@@ -0,0 +1,135 @@
+"""
+Tests for receive windows, gap tracking and selective retransmission
+Run: python -m pytest shared/protocols
+"""
+
+import pytest
+
+from c20_protocol import C20Protocol, DeviceType, MessageType
+from c20_sequence import ReceiveWindow, ReplayBuffer, SequenceStatus, SequenceTracker
+
+SENSOR, RPI, VALVE = DeviceType.PRESSURE_SENSOR, DeviceType.RPI_CONTROLLER, DeviceType.VALVE_CONTROLLER
+HEARTBEAT = {'status': 'OK', 'device_type': 'sensor', 'timestamp': 0.0}
+
+
+def test_window_statuses():
+    window = ReceiveWindow(8)
+    assert window.receive(10) is SequenceStatus.NEW
+    assert window.receive(11) is SequenceStatus.NEW
+    assert window.receive(14) is SequenceStatus.GAP
+    assert window.missing() == [12, 13]
+    assert window.receive(13) is SequenceStatus.LATE
+    assert window.receive(13) is SequenceStatus.DUPLICATE
+    assert window.missing() == [12]
+    assert window.receive(2) is SequenceStatus.RESTART
+    assert window.missing() == []
+    assert (window.late, window.duplicates, window.restarts) == (1, 1, 1)
+
+
+
+def test_stale_id_far_behind_does_not_reset_the_window():
+    window = ReceiveWindow(1024)
+    for seq in range(1, 3001):
+        window.receive(seq)
+    assert window.receive(1500) is SequenceStatus.STALE
+    assert window.receive(3001) is SequenceStatus.NEW
+    assert window.missing() == [] and window.lost == 0
+    assert (window.stale, window.restarts) == (1, 0)
+    # A restarted sender counts from 1 again
+    assert window.receive(1) is SequenceStatus.RESTART
+    assert window.receive(2) is SequenceStatus.NEW
+
+
+def test_tracker_drops_stale_messages():
+    sensor = C20Protocol(SENSOR)
+    tracker = SequenceTracker(window_size=16)
+    messages = heartbeats(sensor, (RPI,), 40)
+    for message in messages:
+        assert tracker.accept(message)
+    assert not tracker.accept(messages[20])
+    assert tracker.missing() == {}
+
+def test_window_counts_ids_that_leave_unfilled():
+    window = ReceiveWindow(4)
+    window.receive(1)
+    window.receive(3)  # 2 missing
+    window.receive(6)  # 2 leaves the window; 4 and 5 missing
+    assert window.lost == 1
+    assert window.missing() == [4, 5]
+    window.receive(20)  # 7..16 leave the window, 17..19 are still in it
+    assert window.lost == 1 + 2 + 10
+    assert window.missing() == [17, 18, 19]
+
+
+@pytest.mark.parametrize('size', [2, 64, 1024])
+def test_window_matches_set_model(size):
+    # Every 5th id is lost, the rest arrive in reversed chunks that stay
+    # inside the window, each followed by a duplicate
+    order = [1]
+    for start in range(2, 4 * size, size - 1):
+        chunk = [seq for seq in range(start, start + size - 1) if seq % 5]
+        order += chunk[::-1] + chunk[:1]
+    window = ReceiveWindow(size)
+    received = set()
+    for seq in order:
+        status = window.receive(seq)
+        assert (status is SequenceStatus.DUPLICATE) == (seq in received)
+        received.add(seq)
+        low = max(window.highest - size + 1, 1)
+        assert window.missing() == [s for s in range(low, window.highest) if s not in received]
+
+
+def heartbeats(sender: C20Protocol, targets, count: int):
+    return [sender.create_message(MessageType.HEARTBEAT, HEARTBEAT, target)
+            for _ in range(count) for target in targets]
+
+
+def test_streams_to_other_devices_are_not_gaps():
+    sensor = C20Protocol(SENSOR)
+    tracker = SequenceTracker()
+    for message in heartbeats(sensor, (RPI, VALVE, None), 5):
+        if message.target_device in (RPI, None):  # what RPI subscribes to
+            assert tracker.accept(message)
+    assert tracker.missing() == {}
+    assert sorted(tracker.stats()) == ['sensor->all', 'sensor->rpi']
+
+
+def test_retransmit_requests_recover_each_stream():
+    sensor, rpi = C20Protocol(SENSOR), C20Protocol(RPI)
+    replayed = []
+    ReplayBuffer().attach(sensor, replayed.append)
+    tracker = SequenceTracker(protocol=rpi, retry_interval_s=0.05, max_attempts=2)
+    lost = {(RPI, 2), (None, 3)}
+    for message in heartbeats(sensor, (RPI, VALVE, None), 4):
+        if message.target_device in (RPI, None) and (message.target_device, message.sequence_id) not in lost:
+            tracker.accept(message)
+    assert tracker.poll(now=0.0) == []  # reordering grace period
+    requests = tracker.poll(now=0.1)
+    assert {request.target_device for request in requests} == {SENSOR}
+    for request in requests:
+        sensor.process_message(request)
+    assert {(message.target_device, message.sequence_id) for message in replayed} == lost
+    for message in replayed:
+        assert tracker.observe(message) is SequenceStatus.LATE
+    assert tracker.missing() == {}
+    assert tracker.poll(now=0.2) == []
+
+
+def test_retransmit_attempts_are_limited():
+    sensor, rpi = C20Protocol(SENSOR), C20Protocol(RPI)
+    tracker = SequenceTracker(protocol=rpi, retry_interval_s=0.05, max_attempts=2)
+    first, _, third = heartbeats(sensor, (RPI,), 3)
+    tracker.accept(first)
+    tracker.accept(third)
+    sent = [len(tracker.poll(now=t)) for t in (0.0, 0.1, 0.12, 0.2, 0.3)]
+    assert sent == [0, 1, 0, 1, 0]
+
+
+def test_sender_instances_keep_separate_windows():
+    tracker = SequenceTracker()
+    first, second = C20Protocol(SENSOR), C20Protocol(SENSOR)
+    for message in heartbeats(first, (None,), 3):
+        assert tracker.accept(message, 'sensor-a')
+    for message in heartbeats(second, (None,), 3):
+        assert tracker.accept(message, 'sensor-b')
+    assert sorted(tracker.stats()) == ['sensor-a:sensor->all', 'sensor-b:sensor->all']
@@ -0,0 +1,122 @@
+"""
+MQTTTransport tests against an in-memory broker (no paho needed)
+Run: python -m pytest shared/protocols
+"""
+
+import asyncio
+import threading
+
+from c20_protocol import C20Protocol, DeviceType, MessageType
+from c20_sequence import SequenceTracker
+from c20_transport import MQTTTransport
+
+HEARTBEAT = {'status': 'OK', 'device_type': 'test', 'timestamp': 0.0}
+
+
+class Broker:
+    def __init__(self):
+        self.clients = []
+
+
+class Publish:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class FakeClient:
+    """Delivers publishes to every client subscribed to a matching '<prefix>/#' filter"""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.subscriptions = []
+        broker.clients.append(self)
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.append(topic)
+
+    def publish(self, topic, payload, qos=0):
+        for client in self.broker.clients:
+            if any(topic.startswith(pattern[:-1]) for pattern in client.subscriptions):
+                client.on_message(client, None, Publish(topic, payload))
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+async def start_transports(broker, device_types):
+    transports, received = [], {}
+    for device_type in device_types:
+        protocol = C20Protocol(device_type)
+        client = FakeClient(broker)
+        transport = MQTTTransport(protocol, client=client, batch_window_s=0,
+                                  sequence_tracker=SequenceTracker())
+        inbox = received[transport.instance_id] = []
+        protocol.message_handlers[MessageType.HEARTBEAT] = inbox.append
+        await transport.start(connect=False)
+        transport._on_connect(client, None, None, 0)
+        transports.append(transport)
+    return transports, received
+
+
+def test_same_type_devices_hear_each_other_but_not_themselves():
+    async def run():
+        broker = Broker()
+        sensors_and_rpi = (DeviceType.PRESSURE_SENSOR, DeviceType.PRESSURE_SENSOR,
+                           DeviceType.RPI_CONTROLLER)
+        (first, second, rpi), received = await start_transports(broker, sensors_and_rpi)
+        for sensor in (first, second):
+            sensor.send(sensor.protocol.create_message(MessageType.HEARTBEAT, HEARTBEAT))
+        await asyncio.sleep(0)
+        return first, second, rpi, received
+
+    first, second, rpi, received = asyncio.run(run())
+    assert first.instance_id != second.instance_id
+    assert len(received[first.instance_id]) == 1
+    assert len(received[second.instance_id]) == 1
+    assert len(received[rpi.instance_id]) == 2
+    # Both sensors count sequence ids from 1; each keeps its own window
+    assert sorted(rpi.sequence_tracker.stats()) == sorted(
+        f"{sensor.instance_id}:sensor->all" for sensor in (first, second))
+
+
+def test_undecodable_publish_is_counted():
+    async def run():
+        (rpi,), received = await start_transports(Broker(), (DeviceType.RPI_CONTROLLER,))
+        rpi._on_message(None, None, Publish('c20/all/heartbeat/sensor/x', b'\xc2garbage'))
+        await asyncio.sleep(0)
+        return rpi, received
+
+    rpi, received = asyncio.run(run())
+    assert rpi.stats['decode_errors'] == 1
+    assert received[rpi.instance_id] == []
+
+
+def test_coroutine_handlers_run_on_the_loop_and_their_responses_are_sent():
+    async def run():
+        (sensor, rpi), received = await start_transports(
+            Broker(), (DeviceType.PRESSURE_SENSOR, DeviceType.RPI_CONTROLLER))
+        handler_threads = []
+
+        async def answer_heartbeat(message):
+            handler_threads.append(threading.get_ident())
+            await asyncio.sleep(0)
+            return rpi.protocol.handle_heartbeat(message)
+
+        rpi.protocol.message_handlers[MessageType.HEARTBEAT] = answer_heartbeat
+        request = sensor.protocol.create_message(MessageType.HEARTBEAT, HEARTBEAT, DeviceType.RPI_CONTROLLER)
+        # Publish arrives in another thread, like paho's network loop
+        publisher = threading.Thread(target=sensor.client.publish,
+                                     args=('c20/rpi/heartbeat/sensor/other', request.to_bytes()))
+        publisher.start()
+        publisher.join()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        return handler_threads, received[sensor.instance_id]
+
+    handler_threads, replies = asyncio.run(run())
+    assert handler_threads == [threading.get_ident()]
+    assert [reply.payload['status'] for reply in replies] == ['alive']
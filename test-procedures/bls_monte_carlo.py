@@ -0,0 +1,176 @@
+"""
+Symulacja Monte Carlo procedury BLS 5000 dla tysięcy masek naraz
+Służy do oceny progów akceptacji (odsetek fałszywych zaliczeń i odrzuceń)
+"""
+
+import argparse
+import itertools
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from bls_tests import BLSTestProcedures, HardwareInterface
+from pneumatic_plant import DEFAULT_VALVES, PneumaticPlant
+from pressure_capture import fit_hold_window
+
+
+@dataclass
+class MaskPopulation:
+    """Rozkłady parametrów symulowanych masek i stanowiska"""
+    leak_coeff_median: float = 0.03  # L*mbar^0.5/s
+    leak_coeff_sigma: float = 0.8  # sigma rozkładu log-normalnego
+    sensor_noise_mbar: float = 0.3
+    outlet_conductance_sigma: float = 0.3  # rozrzut przewodności zaworu wydechowego
+    outlet_stuck_prob: float = 0.01  # zawór wydechowy nie otwiera się
+    vacuum_source_mean: float = -10.0
+    vacuum_source_std: float = 0.8
+
+
+def simulate_batch(n_masks: int, population: Optional[MaskPopulation] = None,
+                   rate_hz: float = 50.0, method: str = 'fit',
+                   seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Przeprowadza procedurę BLS 5000 na `n_masks` maskach jednocześnie
+
+    Kolejność i czasy faz odpowiadają BLSTestProcedures.test_bls_5000
+    z PlantHardwareInterface, łącznie z czasem przełączania zaworów
+    i stabilizacji regulatora (HardwareInterface.*_s) przed pomiarami.
+    Zwraca wyniki zmierzone (z szumem czujnika) oraz rzeczywiste
+    (bez szumu), liczone tą samą metodą.
+
+    method: 'fit' (dopasowanie prostej) lub 'two_point' (pierwsza/ostatnia próbka)
+    """
+    population = population or MaskPopulation()
+    rng = np.random.default_rng(seed)
+
+    plant = PneumaticPlant(n_rigs=n_masks, clock=lambda: 0.0)
+    plant.leak_coeff = population.leak_coeff_median * np.exp(
+        rng.normal(0.0, population.leak_coeff_sigma, n_masks))
+    outlet = plant.valve_index['outlet']
+    plant.conductance[:, outlet] = DEFAULT_VALVES['outlet'][1] * np.exp(
+        rng.normal(0.0, population.outlet_conductance_sigma, n_masks))
+    outlet_stuck = rng.random(n_masks) < population.outlet_stuck_prob
+    plant.conductance[outlet_stuck, outlet] = 0.0
+    plant.source[:, plant.valve_index['vacuum']] = rng.normal(
+        population.vacuum_source_mean, population.vacuum_source_std, n_masks)
+
+    period = 1.0 / rate_hz
+
+    def capture(duration_s: float) -> np.ndarray:
+        n = int(round(duration_s * rate_hz)) + 1
+        trace = np.empty((n_masks, n))
+        trace[:, 0] = plant.pressure
+        for i in range(1, n):
+            plant.advance(period)
+            trace[:, i] = plant.pressure
+        return trace
+
+    def metrics(t: np.ndarray, trace: np.ndarray, fit_tail: float) -> Dict[str, np.ndarray]:
+        if method == 'two_point':
+            return {'slope': (trace[:, -1] - trace[:, 0]) / (t[-1] - t[0]), 'end': trace[:, -1]}
+        first = min(int(len(t) * (1.0 - fit_tail)), len(t) - 2)
+        return fit_hold_window(t[first:], trace[:, first:])
+
+    valve_s = HardwareInterface.valve_time_s
+    settle_s = HardwareInterface.pressure_settle_s
+
+    # 1-2. Zamknięcie komory, napełnianie do 25 mbar i stabilizacja
+    plant.valve_open[:, plant.valve_index['door']] = False
+    plant.valve_open[:, plant.valve_index['inlet']] = True
+    plant.advance(valve_s + settle_s + 3.0)
+
+    # Pomiar wycieku (od zamknięcia zaworu wlotowego)
+    plant.valve_open[:, plant.valve_index['inlet']] = False
+    plant.advance(valve_s)
+    leak_true = capture(10)
+
+    # 3. Zawór wydechowy
+    plant.valve_open[:, outlet] = True
+    plant.advance(valve_s)
+    residual_true = capture(2)
+
+    # 4. Podciśnienie: zamknięcie wydechu, zawór próżni, stabilizacja regulatora
+    plant.valve_open[:, outlet] = False
+    plant.advance(valve_s)
+    plant.valve_open[:, plant.valve_index['vacuum']] = True
+    plant.advance(valve_s + settle_s)
+    hold_true = capture(3)
+
+    results = {}
+    for kind, noise in (('true', 0.0), ('measured', population.sensor_noise_mbar)):
+        traces = [trace + rng.normal(0.0, noise, trace.shape) if noise > 0 else trace
+                  for trace in (leak_true, residual_true, hold_true)]
+        times = [np.arange(trace.shape[1]) * period for trace in traces]
+        results[f'{kind}_leak_rate'] = -metrics(times[0], traces[0], 1.0)['slope']
+        results[f'{kind}_residual'] = metrics(times[1], traces[1], 0.5)['end']
+        results[f'{kind}_negative_hold'] = metrics(times[2], traces[2], 0.5)['end']
+    return results
+
+
+def threshold_sweep(results: Dict[str, np.ndarray],
+                    leak_rate_max: Sequence[float],
+                    residual_max: Sequence[float],
+                    negative_hold_max: Sequence[float]) -> List[Dict]:
+    """Odsetki fałszywych zaliczeń/odrzuceń dla każdej kombinacji progów
+
+    Maska jest rzeczywiście dobra, jeśli jej wyniki bez szumu spełniają
+    nominalne kryteria BLSTestProcedures.
+    """
+    good = BLSTestProcedures.evaluate_bls_5000(
+        results['true_leak_rate'], results['true_residual'], results['true_negative_hold'])
+    n_good = max(int(good.sum()), 1)
+    n_bad = max(int((~good).sum()), 1)
+
+    report = []
+    for leak_max, res_max, hold_max in itertools.product(leak_rate_max, residual_max, negative_hold_max):
+        passed = BLSTestProcedures.evaluate_bls_5000(
+            results['measured_leak_rate'], results['measured_residual'],
+            results['measured_negative_hold'],
+            leak_rate_max=leak_max, residual_max=res_max, negative_hold_max=hold_max)
+        report.append({
+            'leak_rate_max': leak_max,
+            'residual_max': res_max,
+            'negative_hold_max': hold_max,
+            'pass_rate': float(passed.mean()),
+            'false_pass_rate': float((passed & ~good).sum() / n_bad),
+            'false_fail_rate': float((~passed & good).sum() / n_good),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BLS 5000 Monte Carlo threshold evaluation')
+    parser.add_argument('--masks', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=50.0, help='capture rate [Hz]')
+    parser.add_argument('--method', choices=['fit', 'two_point'], default='fit')
+    parser.add_argument('--noise', type=float, default=MaskPopulation.sensor_noise_mbar)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print report as JSON')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = simulate_batch(args.masks, MaskPopulation(sensor_noise_mbar=args.noise),
+                             rate_hz=args.rate, method=args.method, seed=args.seed)
+    report = threshold_sweep(
+        results,
+        leak_rate_max=[0.3, 0.4, 0.5, 0.6],
+        residual_max=[1.0, 2.0, 3.0],
+        negative_hold_max=[-9.0, -8.0, -7.0],
+    )
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Simulated {args.masks} masks ({args.method}, {args.rate} Hz) in {elapsed:.2f} s")
+    print(f"{'leak<':>7} {'resid<':>7} {'hold<':>7} {'pass':>7} {'false+':>8} {'false-':>8}")
+    for row in report:
+        print(f"{row['leak_rate_max']:7.2f} {row['residual_max']:7.1f} {row['negative_hold_max']:7.1f} "
+              f"{row['pass_rate']:7.3f} {row['false_pass_rate']:8.4f} {row['false_fail_rate']:8.4f}")
+
+
+if __name__ == '__main__':
+    main()
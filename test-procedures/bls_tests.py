@@ -1,9 +1,13 @@
 import asyncio
 import json
-from dataclasses import dataclass
-from typing import Dict, List
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from pneumatic_plant import PneumaticPlant
+from pressure_capture import PressureCapture, PressureWaveform
+
 
 @dataclass
 class BLSTestResult:
@@ -12,14 +16,52 @@ class BLSTestResult:
     timestamp: datetime
     passed: bool
     measurements: Dict
+    waveforms: Dict[str, PressureWaveform] = field(default_factory=dict)
 
 
 class BLSTestProcedures:
     """Implementacja procedur testowych dla masek BLS"""
 
-    def __init__(self, hardware_interface):
+    # Kryteria akceptacji BLS 5000
+    LEAK_RATE_MAX = 0.5  # Max 0.5 mbar/s
+    RESIDUAL_MAX = 2.0  # Max 2 mbar
+    NEGATIVE_HOLD_MAX = -8.0  # Min -8 mbar
+
+    @classmethod
+    def evaluate_bls_5000(cls, leak_rate, residual_pressure, negative_pressure_hold,
+                          leak_rate_max=None, residual_max=None, negative_hold_max=None):
+        """Ocena wyników; działa dla skalarów i tablic NumPy (tryb wsadowy)"""
+        leak_rate_max = cls.LEAK_RATE_MAX if leak_rate_max is None else leak_rate_max
+        residual_max = cls.RESIDUAL_MAX if residual_max is None else residual_max
+        negative_hold_max = cls.NEGATIVE_HOLD_MAX if negative_hold_max is None else negative_hold_max
+        return (
+                (leak_rate < leak_rate_max) &
+                (residual_pressure < residual_max) &
+                (negative_pressure_hold < negative_hold_max)
+        )
+
+    def __init__(self, hardware_interface, capture_rate_hz: Optional[float] = None,
+                 profiler=None):
+        """
+        capture_rate_hz: częstotliwość próbkowania faz pomiarowych [Hz];
+        None = klasyczny pomiar dwupunktowy
+        profiler: opcjonalny StepProfiler (python-control/step_profiler.py)
+        """
         self.hw = hardware_interface
         self.current_test = None
+        self.profiler = profiler
+        self.capture = PressureCapture(hardware_interface, capture_rate_hz,
+                                       sleep=self._wait) if capture_rate_hz else None
+
+    def _step(self, name: str):
+        """Krok procedury mierzony przez profiler (jeśli podłączony)"""
+        return self.profiler.step(name) if self.profiler else nullcontext()
+
+    async def _wait(self, seconds: float):
+        if self.profiler:
+            await self.profiler.wait(seconds)
+        else:
+            await asyncio.sleep(seconds)
 
     async def test_bls_5000(self, serial_number: str) -> BLSTestResult:
         """Procedura testowa dla maski BLS 5000"""
@@ -27,60 +69,83 @@ class BLSTestProcedures:
         print(f"Starting test: {test_id}")
 
         measurements = {}
+        waveforms = {}
 
         try:
-            # 1. Zamknij komorę testową
-            await self.hw.control_motor('chamber_door', 'close')
-            await asyncio.sleep(2)
-
-            # 2. Test szczelności przy ciśnieniu dodatnim
-            print("Test 1: Positive pressure leak test")
-            await self.hw.set_valve('inlet', True)
-            await self.hw.set_pressure('low', 25.0)  # 25 mbar
-            await asyncio.sleep(3)  # Stabilizacja
-
-            # Pomiar wycieku
-            start_pressure = await self.hw.read_pressure('low')
-            await self.hw.set_valve('inlet', False)
-            await asyncio.sleep(10)  # 10 sekund testu
-            end_pressure = await self.hw.read_pressure('low')
-
-            leak_rate = (start_pressure - end_pressure) / 10
-            measurements['leak_rate_positive'] = leak_rate
-
-            # 3. Test zaworu wydechowego
-            print("Test 2: Exhalation valve test")
-            await self.hw.set_valve('outlet', True)
-            await asyncio.sleep(2)
-            residual_pressure = await self.hw.read_pressure('low')
-            measurements['exhalation_valve_residual'] = residual_pressure
-
-            # 4. Test przy ciśnieniu ujemnym
-            print("Test 3: Negative pressure test")
-            await self.hw.set_valve('outlet', False)
-            await self.hw.set_valve('vacuum', True)
-            await self.hw.set_pressure('low', -10.0)  # -10 mbar
-            await asyncio.sleep(3)
-
-            measurements['negative_pressure_hold'] = await self.hw.read_pressure('low')
-
-            # 5. Reset
-            await self.hw.set_all_valves(False)
-            await self.hw.control_motor('chamber_door', 'open')
+            with self._step('test_bls_5000'):
+                # 1. Zamknij komorę testową
+                with self._step('close_chamber'):
+                    await self.hw.control_motor('chamber_door', 'close')
+                    await self._wait(2)
+
+                # 2. Test szczelności przy ciśnieniu dodatnim
+                print("Test 1: Positive pressure leak test")
+                with self._step('positive_pressure_fill'):
+                    await self.hw.set_valve('inlet', True)
+                    await self.hw.set_pressure('low', 25.0)  # 25 mbar
+                    await self._wait(3)  # Stabilizacja
+
+                # Pomiar wycieku
+                with self._step('positive_pressure_leak'):
+                    if self.capture:
+                        self.capture.start_test()
+                        await self.hw.set_valve('inlet', False)
+                        waveforms['leak_positive'] = await self.capture.capture('low', 10)  # 10 sekund testu
+                        leak_rate = -waveforms['leak_positive'].fit['slope']
+                        measurements['leak_fit_rms'] = waveforms['leak_positive'].fit['rms']
+                    else:
+                        start_pressure = await self.hw.read_pressure('low')
+                        await self.hw.set_valve('inlet', False)
+                        await self._wait(10)  # 10 sekund testu
+                        end_pressure = await self.hw.read_pressure('low')
+                        leak_rate = (start_pressure - end_pressure) / 10
+
+                measurements['leak_rate_positive'] = leak_rate
+
+                # 3. Test zaworu wydechowego
+                print("Test 2: Exhalation valve test")
+                with self._step('exhalation_valve'):
+                    await self.hw.set_valve('outlet', True)
+                    if self.capture:
+                        waveforms['exhalation_valve'] = await self.capture.capture('low', 2, fit_tail=0.5)
+                        residual_pressure = waveforms['exhalation_valve'].fit['end']
+                    else:
+                        await self._wait(2)
+                        residual_pressure = await self.hw.read_pressure('low')
+                measurements['exhalation_valve_residual'] = residual_pressure
+
+                # 4. Test przy ciśnieniu ujemnym
+                print("Test 3: Negative pressure test")
+                with self._step('negative_pressure'):
+                    await self.hw.set_valve('outlet', False)
+                    await self.hw.set_valve('vacuum', True)
+                    await self.hw.set_pressure('low', -10.0)  # -10 mbar
+                    if self.capture:
+                        waveforms['negative_pressure'] = await self.capture.capture('low', 3, fit_tail=0.5)
+                        measurements['negative_pressure_hold'] = waveforms['negative_pressure'].fit['end']
+                    else:
+                        await self._wait(3)
+                        measurements['negative_pressure_hold'] = await self.hw.read_pressure('low')
+
+                # 5. Reset
+                with self._step('reset'):
+                    await self.hw.set_all_valves(False)
+                    await self.hw.control_motor('chamber_door', 'open')
 
             # Ocena wyników
-            passed = (
-                    leak_rate < 0.5 and  # Max 0.5 mbar/s
-                    residual_pressure < 2.0 and  # Max 2 mbar
-                    measurements['negative_pressure_hold'] < -8.0  # Min -8 mbar
-            )
+            passed = bool(self.evaluate_bls_5000(
+                leak_rate,
+                residual_pressure,
+                measurements['negative_pressure_hold']
+            ))
 
             return BLSTestResult(
                 test_id=test_id,
                 device_type='BLS_5000',
                 timestamp=datetime.now(),
                 passed=passed,
-                measurements=measurements
+                measurements=measurements,
+                waveforms=waveforms
             )
 
         except Exception as e:
@@ -97,12 +162,13 @@ class BLSTestProcedures:
         """Test oporu oddychania przy przepływie 95 L/min"""
         print(f"Testing breathing resistance at {flow_rate} L/min")
 
-        # Ustaw przepływ
-        await self.hw.set_flow_rate(flow_rate)
-        await asyncio.sleep(2)
+        with self._step('test_breathing_resistance'):
+            # Ustaw przepływ
+            await self.hw.set_flow_rate(flow_rate)
+            await self._wait(2)
 
-        # Zmierz różnicę ciśnień
-        pressure_drop = await self.hw.read_pressure('low')
+            # Zmierz różnicę ciśnień
+            pressure_drop = await self.hw.read_pressure('low')
 
         return {
             'flow_rate': flow_rate,
@@ -116,13 +182,19 @@ class BLSTestProcedures:
 class HardwareInterface:
     """Mock interface dla komunikacji ze sprzętem"""
 
+    # Czasy wykonania komend [s] (symulacja Monte Carlo odtwarza te same fazy)
+    motor_time_s = 0.5
+    valve_time_s = 0.1
+    pressure_settle_s = 1.0
+    flow_settle_s = 0.5
+
     async def control_motor(self, motor: str, action: str):
         print(f"Motor {motor}: {action}")
-        await asyncio.sleep(0.5)
+        await asyncio.sleep(self.motor_time_s)
 
     async def set_valve(self, valve: str, state: bool):
         print(f"Valve {valve}: {'OPEN' if state else 'CLOSED'}")
-        await asyncio.sleep(0.1)
+        await asyncio.sleep(self.valve_time_s)
 
     async def set_all_valves(self, state: bool):
         for valve in ['inlet', 'outlet', 'vacuum', 'purge']:
@@ -130,7 +202,7 @@ class HardwareInterface:
 
     async def set_pressure(self, system: str, target: float):
         print(f"Setting {system} pressure to {target}")
-        await asyncio.sleep(1)
+        await asyncio.sleep(self.pressure_settle_s)
 
     async def read_pressure(self, system: str) -> float:
         # Symulowane odczyty
@@ -144,7 +216,37 @@ class HardwareInterface:
 
     async def set_flow_rate(self, rate: float):
         print(f"Setting flow rate to {rate} L/min")
-        await asyncio.sleep(0.5)
+        await asyncio.sleep(self.flow_settle_s)
+
+
+class PlantHardwareInterface(HardwareInterface):
+    """Interfejs sprzętowy oparty o model pneumatyczny (PneumaticPlant)
+
+    Zawory i regulator sterują modelem, a odczyty ciśnienia pochodzą
+    z komory danego stanowiska, więc procedury działają w pętli zamkniętej.
+    """
+
+    def __init__(self, plant, rig: int = 0):
+        self.plant = plant
+        self.rig = rig
+
+    async def control_motor(self, motor: str, action: str):
+        await super().control_motor(motor, action)
+        if motor == 'chamber_door':
+            self.plant.set_valve(self.rig, 'door', action == 'open')
+
+    async def set_valve(self, valve: str, state: bool):
+        self.plant.set_valve(self.rig, valve, state)
+        await super().set_valve(valve, state)
+
+    async def set_pressure(self, system: str, target: float):
+        # Nadciśnienie z regulatora na zaworze wlotowym, podciśnienie z pompy
+        valve = 'inlet' if target >= 0 else 'vacuum'
+        self.plant.set_source_pressure(self.rig, valve, target)
+        await super().set_pressure(system, target)
+
+    async def read_pressure(self, system: str) -> float:
+        return self.plant.read_pressure(self.rig)
 
 
 # Przykład użycia
@@ -160,6 +262,21 @@ async def run_test_example():
     print(f"Passed: {'YES' if result.passed else 'NO'}")
     print(f"Measurements: {json.dumps(result.measurements, indent=2)}")
 
+    # Test z rejestracją przebiegów 50 Hz i dopasowaniem prostej
+    capture_tester = BLSTestProcedures(hw, capture_rate_hz=50.0)
+    result = await capture_tester.test_bls_5000("SN123456")
+    print(f"\nPassed (capture mode): {'YES' if result.passed else 'NO'}")
+    print(f"Measurements: {json.dumps(result.measurements, indent=2)}")
+    for name, waveform in result.waveforms.items():
+        print(f"  {name}: {len(waveform.p)} samples @ {waveform.rate_hz} Hz")
+
+    # Test w pętli zamkniętej z modelem pneumatycznym (maska z małą nieszczelnością)
+    plant = PneumaticPlant(n_rigs=1, leak_coeff=0.05, sensor_noise=0.05)
+    plant_tester = BLSTestProcedures(PlantHardwareInterface(plant), capture_rate_hz=50.0)
+    result = await plant_tester.test_bls_5000("SN123456")
+    print(f"\nPassed (plant model): {'YES' if result.passed else 'NO'}")
+    print(f"Measurements: {json.dumps(result.measurements, indent=2)}")
+
     # Test oporu oddychania
     breathing_result = await tester.test_breathing_resistance()
     print(f"\nBreathing resistance: {breathing_result}")
@@ -0,0 +1,148 @@
+"""
+Model pneumatyczny stanowisk testowych C20
+Komory, zawory i nieszczelności jako równania różniczkowe całkowane
+wektorowo (NumPy) dla wielu stanowisk jednocześnie
+"""
+
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+# Domyślny układ zaworów stanowiska BLS: nazwa -> (ciśnienie źródła [mbar], przewodność [L/s])
+DEFAULT_VALVES = {
+    'inlet': (25.0, 0.5),    # Zasilanie z regulatora ciśnienia
+    'outlet': (0.0, 0.8),    # Zawór wydechowy do atmosfery
+    'vacuum': (-10.0, 0.5),  # Pompa próżniowa
+    'purge': (0.0, 1.0),     # Odpowietrzanie
+    'door': (0.0, 5.0),      # Otwarte drzwi komory = komora połączona z atmosferą
+}
+
+
+class PneumaticPlant:
+    """Model ciśnienia w komorach wielu stanowisk testowych
+
+    Dla każdej komory (jedno stanowisko = jedna komora):
+        V * dp/dt = sum_k g_k * (p_k - p) + Q_leak
+    gdzie g_k to przewodność otwartego zaworu k, p_k ciśnienie jego źródła,
+    a Q_leak przepływ przez kryzę nieszczelności (prawo pierwiastkowe,
+    linearyzowane w każdym kroku). Ciśnienia są nadciśnieniami względem
+    atmosfery [mbar].
+
+    Krok całkowania jest dokładnym rozwiązaniem równania liniowego
+    (zanik wykładniczy do ciśnienia równowagi), więc model jest stabilny
+    także przy dużych przewodnościach zaworów.
+    """
+
+    def __init__(self, n_rigs: int = 1, valves: Optional[Dict[str, tuple]] = None,
+                 volume_l: float = 0.5, leak_coeff: float = 0.0,
+                 sensor_noise: float = 0.0, max_dt: float = 0.01,
+                 clock: Callable[[], float] = time.monotonic, seed: Optional[int] = None):
+        valves = valves or DEFAULT_VALVES
+        self.n_rigs = n_rigs
+        self.valve_names = list(valves)
+        self.valve_index = {name: i for i, name in enumerate(self.valve_names)}
+        n_valves = len(self.valve_names)
+
+        sources = np.array([v[0] for v in valves.values()], dtype=float)
+        conductances = np.array([v[1] for v in valves.values()], dtype=float)
+
+        self.pressure = np.zeros(n_rigs)
+        self.volume = np.full(n_rigs, float(volume_l))
+        self.leak_coeff = np.full(n_rigs, float(leak_coeff))  # L*mbar^0.5/s
+        self.sensor_noise = np.full(n_rigs, float(sensor_noise))
+        self.source = np.tile(sources, (n_rigs, 1))
+        self.conductance = np.tile(conductances, (n_rigs, 1))
+        self.valve_open = np.zeros((n_rigs, n_valves), dtype=bool)
+        if 'door' in self.valve_index:
+            self.valve_open[:, self.valve_index['door']] = True
+
+        # Poniżej tej różnicy ciśnień kryza zachowuje się liniowo
+        self.linear_band = 0.5
+        self.max_dt = max_dt
+        self.clock = clock
+        self.rng = np.random.default_rng(seed)
+        self.sim_time = 0.0
+        self._last_sync = clock()
+
+    def _valve(self, valve: str) -> int:
+        if valve not in self.valve_index:
+            raise KeyError(f"Unknown valve: {valve}")
+        return self.valve_index[valve]
+
+    def step(self, dt: float):
+        """Jeden krok całkowania dla wszystkich stanowisk naraz"""
+        g = np.where(self.valve_open, self.conductance, 0.0)
+        g_leak = self.leak_coeff / np.sqrt(np.maximum(np.abs(self.pressure), self.linear_band))
+        g_total = g.sum(axis=1) + g_leak
+
+        flow_to = (g * self.source).sum(axis=1)  # atmosfera dla nieszczelności = 0 mbar
+        p_eq = np.divide(flow_to, g_total, out=self.pressure.copy(), where=g_total > 0)
+        decay = np.exp(-g_total / self.volume * dt)
+        self.pressure = p_eq + (self.pressure - p_eq) * decay
+        self.sim_time += dt
+
+    def advance(self, duration: float, max_steps: int = 1000):
+        """Całkuje model przez `duration` sekund krokami nie większymi niż max_dt
+
+        Po długiej przerwie liczba kroków jest ograniczona do `max_steps`
+        (krok wykładniczy pozostaje stabilny, maleje tylko dokładność
+        linearyzacji nieszczelności).
+        """
+        if duration <= 0:
+            return
+        n_steps = min(int(np.ceil(duration / self.max_dt)), max_steps)
+        dt = duration / n_steps
+        for _ in range(n_steps):
+            self.step(dt)
+
+    def sync(self):
+        """Dogania model do bieżącego czasu zegara"""
+        now = self.clock()
+        self.advance(now - self._last_sync)
+        self._last_sync = now
+
+    def set_valve(self, rig: int, valve: str, state: bool):
+        self.sync()
+        self.valve_open[rig, self._valve(valve)] = state
+
+    def set_valves(self, rig: int, states: Dict[str, bool]):
+        self.sync()
+        for valve, state in states.items():
+            self.valve_open[rig, self._valve(valve)] = state
+
+    def set_source_pressure(self, rig: int, valve: str, pressure_mbar: float):
+        """Ustawia ciśnienie źródła zaworu (np. nastawa regulatora)"""
+        self.sync()
+        self.source[rig, self._valve(valve)] = pressure_mbar
+
+    def read_pressure(self, rig: int) -> float:
+        """Odczyt czujnika komory (z szumem pomiarowym)"""
+        self.sync()
+        value = self.pressure[rig]
+        if self.sensor_noise[rig] > 0:
+            value += self.rng.normal(0.0, self.sensor_noise[rig])
+        return float(value)
+
+    def read_all(self) -> np.ndarray:
+        """Odczyt wszystkich komór bez szumu"""
+        self.sync()
+        return self.pressure.copy()
+
+
+class ValveChannelLink:
+    """Mapowanie kanałów płytki wyjść (PCB OUT 12) na zawory stanowiska"""
+
+    def __init__(self, plant: PneumaticPlant, rig: int = 0,
+                 channel_map: Optional[Dict[int, str]] = None):
+        self.plant = plant
+        self.rig = rig
+        # Zgodnie z mapowaniem w python-control/test_procedures.py
+        self.channel_map = channel_map or {0: 'inlet', 1: 'outlet', 2: 'purge', 7: 'vacuum'}
+
+    def apply_outputs(self, outputs: Sequence[bool]):
+        self.plant.set_valves(self.rig, {
+            valve: bool(outputs[channel])
+            for channel, valve in self.channel_map.items()
+            if channel < len(outputs)
+        })
@@ -0,0 +1,127 @@
+"""
+Akwizycja przebiegów ciśnienia z wysoką częstotliwością próbkowania
+oraz wektorowe dopasowanie prostej metodą najmniejszych kwadratów
+"""
+
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def fit_hold_window(t: np.ndarray, p: np.ndarray) -> Dict[str, np.ndarray]:
+    """Dopasowuje prostą p = a + b*t wzdłuż ostatniej osi.
+
+    Działa dla pojedynczego okna (n,) jak i dla wielu okien naraz (..., n),
+    bez pętli w Pythonie. Zwraca nachylenie [mbar/s], wartości dopasowane
+    na początku i końcu okna oraz RMS reszt.
+    """
+    t = np.asarray(t, dtype=float)
+    p = np.asarray(p, dtype=float)
+
+    t_mean = t.mean(axis=-1, keepdims=True)
+    p_mean = p.mean(axis=-1, keepdims=True)
+    tc = t - t_mean
+    pc = p - p_mean
+
+    num = (tc * pc).sum(axis=-1)
+    denom = np.broadcast_to((tc * tc).sum(axis=-1), num.shape)
+    slope = np.divide(num, denom, out=np.zeros(num.shape), where=denom > 0)
+
+    t_mean = t_mean[..., 0]
+    p_mean = p_mean[..., 0]
+    start = p_mean + slope * (t[..., 0] - t_mean)
+    end = p_mean + slope * (t[..., -1] - t_mean)
+    residuals = pc - slope[..., None] * tc
+    rms = np.sqrt((residuals * residuals).mean(axis=-1))
+
+    return {
+        'slope': slope,
+        'start': start,
+        'end': end,
+        'mean': p_mean,
+        'rms': rms,
+    }
+
+
+@dataclass
+class PressureWaveform:
+    """Przebieg ciśnienia zarejestrowany w jednej fazie testu"""
+    system: str
+    rate_hz: float
+    t: np.ndarray  # czas od początku fazy [s]
+    p: np.ndarray  # ciśnienie [mbar]
+    fit: Dict[str, float]
+
+    def to_dict(self) -> Dict:
+        return {
+            'system': self.system,
+            'rate_hz': self.rate_hz,
+            't': self.t.tolist(),
+            'p': self.p.tolist(),
+            'fit': self.fit,
+        }
+
+
+class PressureCapture:
+    """Próbkowanie ciśnienia do prealokowanych buforów NumPy
+
+    Bufor na cały test alokowany jest raz w `start_test()`; kolejne fazy
+    (wyciek, zawór wydechowy, podciśnienie) zapisują do kolejnych jego
+    segmentów, więc pętla próbkowania nie alokuje pamięci, a przebiegi
+    dołączone do wyniku pozostają ważne po zakończeniu testu.
+    """
+
+    def __init__(self, hardware_interface, rate_hz: float = 100.0,
+                 max_test_duration_s: float = 20.0, sleep=asyncio.sleep):
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+        self.hw = hardware_interface
+        self.sleep = sleep
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.capacity = int(math.ceil(max_test_duration_s * rate_hz)) + 16
+        self._t: Optional[np.ndarray] = None
+        self._p: Optional[np.ndarray] = None
+        self._used = 0
+
+    def start_test(self):
+        """Alokuje bufor na wszystkie fazy jednego testu"""
+        self._t = np.empty(self.capacity)
+        self._p = np.empty(self.capacity)
+        self._used = 0
+
+    async def capture(self, system: str, duration_s: float,
+                      fit_tail: float = 1.0) -> PressureWaveform:
+        """Rejestruje ciśnienie przez `duration_s` sekund i dopasowuje prostą
+
+        fit_tail: część okna (od końca) użyta do dopasowania; dla faz ze
+        stanem przejściowym (np. otwarcie zaworu) pomija początek okna
+        """
+        if self._t is None:
+            self.start_test()
+
+        n = int(round(duration_s * self.rate_hz)) + 1
+        if self._used + n > self.capacity:
+            raise RuntimeError(
+                f"Capture buffer exhausted ({self._used + n} > {self.capacity} samples)")
+
+        t = self._t[self._used:self._used + n]
+        p = self._p[self._used:self._used + n]
+        self._used += n
+
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        for i in range(n):
+            # Harmonogram względem t0, żeby opóźnienia odczytu się nie kumulowały
+            delay = t0 + i * self.period - loop.time()
+            if delay > 0:
+                await self.sleep(delay)
+            p[i] = await self.hw.read_pressure(system)
+            t[i] = loop.time() - t0
+
+        first = min(int(n * (1.0 - fit_tail)), n - 2) if n > 2 else 0
+        fit = {key: float(value) for key, value in fit_hold_window(t[first:], p[first:]).items()}
+        return PressureWaveform(system=system, rate_hz=self.rate_hz, t=t, p=p, fit=fit)
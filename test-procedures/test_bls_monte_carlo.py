@@ -0,0 +1,77 @@
+"""
+Testy symulacji Monte Carlo BLS 5000 (simulate_batch, threshold_sweep)
+Uruchomienie: python -m pytest test-procedures
+"""
+
+import numpy as np
+import pytest
+
+from bls_monte_carlo import MaskPopulation, simulate_batch, threshold_sweep
+from bls_tests import BLSTestProcedures
+
+
+def test_seeded_batch_is_reproducible():
+    first = simulate_batch(50, seed=5)
+    second = simulate_batch(50, seed=5)
+    assert set(first) == {f'{kind}_{name}' for kind in ('true', 'measured')
+                          for name in ('leak_rate', 'residual', 'negative_hold')}
+    for key, values in first.items():
+        assert values.shape == (50,)
+        np.testing.assert_array_equal(values, second[key])
+
+
+def test_without_sensor_noise_measured_equals_true():
+    results = simulate_batch(20, MaskPopulation(sensor_noise_mbar=0.0), seed=1)
+    for name in ('leak_rate', 'residual', 'negative_hold'):
+        np.testing.assert_array_equal(results[f'measured_{name}'], results[f'true_{name}'])
+
+
+def test_stuck_outlet_and_large_leak_fail():
+    tight = dict(leak_coeff_median=0.001, leak_coeff_sigma=0.0, sensor_noise_mbar=0.0)
+    stuck = simulate_batch(4, MaskPopulation(outlet_stuck_prob=1.0, **tight), seed=1)
+    # Komora zostaje pod ciśnieniem napełniania, wyciek pomijalny
+    assert np.all(stuck['true_residual'] > 20.0)
+    assert np.all(stuck['true_leak_rate'] < 0.05)
+    leaky = simulate_batch(4, MaskPopulation(leak_coeff_median=0.5, leak_coeff_sigma=0.0,
+                                             outlet_stuck_prob=0.0, sensor_noise_mbar=0.0), seed=1)
+    assert np.all(leaky['true_leak_rate'] > BLSTestProcedures.LEAK_RATE_MAX)
+    for results in (stuck, leaky):
+        assert not BLSTestProcedures.evaluate_bls_5000(
+            results['true_leak_rate'], results['true_residual'], results['true_negative_hold']).any()
+
+
+def test_fit_is_less_noisy_than_two_point():
+    errors = {}
+    for method in ('fit', 'two_point'):
+        results = simulate_batch(500, seed=4, method=method)
+        errors[method] = {name: np.std(results[f'measured_{name}'] - results[f'true_{name}'])
+                          for name in ('leak_rate', 'negative_hold')}
+    for name in ('leak_rate', 'negative_hold'):
+        assert errors['fit'][name] < errors['two_point'][name] / 2
+
+
+def test_threshold_sweep_rates():
+    # Maski 0-1 dobre, 2-3 złe; maska 1 zawyżona szumem, maska 2 zaniżona
+    results = {
+        'true_leak_rate': np.array([0.1, 0.45, 0.55, 0.9]),
+        'measured_leak_rate': np.array([0.1, 0.52, 0.48, 0.9]),
+        'true_residual': np.zeros(4), 'measured_residual': np.zeros(4),
+        'true_negative_hold': np.full(4, -10.0), 'measured_negative_hold': np.full(4, -10.0),
+    }
+    report = threshold_sweep(results, leak_rate_max=[0.5, 0.6], residual_max=[1.0, 2.0],
+                             negative_hold_max=[-8.0])
+    assert len(report) == 4
+    nominal, loose = report[0], report[2]
+    assert (nominal['leak_rate_max'], nominal['residual_max']) == (0.5, 1.0)
+    assert nominal['pass_rate'] == 0.5
+    assert nominal['false_pass_rate'] == nominal['false_fail_rate'] == 0.5
+    assert loose['leak_rate_max'] == 0.6
+    assert (loose['pass_rate'], loose['false_pass_rate'], loose['false_fail_rate']) == (0.75, 0.5, 0.0)
+
+
+def test_threshold_sweep_without_bad_masks():
+    good = {f'{kind}_{name}': np.array(value) for kind in ('true', 'measured')
+            for name, value in (('leak_rate', [0.1]), ('residual', [0.0]), ('negative_hold', [-10.0]))}
+    row, = threshold_sweep(good, [0.5], [2.0], [-8.0])
+    assert row['false_pass_rate'] == 0.0 and row['false_fail_rate'] == 0.0
+    assert row['pass_rate'] == pytest.approx(1.0)
@@ -0,0 +1,94 @@
+"""
+Testy modelu pneumatycznego (PneumaticPlant): dokładny krok wykładniczy,
+stabilność, nieszczelność i niezależność stanowisk
+Uruchomienie: python -m pytest test-procedures
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from pneumatic_plant import PneumaticPlant, ValveChannelLink
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def closed_plant(**kwargs):
+    plant = PneumaticPlant(clock=FakeClock(), **kwargs)
+    plant.valve_open[:] = False  # bez otwartych drzwi komory
+    return plant
+
+
+@pytest.mark.parametrize('max_dt', [0.0001, 0.01, 0.5])
+def test_exact_step_does_not_depend_on_step_size(max_dt):
+    plant = closed_plant(volume_l=0.5, max_dt=max_dt)
+    plant.valve_open[0, plant.valve_index['inlet']] = True
+    plant.advance(0.7, max_steps=100000)
+    # V dp/dt = g (p_s - p): p = p_s (1 - exp(-g t / V))
+    expected = 25.0 * (1 - math.exp(-0.5 / 0.5 * 0.7))
+    assert plant.pressure[0] == pytest.approx(expected, rel=1e-12)
+    assert plant.sim_time == pytest.approx(0.7)
+
+
+def test_large_conductance_is_stable():
+    plant = closed_plant(valves={'inlet': (25.0, 1e6), 'outlet': (0.0, 1e6)}, max_dt=1.0)
+    plant.valve_open[0] = [True, True]
+    for _ in range(5):
+        plant.step(1.0)
+        assert plant.pressure[0] == pytest.approx(12.5)
+
+
+def test_leak_decays_towards_atmosphere():
+    plant = closed_plant(leak_coeff=0.05)
+    plant.pressure[:] = 20.0
+    previous = 20.0
+    for _ in range(20):
+        plant.advance(1.0)
+        assert 0.0 < plant.pressure[0] < previous
+        previous = plant.pressure[0]
+    # Przy małych różnicach kryza jest liniowa: zanik z g = k / sqrt(linear_band)
+    plant.pressure[:] = 0.2
+    plant.advance(1.0)
+    assert plant.pressure[0] == pytest.approx(0.2 * math.exp(-0.05 / math.sqrt(0.5) / 0.5))
+
+
+def test_rigs_match_separate_models():
+    rng = np.random.default_rng(2)
+    plant = closed_plant(n_rigs=4, leak_coeff=0.02)
+    plant.volume[:] = [0.3, 0.5, 1.0, 2.0]
+    plant.valve_open[:] = rng.random(plant.valve_open.shape) < 0.4
+    singles = []
+    for rig in range(4):
+        single = closed_plant(leak_coeff=0.02, volume_l=plant.volume[rig])
+        single.valve_open[0] = plant.valve_open[rig]
+        singles.append(single)
+    for model in [plant] + singles:
+        model.advance(3.0)
+    np.testing.assert_allclose(plant.pressure, [single.pressure[0] for single in singles], rtol=1e-12)
+
+
+def test_sync_follows_clock_and_valve_link():
+    plant = closed_plant()
+    link = ValveChannelLink(plant)
+    link.apply_outputs([True] + [False] * 11)  # kanał 0: zawór wlotowy
+    plant.clock.now = 0.4
+    assert plant.read_pressure(0) == pytest.approx(25.0 * (1 - math.exp(-0.4)))
+    link.apply_outputs([False, True] + [False] * 10)  # wlot zamknięty, wydech otwarty
+    assert plant.valve_open[0, plant.valve_index['outlet']]
+    assert not plant.valve_open[0, plant.valve_index['inlet']]
+    with pytest.raises(KeyError):
+        plant.set_valve(0, 'missing', True)
+
+
+def test_sensor_noise_only_on_single_reads():
+    plant = closed_plant(sensor_noise=0.5, seed=3)
+    reads = [plant.read_pressure(0) for _ in range(2000)]
+    assert np.std(reads) == pytest.approx(0.5, rel=0.1)
+    assert plant.read_all()[0] == 0.0
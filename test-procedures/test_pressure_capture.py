@@ -0,0 +1,78 @@
+"""
+Testy akwizycji ciśnienia i dopasowania prostej (fit_hold_window)
+Uruchomienie: python -m pytest test-procedures
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from pressure_capture import PressureCapture, fit_hold_window
+
+
+def test_exact_line():
+    t = np.linspace(0.0, 2.0, 201)
+    fit = fit_hold_window(t, 30.0 - 1.5 * t)
+    assert fit['slope'] == pytest.approx(-1.5)
+    assert fit['start'] == pytest.approx(30.0)
+    assert fit['end'] == pytest.approx(27.0)
+    assert fit['mean'] == pytest.approx(28.5)
+    assert fit['rms'] == pytest.approx(0.0, abs=1e-12)
+
+
+def test_batched_windows_match_polyfit():
+    rng = np.random.default_rng(1)
+    t = np.sort(rng.uniform(0.0, 3.0, (4, 5, 50)), axis=-1)
+    p = 20.0 + rng.normal(0, 2, (4, 5, 1)) * t + rng.normal(0, 0.3, t.shape)
+    fit = fit_hold_window(t, p)
+    assert fit['slope'].shape == (4, 5)
+    for index in np.ndindex(4, 5):
+        slope, intercept = np.polyfit(t[index], p[index], 1)
+        residuals = p[index] - (intercept + slope * t[index])
+        assert fit['slope'][index] == pytest.approx(slope)
+        assert fit['start'][index] == pytest.approx(intercept + slope * t[index][0])
+        assert fit['end'][index] == pytest.approx(intercept + slope * t[index][-1])
+        assert fit['rms'][index] == pytest.approx(np.sqrt(np.mean(residuals ** 2)))
+
+
+def test_shared_time_axis_and_degenerate_window():
+    t = np.linspace(0.0, 1.0, 11)
+    p = np.stack([5.0 + t, 5.0 - 2 * t])
+    np.testing.assert_allclose(fit_hold_window(t, p)['slope'], [1.0, -2.0])
+    # Wszystkie próbki w tej samej chwili: brak nachylenia zamiast dzielenia przez zero
+    fit = fit_hold_window(np.zeros(5), np.arange(5.0))
+    assert fit['slope'] == 0.0 and fit['start'] == fit['end'] == 2.0
+
+
+class RampHardware:
+    """Ciśnienie malejące liniowo z czasem pętli zdarzeń"""
+
+    def __init__(self):
+        self.t0 = None
+
+    async def read_pressure(self, system):
+        now = asyncio.get_running_loop().time()
+        self.t0 = now if self.t0 is None else self.t0
+        return 25.0 - 40.0 * (now - self.t0)
+
+
+def test_capture_segments_and_fit():
+    async def run():
+        capture = PressureCapture(RampHardware(), rate_hz=500.0, max_test_duration_s=0.05)
+        capture.start_test()
+        first = await capture.capture('leak', 0.02)
+        second = await capture.capture('exhaust', 0.02, fit_tail=0.5)
+        with pytest.raises(RuntimeError):
+            await capture.capture('vacuum', 0.05)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(first.t) == len(second.t) == 11
+    assert np.all(np.diff(first.t) > 0)
+    # Przebiegi to osobne segmenty jednego bufora: pierwszy nie został nadpisany
+    assert first.p[0] == 25.0 and second.p[0] < first.p[-1]
+    # Znacznik czasu jest brany po odczycie, więc dopasowanie jest przybliżone
+    assert first.fit['slope'] == pytest.approx(-40.0, rel=0.05)
+    assert second.fit['rms'] < 0.05
+    assert first.to_dict()['system'] == 'leak'
@@ -1,6 +1,31 @@
 import asyncio
 import struct
-from typing import List, Dict
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from thermal import BoardThermalModel
+
+CHANNELS = 12
+ALL_CHANNELS = (1 << CHANNELS) - 1
+CHANNEL_BITS = 1 << np.arange(CHANNELS)
+NOMINAL_CURRENT = 0.3 + np.arange(CHANNELS) * 0.02  # 300-520mA
+CURRENT_LIMIT = 0.5  # 500mA
+# Kanały, których nominalny pobór przekracza limit (zadziała bezpiecznik)
+OVERCURRENT_CHANNELS = int(np.dot(NOMINAL_CURRENT > CURRENT_LIMIT, CHANNEL_BITS))
+
+# Tablice dla wszystkich 4096 masek: stany kanałów i pobór prądu
+MASK_STATES = (np.arange(ALL_CHANNELS + 1)[:, None] & CHANNEL_BITS) != 0
+MASK_CURRENT = np.where(MASK_STATES, NOMINAL_CURRENT, 0.0)
+
+
+def to_mask(states) -> int:
+    """Tablica stanów kanałów -> maska bitowa"""
+    return int(np.dot(np.asarray(states, dtype=bool), CHANNEL_BITS))
+
+
+def channels_of(mask: int) -> List[int]:
+    return [i for i in range(CHANNELS) if mask >> i & 1]
 
 
 class PCBOut12Simulator:
@@ -8,9 +33,9 @@ class PCBOut12Simulator:
 
     def __init__(self, i2c_address: int = 0x21):
         self.address = i2c_address
-        self.outputs = [False] * 12  # Stan 12 wyjść
-        self.current_draw = [0.0] * 12  # Pobór prądu
-        self.fuses = [True] * 12  # Stan bezpieczników
+        self.outputs = np.zeros(CHANNELS, dtype=bool)  # Stan 12 wyjść
+        self.current_draw = np.zeros(CHANNELS)  # Pobór prądu
+        self.fuses = np.ones(CHANNELS, dtype=bool)  # Stan bezpieczników
         self.temperature = 25.0  # Temperatura PCB
 
         # Rejestry I2C
@@ -24,70 +49,147 @@ class PCBOut12Simulator:
             0x30: self._reset_fuse  # Reset bezpiecznika
         }
 
+        # Opcjonalne powiązanie wyjść z modelem pneumatycznym
+        self.plant_link = None
+        # Opcjonalny model elektrotermiczny (wiersz `board` modelu)
+        self.thermal = None
+        self.board = 0
+
+    @property
+    def temperature(self) -> float:
+        if self.thermal is not None:
+            return float(self.thermal.temperature[self.board])
+        return self._temperature
+
+    @temperature.setter
+    def temperature(self, value: float):
+        self._temperature = value
+
+    def attach_plant(self, plant_link):
+        """Podłącza wyjścia do zaworów w modelu pneumatycznym
+
+        plant_link: obiekt z metodą apply_outputs(outputs) (np. ValveChannelLink)
+        """
+        self.plant_link = plant_link
+        plant_link.apply_outputs(self.outputs)
+
+    def attach_thermal(self, model: BoardThermalModel, board: int = 0):
+        """Prąd, bezpieczniki I²t i temperatura z modelu elektrotermicznego
+
+        Wiele płytek może dzielić jeden model (każda swój wiersz `board`);
+        stany wyjść i bezpieczników płytki są widokami na wiersz modelu.
+        """
+        model.sync()
+        model.on[board] = self.outputs
+        model.fuse_ok[board] = self.fuses
+        model.age[board] = np.inf  # już włączone kanały bez prądu rozruchowego
+        model.refresh_current()
+        model.listeners[board] = self._on_thermal_off
+        self.thermal = model
+        self.board = board
+        self.outputs = model.on[board]
+        self.fuses = model.fuse_ok[board]
+        self.current_draw = model.current[board]
+
+    def _on_thermal_off(self, channels: int):
+        """Kanały wyłączone przez model (bezpiecznik I²t lub przegrzanie)"""
+        blown = channels & ~to_mask(self.fuses)
+        if blown:
+            print(f"Outputs {channels_of(blown)} - fuse tripped (I2t)!")
+        if channels & ~blown:
+            print(f"Outputs {channels_of(channels & ~blown)} - thermal shutdown at {self.temperature:.1f}°C!")
+        if self.plant_link:
+            self.plant_link.apply_outputs(self.outputs)
+
+    def _sync(self):
+        if self.thermal is not None:
+            self.thermal.sync()
+
     def _read_outputs(self) -> bytes:
         """Zwraca stan wszystkich wyjść jako 2 bajty"""
-        state = 0
-        for i, output in enumerate(self.outputs):
-            if output:
-                state |= (1 << i)
-        return struct.pack('>H', state)
+        self._sync()
+        return struct.pack('>H', to_mask(self.outputs))
 
     def _read_current(self) -> bytes:
         """Zwraca pobór prądu (symulowany)"""
+        self._sync()
         # Średni pobór prądu
-        avg_current = sum(self.current_draw) / len(self.current_draw)
+        avg_current = sum(self.current_draw.tolist()) / CHANNELS
         return struct.pack('>H', int(avg_current * 1000))  # mA
 
     def _read_fuses(self) -> bytes:
         """Zwraca stan bezpieczników"""
-        state = 0
-        for i, fuse_ok in enumerate(self.fuses):
-            if fuse_ok:
-                state |= (1 << i)
-        return struct.pack('>H', state)
+        self._sync()
+        return struct.pack('>H', to_mask(self.fuses))
 
     def _read_temperature(self) -> bytes:
         """Zwraca temperaturę PCB"""
+        self._sync()
         return struct.pack('>h', int(self.temperature * 10))  # 0.1°C
 
+    def _apply_mask(self, state: int, channels: int = ALL_CHANNELS) -> Tuple[int, int]:
+        """Ustawia kanały z maski `channels` na bity `state`
+
+        Operacje bitowe na masce, prąd i diagnostyka liczone raz dla
+        całej komendy. Zwraca (maska zmienionych kanałów, maska kanałów
+        pominiętych przez przepalony bezpiecznik). Z modelem
+        elektrotermicznym prąd, temperatura i bezpieczniki zmieniają się
+        w czasie w modelu zamiast natychmiast.
+        """
+        self._sync()
+        fuses = to_mask(self.fuses)
+        blocked = channels & ~fuses
+        writable = channels & fuses
+        before = to_mask(self.outputs)
+        after = (before & ~writable) | (state & writable)
+
+        if self.thermal is not None:
+            self.outputs[:] = MASK_STATES[after]
+            self.thermal.switched(self.board, MASK_STATES[after & ~before])
+        else:
+            # Symuluj pobór prądu (kanały z przepalonym bezpiecznikiem bez zmian)
+            self.current_draw = np.where(MASK_STATES[writable], MASK_CURRENT[after], self.current_draw)
+
+            # Symuluj wzrost temperatury
+            self.temperature = 25.0 + (bin(after).count('1') * 2.5)
+
+            # Sprawdź przeciążenie
+            overload = after & writable & OVERCURRENT_CHANNELS
+            if overload:
+                after &= ~overload
+                self.fuses[:] = MASK_STATES[fuses & ~overload]
+                print(f"Outputs {channels_of(overload)} - overcurrent protection triggered!")
+            self.outputs[:] = MASK_STATES[after]
+
+        if self.plant_link:
+            self.plant_link.apply_outputs(self.outputs)
+
+        return before ^ after, blocked
+
     def _write_output(self, channel: int, state: bool):
         """Kontroluje pojedyncze wyjście"""
-        if 0 <= channel < 12:
+        if 0 <= channel < CHANNELS:
             if not self.fuses[channel]:
                 print(f"Output {channel} - blown fuse!")
                 return False
-
-            self.outputs[channel] = state
-
-            # Symuluj pobór prądu
-            if state:
-                self.current_draw[channel] = 0.3 + (channel * 0.02)  # 300-320mA
-            else:
-                self.current_draw[channel] = 0.0
-
+            self._apply_mask(int(state) << channel, 1 << channel)
             print(f"Output {channel} = {'ON' if state else 'OFF'}")
-
-            # Symuluj wzrost temperatury
-            active_outputs = sum(self.outputs)
-            self.temperature = 25.0 + (active_outputs * 2.5)
-
-            # Sprawdź przeciążenie
-            if self.current_draw[channel] > 0.5:  # 500mA limit
-                self.fuses[channel] = False
-                self.outputs[channel] = False
-                print(f"Output {channel} - overcurrent protection triggered!")
-
             return True
         return False
 
     def _write_all_outputs(self, state: int):
-        """Ustawia wszystkie wyjścia jednocześnie"""
-        for i in range(12):
-            self._write_output(i, bool(state & (1 << i)))
+        """Ustawia wszystkie wyjścia jednocześnie (maska 12 bitów)"""
+        changed, blocked = self._apply_mask(state & ALL_CHANNELS)
+        if blocked:
+            print(f"Outputs {channels_of(blocked)} - blown fuse!")
+        print(f"Outputs = 0x{to_mask(self.outputs):03X} (changed 0x{changed:03X})")
 
     def _reset_fuse(self, channel: int):
         """Reset bezpiecznika"""
-        if 0 <= channel < 12:
+        if 0 <= channel < CHANNELS:
+            if self.thermal is not None:
+                self.thermal.sync()
+                self.thermal.reset_fuse(self.board, channel)
             self.fuses[channel] = True
             self.current_draw[channel] = 0.0
             print(f"Fuse {channel} reset")
@@ -166,6 +268,11 @@ async def main():
     pcb = PCBOut12Simulator()
     tester = ValveTestProcedure(pcb)
 
+    # Prąd, bezpieczniki i temperatura płytki w czasie
+    thermal = BoardThermalModel()
+    pcb.attach_thermal(thermal)
+    asyncio.create_task(thermal.run())
+
     # Uruchom diagnostykę w tle
     asyncio.create_task(pcb.run_diagnostics())
 
@@ -0,0 +1,120 @@
+"""
+Testy PCBOut12Simulator: aktualizacja maską daje te same rejestry co
+wcześniejsza pętla po kanałach
+Uruchomienie: python -m pytest valve-controller
+"""
+
+import asyncio
+import random
+import struct
+
+import numpy as np
+import pytest
+
+from pcb_out_12 import ALL_CHANNELS, CHANNELS, PCBOut12Simulator, channels_of, to_mask
+
+READ_REGISTERS = (0x00, 0x02, 0x04, 0x06)
+
+
+class PerChannelReference:
+    """Poprzednia implementacja: każda komenda kanał po kanale, na listach"""
+
+    def __init__(self):
+        self.outputs = [False] * CHANNELS
+        self.current_draw = [0.0] * CHANNELS
+        self.fuses = [True] * CHANNELS
+        self.temperature = 25.0
+
+    def write_output(self, channel: int, state: bool):
+        if not 0 <= channel < CHANNELS or not self.fuses[channel]:
+            return
+        self.outputs[channel] = state
+        self.current_draw[channel] = 0.3 + (channel * 0.02) if state else 0.0
+        self.temperature = 25.0 + (sum(self.outputs) * 2.5)
+        if self.current_draw[channel] > 0.5:
+            self.fuses[channel] = False
+            self.outputs[channel] = False
+
+    def write_all_outputs(self, state: int):
+        for i in range(CHANNELS):
+            self.write_output(i, bool(state & (1 << i)))
+
+    def reset_fuse(self, channel: int):
+        if 0 <= channel < CHANNELS:
+            self.fuses[channel] = True
+            self.current_draw[channel] = 0.0
+
+    def read(self, register: int) -> bytes:
+        if register == 0x00:
+            return struct.pack('>H', sum(1 << i for i, on in enumerate(self.outputs) if on))
+        if register == 0x02:
+            return struct.pack('>H', int(sum(self.current_draw) / CHANNELS * 1000))
+        if register == 0x04:
+            return struct.pack('>H', sum(1 << i for i, ok in enumerate(self.fuses) if ok))
+        return struct.pack('>h', int(self.temperature * 10))
+
+
+class RecordingLink:
+    def __init__(self):
+        self.calls = []
+
+    def apply_outputs(self, outputs):
+        self.calls.append(np.array(outputs, dtype=bool))
+
+
+def test_mask_helpers():
+    assert to_mask([True, False, True] + [False] * 9) == 0b101
+    assert channels_of(0b100000000101) == [0, 2, 11]
+    assert to_mask(np.ones(CHANNELS, dtype=bool)) == ALL_CHANNELS
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_readback_matches_per_channel_reference(seed, capsys):
+    rng = random.Random(seed)
+    pcb, reference = PCBOut12Simulator(), PerChannelReference()
+
+    async def replay():
+        for _ in range(600):
+            kind = rng.random()
+            if kind < 0.45:
+                channel, state = rng.randrange(CHANNELS + 2), rng.random() < 0.6
+                await pcb.process_i2c_command(0x10, bytes([channel, state]))
+                reference.write_output(channel, state)
+            elif kind < 0.9:
+                state = rng.randrange(1 << 16)  # bity 12-15 są ignorowane
+                await pcb.process_i2c_command(0x20, struct.pack('>H', state))
+                reference.write_all_outputs(state & ALL_CHANNELS)
+            else:
+                channel = rng.choice([11, 11, rng.randrange(CHANNELS)])
+                await pcb.process_i2c_command(0x30, bytes([channel]))
+                reference.reset_fuse(channel)
+            for register in READ_REGISTERS:
+                assert await pcb.process_i2c_command(register) == reference.read(register), hex(register)
+
+    asyncio.run(replay())
+    capsys.readouterr()
+
+
+def test_pattern_trips_overcurrent_channel_and_keeps_its_current(capsys):
+    pcb = PCBOut12Simulator()
+    pcb._write_all_outputs(ALL_CHANNELS)
+    assert to_mask(pcb.outputs) == ALL_CHANNELS & ~(1 << 11)
+    assert to_mask(pcb.fuses) == ALL_CHANNELS & ~(1 << 11)
+    tripped_current = pcb.current_draw[11]
+    pcb._write_all_outputs(0)
+    # Kanał z przepalonym bezpiecznikiem nie jest sterowany: prąd zostaje do resetu
+    assert pcb.current_draw[11] == tripped_current
+    assert not pcb._write_output(11, True)
+    pcb._reset_fuse(11)
+    assert pcb.current_draw[11] == 0.0
+    assert 'overcurrent' in capsys.readouterr().out
+
+
+def test_pattern_updates_plant_once(capsys):
+    pcb = PCBOut12Simulator()
+    link = RecordingLink()
+    pcb.attach_plant(link)
+    pcb._write_all_outputs(0b000000001111)
+    assert len(link.calls) == 2  # attach + jedna komenda
+    np.testing.assert_array_equal(link.calls[-1], [True] * 4 + [False] * 8)
+    capsys.readouterr()
@@ -0,0 +1,114 @@
+"""
+Testy modelu elektrotermicznego płytek (BoardThermalModel)
+Uruchomienie: python -m pytest valve-controller
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from pcb_out_12 import ALL_CHANNELS, PCBOut12Simulator, to_mask
+from thermal import NOMINAL_CURRENT, BoardThermalModel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def switch_on(model, board, channels):
+    model.on[board, channels] = True
+    turned_on = np.zeros(model.on.shape[1], dtype=bool)
+    turned_on[channels] = True
+    model.switched(board, turned_on)
+
+
+def test_result_does_not_depend_on_step_size():
+    results = []
+    for max_dt in (0.001, 0.01, 0.25):
+        model = BoardThermalModel(n_boards=2, max_dt=max_dt)
+        switch_on(model, 0, list(range(11)))  # kanał 11 (0.52 A) by zadziałał
+        switch_on(model, 1, [0, 5])
+        model.advance(5.0, max_steps=10000)
+        results.append((model.temperature.copy(), model.i2t.copy()))
+    for temperature, i2t in results[1:]:
+        # Stan bezpiecznika jest całkowany dokładnie; temperatura bierze średnią
+        # moc z kroku, więc różni się o ułamek ładunku rozruchu przy RC = 120 s
+        np.testing.assert_allclose(i2t, results[0][1], rtol=1e-9, atol=1e-15)
+        np.testing.assert_allclose(temperature, results[0][0], rtol=1e-6)
+
+
+def test_steady_state_temperature():
+    model = BoardThermalModel(quiescent_w=0.5)
+    switch_on(model, 0, [0, 1, 2])
+    model.advance(3000.0)
+    power = 0.5 + model.drop_v * NOMINAL_CURRENT[:3].sum()
+    assert model.temperature[0] == pytest.approx(25.0 + power * 6.0, rel=1e-6)
+    assert model.power[0] == pytest.approx(power, rel=1e-6)
+
+
+def test_inrush_charge():
+    model = BoardThermalModel(inrush_ratio=3.0, inrush_tau_s=0.02, drop_v=1.0, quiescent_w=0.0)
+    switch_on(model, 0, [0])
+    dt = 0.05
+    model.step(dt)
+    charge = NOMINAL_CURRENT[0] * (dt + 2.0 * 0.02 * (1 - math.exp(-dt / 0.02)))
+    assert model.power[0] * dt == pytest.approx(charge, rel=1e-12)
+    assert model.current[0, 0] == pytest.approx(NOMINAL_CURRENT[0] * (1 + 2 * math.exp(-dt / 0.02)))
+
+
+def test_fuse_trips_at_expected_time():
+    # Bez prądu rozruchowego: h(t) = I²·tau_f·(1 - exp(-t/tau_f)) > I_hold²·tau_f
+    model = BoardThermalModel(inrush_ratio=1.0, max_dt=0.001)
+    offs = []
+    model.listeners[0] = offs.append
+    switch_on(model, 0, [10, 11])  # 0.5 A (na granicy) i 0.52 A
+    tau_f = 0.1 / 0.5 ** 2
+    expected = -tau_f * math.log(1 - 0.5 ** 2 / 0.52 ** 2)
+    model.advance(expected - 0.01, max_steps=100000)
+    assert model.trips == 0
+    model.advance(0.02, max_steps=100)
+    assert model.trips == 1 and offs == [1 << 11]
+    assert not model.fuse_ok[0, 11] and model.current[0, 11] == 0.0
+    model.advance(60.0, max_steps=100000)
+    assert model.fuse_ok[0, 10] and model.trips == 1
+
+
+def test_short_pulse_trips_on_i2t():
+    model = BoardThermalModel(nominal_current=np.full(12, 2.0), inrush_ratio=1.0, max_dt=0.0005)
+    switch_on(model, 0, [3])
+    # ∫i² dt = 4 A² · t przekracza 0.1 A²s po ~25 ms (plus zanik stanu)
+    model.advance(0.02, max_steps=1000)
+    assert model.trips == 0
+    model.advance(0.02, max_steps=1000)
+    assert model.trips == 1
+
+
+def test_thermal_shutdown():
+    model = BoardThermalModel(thermal_capacitance=0.5, quiescent_w=10.0, shutdown_c=60.0)
+    switch_on(model, 0, [0, 1])
+    offs = []
+    model.listeners[0] = offs.append
+    model.advance(30.0)
+    assert model.shutdowns >= 1 and offs[0] == 0b11
+    assert not model.on[0].any()
+
+
+def test_simulator_with_thermal_model(capsys):
+    clock = FakeClock()
+    model = BoardThermalModel(clock=clock)
+    pcb = PCBOut12Simulator()
+    pcb.attach_thermal(model)
+    pcb._write_all_outputs(ALL_CHANNELS)
+    assert to_mask(pcb.outputs) == ALL_CHANNELS  # bezpiecznik działa z opóźnieniem
+    clock.now = 5.0
+    assert pcb._read_fuses() == (ALL_CHANNELS & ~(1 << 11)).to_bytes(2, 'big')
+    assert to_mask(pcb.outputs) == ALL_CHANNELS & ~(1 << 11)
+    assert pcb.temperature > 25.0
+    pcb._reset_fuse(11)
+    assert model.fuse_ok[0, 11] and model.i2t[0, 11] == 0.0
+    assert 'fuse tripped' in capsys.readouterr().out
@@ -0,0 +1,159 @@
+"""
+Model elektrotermiczny płytek PCB OUT 12
+Prąd kanałów z prądem rozruchowym, bezpieczniki I²t i temperatura płytek
+(RC pierwszego rzędu) całkowane wektorowo (NumPy) dla wielu płytek naraz
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+CHANNELS = 12
+# Prąd ustalony kanałów [A], jak w PCBOut12Simulator
+NOMINAL_CURRENT = 0.3 + np.arange(CHANNELS) * 0.02
+
+
+def _decay_integral(rate: float, fuse_tau: np.ndarray, decay: np.ndarray, dt: float) -> np.ndarray:
+    """∫ exp(-rate·s) · exp(-(dt - s) / fuse_tau) ds od 0 do dt"""
+    diff = rate - 1.0 / fuse_tau
+    close = np.abs(diff * dt) < 1e-9
+    return np.where(close, dt * decay, (decay - np.exp(-rate * dt)) / np.where(close, 1.0, diff))
+
+
+class BoardThermalModel:
+    """Prądy, bezpieczniki i temperatura wielu płytek wyjść
+
+    Prąd włączonego kanału (cewka zaworu) po czasie a od załączenia:
+        i(a) = I_nom * (1 + (k - 1) * exp(-a / tau))     k = inrush_ratio
+    Bezpiecznik (stan cieplny elementu h, A²s, stała tau_f = I²t / I_hold²):
+        dh/dt = i² - h / tau_f;  zadziała przy h > I_hold² * tau_f
+    Krótki impuls wyzwala bezpiecznik, gdy ∫i² dt przekroczy fuse_i2t,
+    długotrwały prąd, gdy przekroczy fuse_hold_a.
+    Temperatura płytki:
+        C * dT/dt = P - (T - T_amb) / R,  P = P_q + V_drop * sum(i)
+
+    Całki po kroku (prąd, i² ważone zanikiem stanu bezpiecznika) są
+    liczone analitycznie, a krok temperatury jest dokładnym rozwiązaniem
+    równania liniowego, więc wynik nie zależy od długości kroku (poza
+    chwilą zadziałania bezpiecznika w obrębie kroku max_dt).
+    """
+
+    def __init__(self, n_boards: int = 1, nominal_current: Optional[np.ndarray] = None,
+                 inrush_ratio: float = 3.0, inrush_tau_s: float = 0.02,
+                 fuse_hold_a: float = 0.5, fuse_i2t: float = 0.1,
+                 ambient_c: float = 25.0, thermal_resistance: float = 6.0,
+                 thermal_capacitance: float = 20.0, drop_v: float = 1.0,
+                 quiescent_w: float = 0.0, shutdown_c: Optional[float] = None,
+                 max_dt: float = 0.01, clock: Callable[[], float] = time.monotonic):
+        self.n_boards = n_boards
+        nominal = NOMINAL_CURRENT if nominal_current is None else np.asarray(nominal_current, dtype=float)
+        self.nominal = np.tile(nominal, (n_boards, 1))
+        self.inrush_ratio = inrush_ratio
+        self.inrush_tau = inrush_tau_s
+        self.fuse_tau = np.full(n_boards, fuse_i2t / fuse_hold_a ** 2)[:, None]
+        self.fuse_limit = np.full(n_boards, float(fuse_i2t))[:, None]
+        self.ambient = np.full(n_boards, float(ambient_c))
+        self.resistance = np.full(n_boards, float(thermal_resistance))  # K/W
+        self.capacitance = np.full(n_boards, float(thermal_capacitance))  # J/K
+        self.drop_v = drop_v
+        self.quiescent = np.full(n_boards, float(quiescent_w))
+        self.shutdown_c = shutdown_c  # wyłączenie wszystkich wyjść płytki (None = brak)
+
+        shape = (n_boards, nominal.size)
+        self.on = np.zeros(shape, dtype=bool)
+        self.fuse_ok = np.ones(shape, dtype=bool)
+        self.age = np.full(shape, np.inf)  # czas od załączenia kanału [s]
+        self.i2t = np.zeros(shape)
+        self.current = np.zeros(shape)  # prąd chwilowy [A]
+        self.power = np.zeros(n_boards)  # średnia moc w ostatnim kroku [W]
+        self.temperature = self.ambient.copy()
+        self.trips = 0
+        self.shutdowns = 0
+        # płytka -> callback(maska kanałów wyłączonych przez model)
+        self.listeners: Dict[int, Callable[[int], None]] = {}
+
+        self.max_dt = max_dt
+        self.clock = clock
+        self.sim_time = 0.0
+        self._last_sync = clock()
+
+    def switched(self, board: int, turned_on: np.ndarray):
+        """Kanały board właśnie załączone: start prądu rozruchowego"""
+        self.age[board, turned_on] = 0.0
+        self.refresh_current()
+
+    def refresh_current(self):
+        """Prąd chwilowy wg bieżącego stanu wyjść"""
+        active = self.on & self.fuse_ok
+        inrush = 1.0 + (self.inrush_ratio - 1.0) * np.exp(-self.age / self.inrush_tau)
+        np.copyto(self.current, np.where(active, self.nominal * inrush, 0.0))
+
+    def step(self, dt: float):
+        """Jeden krok całkowania dla wszystkich płytek naraz"""
+        active = self.on & self.fuse_ok
+        k = self.inrush_ratio - 1.0
+        tau = self.inrush_tau
+        e0 = np.exp(-self.age / tau)
+        # ∫i dt po kroku
+        charge = np.where(active, self.nominal * (dt + k * tau * e0 * (1.0 - np.exp(-dt / tau))), 0.0)
+        # ∫i²(s) exp(-(dt - s) / tau_f) ds po kroku; i² = I²(1 + 2k·e + k²·e²)
+        fuse_tau = self.fuse_tau
+        decay = np.exp(-dt / fuse_tau)
+        heating = fuse_tau * (1.0 - decay) + 2 * k * e0 * _decay_integral(1.0 / tau, fuse_tau, decay, dt) \
+            + k * k * e0 ** 2 * _decay_integral(2.0 / tau, fuse_tau, decay, dt)
+        self.i2t = self.i2t * decay + np.where(active, self.nominal ** 2 * heating, 0.0)
+        # Przy prądzie równym I_hold stan dąży do progu; bez zapasu na
+        # zaokrąglenia bezpiecznik zadziałałby przy prądzie znamionowym
+        tripped = active & (self.i2t > self.fuse_limit * (1 + 1e-9))
+
+        self.power = self.quiescent + self.drop_v * charge.sum(axis=1) / dt
+        rc = self.resistance * self.capacitance
+        steady = self.ambient + self.power * self.resistance
+        self.temperature = steady + (self.temperature - steady) * np.exp(-dt / rc)
+
+        self.age += dt
+        self.sim_time += dt
+        off = np.zeros_like(self.on)
+        if tripped.any():
+            self.fuse_ok[tripped] = False
+            self.trips += int(tripped.sum())
+            off |= tripped
+        if self.shutdown_c is not None:
+            hot = self.temperature > self.shutdown_c
+            if hot.any():
+                self.shutdowns += int(hot.sum())
+                off[hot] |= self.on[hot]
+        if off.any():
+            self.on[off] = False
+            for board in np.flatnonzero(off.any(axis=1)).tolist():
+                listener = self.listeners.get(board)
+                if listener:
+                    listener(int(np.dot(off[board], 1 << np.arange(off.shape[1]))))
+        self.refresh_current()
+
+    def advance(self, duration: float, max_steps: int = 1000):
+        """Całkuje model przez `duration` sekund krokami nie większymi niż max_dt"""
+        if duration <= 0:
+            return
+        n_steps = min(int(np.ceil(duration / self.max_dt)), max_steps)
+        dt = duration / n_steps
+        for _ in range(n_steps):
+            self.step(dt)
+
+    def sync(self):
+        """Dogania model do bieżącego czasu zegara"""
+        now = self.clock()
+        self.advance(now - self._last_sync)
+        self._last_sync = now
+
+    def reset_fuse(self, board: int, channel: int):
+        self.fuse_ok[board, channel] = True
+        self.i2t[board, channel] = 0.0
+
+    async def run(self, interval_s: float = 0.05):
+        """Okresowe doganianie zegara (zadziałania bezpieczników bez odczytów)"""
+        while True:
+            self.sync()
+            await asyncio.sleep(interval_s)